@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections to ``/ws/messages/`` are
+served by the real-time message socket.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +15,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the app registry is ready
+from user_messages.realtime import SOCKET_PATH, MessageSocket  # noqa: E402
+
+message_socket = MessageSocket()
+
+
+async def application(scope, receive, send):
+    if scope['type'] != 'websocket':
+        return await django_application(scope, receive, send)
+    if scope['path'] == SOCKET_PATH:
+        return await message_socket(scope, receive, send)
+    # Unknown socket path: reject the handshake
+    await receive()
+    await send({'type': 'websocket.close'})
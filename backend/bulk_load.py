@@ -0,0 +1,136 @@
+"""
+Helpers shared by the bulk data commands (backup_db, restore_db,
+load_fixtures_fast)
+
+They load rows with multi-row INSERTs, which skip save() and signals, so
+the commands order models by their foreign keys, reset primary key
+sequences afterwards and rebuild the denormalized search vectors
+themselves.
+"""
+from django.apps import apps
+from django.contrib.postgres.search import SearchVectorField
+from django.core.management.color import no_style
+from django.db import connections
+from django.db.models.constants import OnConflict
+
+
+def resolve_models(labels, exclude=()):
+    """
+    Concrete, managed models (including auto-created M2M through tables)
+    named by ``labels`` (``app_label`` or ``app_label.Model``; all models
+    when empty), minus those named by ``exclude``.
+    """
+    def matches(model, names):
+        return (
+            model._meta.app_label in names
+            or model._meta.label_lower in names
+        )
+
+    labels = {label.lower() for label in labels}
+    exclude = {label.lower() for label in exclude}
+    return [
+        model for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy
+        and (not labels or matches(model, labels))
+        and not matches(model, exclude)
+    ]
+
+
+def model_dependencies(model, models):
+    """Models among ``models`` that ``model`` has a foreign key to"""
+    return {
+        field.related_model for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model in models
+        and field.related_model is not model
+    }
+
+
+def dependency_levels(models):
+    """
+    Group ``models`` so every model comes after the models it references;
+    models within a level don't reference each other. Models caught in a
+    reference cycle end up together in the last level.
+    """
+    remaining = {model: model_dependencies(model, models) for model in models}
+    levels = []
+    while remaining:
+        done = set().union(*levels) if levels else set()
+        level = [
+            model for model in models
+            if model in remaining and remaining[model] <= done
+        ]
+        if not level:
+            level = [model for model in models if model in remaining]
+        for model in level:
+            del remaining[model]
+        levels.append(level)
+    return levels
+
+
+def dependency_order(models):
+    return [model for level in dependency_levels(models) for model in level]
+
+
+def stored_fields(model):
+    """Concrete fields worth copying; search vectors are rebuilt instead"""
+    return [
+        field for field in model._meta.concrete_fields
+        if not isinstance(field, SearchVectorField)
+    ]
+
+
+def insert_rows(model, instances, using='default', upsert=False):
+    """
+    Insert ``instances`` (with their primary keys) in as few multi-row
+    INSERTs as the database allows. Works like bulk_create, but raw, as
+    loaddata saves: auto_now/auto_now_add values are kept as given and
+    only filled in when missing. With ``upsert``, rows whose primary key
+    already exists are overwritten.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not getattr(field, 'generated', False)
+    ]
+    timestamps = [
+        field for field in fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for instance in instances:
+        for field in timestamps:
+            if getattr(instance, field.attname) is None:
+                field.pre_save(instance, add=True)
+    options = {}
+    update_fields = [field for field in fields if not field.primary_key]
+    if upsert and update_fields:
+        options = {
+            'on_conflict': OnConflict.UPDATE,
+            'update_fields': update_fields,
+            'unique_fields': [model._meta.pk],
+        }
+    elif upsert:
+        options = {'on_conflict': OnConflict.IGNORE}
+    queryset = model._base_manager.using(using)
+    batch_size = connections[using].ops.bulk_batch_size(fields, instances)
+    batch_size = max(1, batch_size or len(instances))
+    for start in range(0, len(instances), batch_size):
+        queryset._insert(
+            instances[start:start + batch_size], fields=fields, using=using,
+            raw=True, **options
+        )
+
+
+def reset_sequences(models, using='default'):
+    """Move primary key sequences past the highest loaded id"""
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def rebuild_search_vectors(models, using='default'):
+    for model in models:
+        queryset = model._default_manager.using(using).all()
+        if hasattr(queryset, 'update_search_vectors'):
+            queryset.update_search_vectors()
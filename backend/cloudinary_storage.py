@@ -1,14 +1,27 @@
 """
 Custom Cloudinary storage backend for Django
 """
+import logging
 import os
+from functools import partial
 import cloudinary
 import cloudinary.uploader
 from django.conf import settings
 from django.core.files.storage import Storage
 from django.core.files.base import File
+from django.db import transaction
 from django.utils.deconstruct import deconstructible
-from cloudinary.utils import cloudinary_url
+from backend.cloudinary_uploads import (
+    PENDING_NAME_OVERHEAD, destroy_asset, discard_staged_file, get_uploader,
+    is_pending_upload, make_pending_name, stage_file, staged_path,
+    track_staged_upload,
+)
+from backend.image_urls import (
+    cloudinary_public_id, is_absolute_url, resolve_image_url,
+)
+from backend.models import StoredAsset
+
+logger = logging.getLogger(__name__)
 
 
 @deconstructible
@@ -17,7 +30,7 @@ class CustomCloudinaryStorage(Storage):
     Custom Cloudinary storage backend for Django
     """
     
-    def __init__(self, location=None, base_url=None):
+    def __init__(self, location=None, base_url=None, deferred=None):
         super().__init__()
         # Configure Cloudinary
         cloudinary.config(
@@ -27,6 +40,20 @@ class CustomCloudinaryStorage(Storage):
         )
         self.location = location or ''
         self.base_url = base_url or 'https://res.cloudinary.com'
+        self._deferred = deferred
+
+    @property
+    def deferred(self):
+        """Whether uploads are staged locally and pushed in the background"""
+        if self._deferred is not None:
+            return self._deferred
+        return getattr(settings, 'CLOUDINARY_DEFERRED_UPLOADS', False)
+
+    def get_available_name(self, name, max_length=None):
+        # Leave room for the pending/<token>/ prefix of deferred uploads
+        if max_length is not None and self.deferred:
+            max_length -= PENDING_NAME_OVERHEAD
+        return super().get_available_name(name, max_length=max_length)
     
     def _open(self, name, mode='rb'):
         """Open a file from Cloudinary"""
@@ -53,53 +80,44 @@ class CustomCloudinaryStorage(Storage):
         # The 'name' parameter comes from the model's upload_to (e.g., "expert_profiles/photo.jpg")
         # Use this directly as the public_id, but ensure it doesn't have leading/trailing slashes
         public_id = name.strip('/')
-        
+
+        if self.deferred:
+            # Stage locally and upload once the row is saved and committed
+            pending_name = make_pending_name(public_id)
+            stage_file(pending_name, content)
+            track_staged_upload(pending_name)
+            return pending_name
+
         # Upload to Cloudinary with public access
         # Note: We use public_id directly, not folder parameter, to avoid duplication
-        result = cloudinary.uploader.upload(
-            content,
-            public_id=public_id,
-            resource_type="image",
-            overwrite=True,
-            invalidate=True,
-            use_filename=True,
-            unique_filename=True,  # Ensure unique filenames to avoid conflicts
-        )
+        result = get_uploader().upload(content, public_id)
         
         # Extract the public_id and secure_url from Cloudinary's response
         stored_public_id = result.get('public_id', public_id)
         secure_url = result.get('secure_url', '')
-        
-        # Debug logging
-        print("✅ Cloudinary upload successful:")
-        print(f"   - Input name: {name}")
-        print(f"   - Public ID: {stored_public_id}")
-        print(f"   - Secure URL: {secure_url}")
+        logger.info('Uploaded %s to Cloudinary as %s (%s)', name, stored_public_id, secure_url)
         
         # For this project, we store the full secure_url in the DB for simplicity and reliability.
         # This ensures the URL always works without needing to reconstruct it from public_id.
         # If secure_url is not available, fall back to public_id (for legacy compatibility).
-        return secure_url or stored_public_id
+        stored_name = secure_url or stored_public_id
+        StoredAsset.objects.record(stored_name, result)
+        return stored_name
     
     def url(self, name):
         """Get the URL for a file"""
-        if not name:
+        if not name or is_pending_upload(name):
             return ''
         
-        # If name is already a full URL (new uploads store secure_url), return it as-is
-        if name.startswith('http://') or name.startswith('https://'):
-            return name
-        
-        # For legacy values where name is a public_id (not a full URL),
-        # construct the Cloudinary URL using the SDK
+        # New uploads store the full secure_url, legacy rows a public_id;
+        # both resolve through the shared URL cache
         # Do NOT force version "v1" - let Cloudinary use the actual version
         try:
-            url, _ = cloudinary_url(name, secure=True, resource_type="image")
+            url = resolve_image_url(name)
             if url:
-                print(f"✅ Generated Cloudinary URL: {url} from public_id: {name}")
                 return url
-        except Exception as e:
-            print(f"⚠️ Error generating Cloudinary URL for {name}: {e}")
+        except Exception:
+            logger.warning('Cannot build a Cloudinary URL for %s', name, exc_info=True)
         
         # Check if it's a local file (fallback)
         local_path = os.path.join(settings.BASE_DIR, 'media', name)
@@ -108,39 +126,56 @@ class CustomCloudinaryStorage(Storage):
             return f"/media/{name}"
         
         # Final fallback
-        print(f"⚠️ Could not generate URL for {name}, using fallback")
+        logger.debug('No Cloudinary URL for %s, falling back to /media/', name)
         return f"/media/{name}"
     
     def exists(self, name):
         """Check if a file exists"""
         if not name:
             return False
+        if is_pending_upload(name):
+            return os.path.exists(staged_path(name))
         
-        # Check Cloudinary
-        try:
-            cloudinary.api.resource(name)
-            return True
-        except Exception:
-            return False
+        # Uploads are registered locally; no Cloudinary API round trip
+        return StoredAsset.objects.for_name(name).exists()
     
     def size(self, name):
         """Get file size"""
         if not name:
             return 0
+        if is_pending_upload(name):
+            try:
+                return os.path.getsize(staged_path(name))
+            except OSError:
+                return 0
         
-        # For Cloudinary files, we can't easily get size without API call
-        return 0
+        size = StoredAsset.objects.for_name(name).values_list(
+            'size', flat=True
+        ).first()
+        return size or 0
     
     def delete(self, name):
         """Delete a file"""
         if not name:
             return
+        if is_pending_upload(name):
+            discard_staged_file(name)
+            return
         
-        # Delete from Cloudinary
-        try:
-            cloudinary.uploader.destroy(name)
-        except Exception:
-            pass
+        # Drop the registry entry now and the Cloudinary asset once the
+        # transaction commits. Unregistered values are legacy public_ids
+        # or secure_urls the public_id can be read back from.
+        assets = StoredAsset.objects.for_name(name)
+        public_ids = list(assets.values_list('public_id', flat=True))
+        assets.delete()
+        if not public_ids:
+            public_id = (
+                cloudinary_public_id(name) if is_absolute_url(name)
+                else name.strip('/')
+            )
+            public_ids = [public_id] if public_id else []
+        for public_id in public_ids:
+            transaction.on_commit(partial(destroy_asset, public_id))
     
     def get_accessed_time(self, name):
         """Get last accessed time"""
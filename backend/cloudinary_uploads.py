@@ -0,0 +1,321 @@
+"""
+Cloudinary uploaders and the deferred upload queue
+
+With ``CLOUDINARY_DEFERRED_UPLOADS`` on, ``CustomCloudinaryStorage`` does
+not upload inside the request. It writes the file to a local staging
+directory and the field stores a ``pending/<token>/<public_id>`` name
+instead. Once the transaction commits, a background thread pool uploads
+the staged file, retrying with exponential backoff, and swaps the pending
+name for the returned ``secure_url`` in every row that references it.
+The upload is only queued once the row storing the pending name has been
+saved (see ``submit_staged_uploads``): under autocommit, on_commit hooks
+run at once, before the model row exists.
+
+The uploader is pluggable through ``CLOUDINARY_UPLOADER`` so tests and
+offline environments can use ``StubUploader`` instead of the network.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache, partial
+
+import cloudinary.api
+import cloudinary.uploader
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from backend.models import StoredAsset
+from backend.request_metrics import count_cloudinary_call
+
+PENDING_PREFIX = 'pending/'
+TOKEN_LENGTH = 8
+# Room a pending name needs on top of the public_id
+PENDING_NAME_OVERHEAD = len(PENDING_PREFIX) + TOKEN_LENGTH + 1
+# Seconds after which a staged file no saved row stores is given up on:
+# the save that staged it failed or was rolled back
+ABANDONED_STAGE_AGE = 60 * 60
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    pass
+
+
+class CloudinaryUploader:
+    """Upload images with the Cloudinary SDK"""
+
+    def upload(self, file, public_id):
+        count_cloudinary_call()
+        return cloudinary.uploader.upload(
+            file,
+            public_id=public_id,
+            resource_type="image",
+            overwrite=True,
+            invalidate=True,
+            use_filename=True,
+            unique_filename=True,
+        )
+
+    def destroy(self, public_id):
+        count_cloudinary_call()
+        return cloudinary.uploader.destroy(public_id)
+
+    def resources(self, public_ids):
+        """Stored metadata of the existing assets among ``public_ids`` (at most 100)"""
+        count_cloudinary_call()
+        return cloudinary.api.resources_by_ids(
+            list(public_ids), resource_type='image', max_results=len(public_ids)
+        ).get('resources', [])
+
+
+class StubUploader:
+    """
+    Offline stand-in for CloudinaryUploader that records what it receives.
+    The first ``failures`` uploads raise UploadError, to exercise retries.
+    """
+    base_url = 'https://res.cloudinary.com/stub/image/upload'
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.uploads = []
+        self.destroyed = []
+        # public_id -> upload result, for resources()
+        self.assets = {}
+        self.lock = threading.Lock()
+
+    def upload(self, file, public_id):
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'rb') as staged:
+                content = staged.read()
+        else:
+            content = file.read()
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise UploadError(f'Stub upload of {public_id} failed')
+            self.uploads.append(public_id)
+            result = self.assets[public_id] = {
+                'public_id': public_id,
+                'version': 1,
+                'bytes': len(content),
+                'secure_url': f'{self.base_url}/v1/{public_id}',
+            }
+        return result
+
+    def destroy(self, public_id):
+        with self.lock:
+            self.destroyed.append(public_id)
+            self.assets.pop(public_id, None)
+        return {'result': 'ok'}
+
+    def resources(self, public_ids):
+        with self.lock:
+            return [
+                self.assets[public_id] for public_id in public_ids
+                if public_id in self.assets
+            ]
+
+
+@lru_cache(maxsize=None)
+def load_uploader(path):
+    return import_string(path)()
+
+
+def get_uploader():
+    return load_uploader(settings.CLOUDINARY_UPLOADER)
+
+
+def is_pending_upload(name):
+    return bool(name) and name.startswith(PENDING_PREFIX)
+
+
+def make_pending_name(public_id):
+    return f'{PENDING_PREFIX}{uuid.uuid4().hex[:TOKEN_LENGTH]}/{public_id}'
+
+
+def pending_public_id(name):
+    return name[len(PENDING_PREFIX):].split('/', 1)[1]
+
+
+def staged_path(name):
+    return os.path.join(
+        settings.CLOUDINARY_UPLOAD_STAGING_DIR, name[len(PENDING_PREFIX):]
+    )
+
+
+def stage_file(name, content):
+    """Write ``content`` to the staging area under the pending ``name``"""
+    path = staged_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    with open(path, 'wb') as staged:
+        for chunk in content.chunks():
+            staged.write(chunk)
+    return path
+
+
+def discard_staged_file(name):
+    path = staged_path(name)
+    try:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+def file_fields():
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def replace_file_name(old_name, new_name):
+    """Point every file field storing ``old_name`` at ``new_name``"""
+    updated = 0
+    for model, field in file_fields():
+        updated += model._base_manager.filter(
+            **{field.name: old_name}
+        ).update(**{field.name: new_name})
+    return updated
+
+
+def with_retries(func, attempts, delay):
+    """Call ``func`` until it returns a truthy value, backing off exponentially"""
+    for attempt in range(attempts):
+        try:
+            result = func()
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            result = None
+        if result:
+            return result
+        if attempt < attempts - 1:
+            time.sleep(delay * 2 ** attempt)
+    return result
+
+
+def process_pending_upload(name):
+    """
+    Upload the staged file behind the pending ``name`` and swap in its URL.
+    Returns the stored URL, or None when no row references the upload any
+    more (the row was deleted or its transaction rolled back).
+    """
+    attempts = settings.CLOUDINARY_UPLOAD_MAX_ATTEMPTS
+    delay = settings.CLOUDINARY_UPLOAD_RETRY_DELAY
+    public_id = pending_public_id(name)
+
+    result = with_retries(
+        lambda: get_uploader().upload(staged_path(name), public_id),
+        attempts, delay
+    )
+    url = result.get('secure_url') or result.get('public_id', public_id)
+    StoredAsset.objects.record(url, result)
+
+    if not replace_file_name(name, url):
+        url = None
+    discard_staged_file(name)
+    return url
+
+
+def destroy_asset(public_id):
+    try:
+        get_uploader().destroy(public_id)
+    except Exception:
+        # An orphaned remote asset is harmless; the row is already gone
+        pass
+
+
+class DeferredUploadQueue:
+    """Background thread pool running process_pending_upload"""
+
+    def __init__(self):
+        self.executor = None
+        self.futures = set()
+        self.lock = threading.Lock()
+
+    def submit(self, name):
+        workers = settings.CLOUDINARY_UPLOAD_WORKERS
+        if workers <= 0:
+            return self.run(name, close_connections=False)
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix='cloudinary-upload',
+                )
+            future = self.executor.submit(self.run, name)
+            self.futures.add(future)
+        future.add_done_callback(self.discard)
+        return future
+
+    def run(self, name, close_connections=True):
+        try:
+            return process_pending_upload(name)
+        except Exception:
+            # Left staged for the process_pending_uploads command
+            logger.exception('Deferred upload of %s failed', name)
+            return None
+        finally:
+            # Worker threads get their own connections; don't leak them
+            if close_connections:
+                connections.close_all()
+
+    def discard(self, future):
+        with self.lock:
+            self.futures.discard(future)
+
+    def wait(self, timeout=None):
+        """Block until every upload submitted so far has finished"""
+        with self.lock:
+            futures = list(self.futures)
+        wait(futures, timeout=timeout)
+
+
+deferred_uploads = DeferredUploadQueue()
+
+
+# Pending names staged by this process whose rows haven't been saved yet,
+# with the time they were staged
+staged_names = {}
+staged_names_lock = threading.Lock()
+
+
+def track_staged_upload(name):
+    """Upload ``name`` once a row storing it is saved and committed"""
+    now = time.monotonic()
+    with staged_names_lock:
+        # Forget names whose save raised or was rolled back; their files
+        # are swept by process_pending_uploads
+        for staged, staged_at in list(staged_names.items()):
+            if now - staged_at > ABANDONED_STAGE_AGE:
+                del staged_names[staged]
+        staged_names[name] = now
+
+
+@receiver(post_save)
+def submit_staged_uploads(sender, instance, using, **kwargs):
+    if not staged_names:
+        return
+    for field in instance._meta.concrete_fields:
+        if not isinstance(field, models.FileField):
+            continue
+        name = getattr(instance, field.attname).name
+        with staged_names_lock:
+            if staged_names.pop(name, None) is None:
+                continue
+        transaction.on_commit(
+            partial(deferred_uploads.submit, name), using=using
+        )
@@ -0,0 +1,99 @@
+"""
+Threaded comment trees for podcasts and expert profiles
+
+All comments of a podcast or expert are fetched in a single query and
+arranged into parent -> children threads in memory, so serializing a
+thread never has to query for replies.
+"""
+from django.conf import settings
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+
+def get_max_depth_limit():
+    return getattr(settings, 'COMMENT_THREAD_MAX_DEPTH', 10)
+
+
+def build_comment_tree(comments, max_depth=None):
+    """
+    Arrange ``comments`` into threads in O(n) and return the root comments
+    in their original order.
+
+    Every comment gets a ``tree_replies`` list holding its direct replies.
+    Replies nested deeper than ``max_depth`` levels below a root are
+    dropped from the tree (``max_depth=0`` keeps only the roots).
+    """
+    nodes = list(comments)
+    by_id = {comment.id: comment for comment in nodes}
+    roots = []
+    for comment in nodes:
+        comment.tree_replies = []
+    for comment in nodes:
+        parent = by_id.get(comment.parent_id)
+        if parent is None:
+            roots.append(comment)
+        else:
+            parent.tree_replies.append(comment)
+
+    if max_depth is not None:
+        level = roots
+        for _ in range(max_depth):
+            level = [reply for comment in level for reply in comment.tree_replies]
+        for comment in level:
+            comment.tree_replies = []
+    return roots
+
+
+class CommentThreadPagination(PageNumberPagination):
+    """
+    Page over the root comments (threads), each with its full reply tree.
+    Only applied when ``page`` or ``page_size`` is passed so existing
+    clients keep receiving a plain list.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if (self.page_query_param not in params and
+                self.page_size_query_param not in params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class CommentThreadsMixin:
+    """
+    View mixin rendering a comment queryset as threads.
+
+    ``comment_max_depth`` is the default reply depth for the view; clients
+    can ask for less or more with ``?max_depth=``, capped at
+    ``settings.COMMENT_THREAD_MAX_DEPTH``.
+    """
+    comment_max_depth = None
+    thread_pagination_class = CommentThreadPagination
+
+    def get_comment_max_depth(self):
+        limit = get_max_depth_limit()
+        default = self.comment_max_depth
+        if default is None:
+            default = limit
+        try:
+            depth = int(self.request.query_params['max_depth'])
+        except (KeyError, ValueError):
+            return min(default, limit)
+        return max(0, min(depth, limit))
+
+    def comment_threads_response(self, comments, serializer_class):
+        roots = build_comment_tree(
+            comments.select_related('user'),
+            max_depth=self.get_comment_max_depth()
+        )
+        context = {'request': self.request, 'view': self}
+        pagination = self.thread_pagination_class()
+        page = pagination.paginate_queryset(roots, self.request, view=self)
+        if page is not None:
+            serializer = serializer_class(page, many=True, context=context)
+            return pagination.get_paginated_response(serializer.data)
+        serializer = serializer_class(roots, many=True, context=context)
+        return Response(serializer.data)
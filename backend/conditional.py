@@ -0,0 +1,51 @@
+"""
+Conditional GET for detail endpoints
+
+``ConditionalRetrieveMixin`` answers If-None-Match / If-Modified-Since
+with 304 Not Modified from validators the view loads in one query, before
+the object is fetched or serialized. Views return the values that change
+whenever the response does (the row's updated_at, the newest related
+timestamps and the related row counts, which catch deletions) from
+``get_validator_state``. Views that don't override it are validated on
+the object's pk and updated_at, which takes the usual get_object() query.
+
+Related rows that are only nested in the response are not covered beyond
+what the views list explicitly (owner usernames, the podcast category's
+name): renaming an expert category or a commenter, for example, leaves
+cached detail pages valid until something else about the object changes.
+"""
+import hashlib
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+def validators(state):
+    """ETag over every value in ``state``, Last-Modified from its newest timestamp"""
+    digest = hashlib.md5(repr(sorted(state.items())).encode()).hexdigest()
+    timestamps = [value for value in state.values() if isinstance(value, datetime)]
+    return quote_etag(digest), max(timestamps, default=None)
+
+
+class ConditionalRetrieveMixin:
+    def get_validator_state(self):
+        """
+        Return a dict of the values the response depends on, raising
+        exactly as get_object() would for a missing or hidden object
+        """
+        obj = self.get_object()
+        return {'pk': obj.pk, 'updated_at': getattr(obj, 'updated_at', None)}
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = validators(self.get_validator_state())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
@@ -0,0 +1,136 @@
+"""
+Cached Cloudinary URL resolution for stored image names
+
+Image fields hold either a full ``secure_url`` (current uploads) or a bare
+Cloudinary public_id (legacy rows). Building a URL for a public_id goes
+through the Cloudinary SDK, which is slow enough to show up when a long
+list is serialized, so resolved URLs are kept in a bounded LRU cache
+shared by the models and ``CustomCloudinaryStorage``. The default image
+URLs are resolved once per process.
+
+Named presets from ``IMAGE_TRANSFORMATION_PRESETS`` (thumb, card, hero)
+rewrite a Cloudinary delivery URL into a width/format/quality-constrained
+derivative, so list pages don't download full-resolution originals.
+"""
+import os
+import re
+from functools import lru_cache
+
+from cloudinary.utils import cloudinary_url, generate_transformation_string
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+def is_absolute_url(name):
+    return name.startswith('http://') or name.startswith('https://')
+
+
+@lru_cache(maxsize=getattr(settings, 'IMAGE_URL_CACHE_SIZE', 4096))
+def cloudinary_image_url(public_id):
+    url, _ = cloudinary_url(public_id, secure=True, resource_type="image")
+    return url
+
+
+def image_url_cache_info():
+    """Hit/miss counters and size of the public_id -> URL cache"""
+    return cloudinary_image_url.cache_info()
+
+
+def resolve_image_url(name):
+    """URL for a stored image name, or '' when there is none"""
+    if not name:
+        return ''
+    if is_absolute_url(name):
+        return name
+    return cloudinary_image_url(name.lstrip('/')) or ''
+
+
+# Delivery URLs Cloudinary can transform: .../<cloud>/image/upload/<rest>
+CLOUDINARY_UPLOAD_URL = re.compile(
+    r'^(https?://res\.cloudinary\.com/[^/]+/image/upload/)(.+)$'
+)
+
+# Version segment of a delivery path; only transformations precede it
+CLOUDINARY_VERSION = re.compile(r'^(?:.*?/)?v\d+/(.+)$')
+
+
+def cloudinary_public_id(url):
+    """
+    public_id a Cloudinary delivery URL was built from, or None when ``url``
+    is not one: ``.../image/upload/[transformations/]v123/folder/name.jpg``
+    gives ``folder/name``.
+    """
+    match = CLOUDINARY_UPLOAD_URL.match(url or '')
+    if not match:
+        return None
+    path = match.group(2).split('?', 1)[0]
+    versioned = CLOUDINARY_VERSION.match(path)
+    if versioned:
+        path = versioned.group(1)
+    return os.path.splitext(path)[0] or None
+
+
+def image_presets():
+    return settings.IMAGE_TRANSFORMATION_PRESETS
+
+
+@lru_cache(maxsize=getattr(settings, 'IMAGE_URL_CACHE_SIZE', 4096))
+def transformed_image_url(url, preset):
+    """
+    ``url`` with the named preset's transformation applied. URLs that are
+    not Cloudinary deliveries (e.g. the relative default fallback) come
+    back unchanged.
+    """
+    match = CLOUDINARY_UPLOAD_URL.match(url or '')
+    if not match:
+        return url
+    transformation, _ = generate_transformation_string(
+        **image_presets()[preset]
+    )
+    return f'{match.group(1)}{transformation}/{match.group(2)}'
+
+
+def image_variants(url):
+    """Preset name -> derivative URL for every configured preset"""
+    return {
+        preset: transformed_image_url(url, preset) for preset in image_presets()
+    }
+
+
+def image_srcset(url):
+    """
+    ``srcset`` attribute value listing each preset at its width, or '' when
+    ``url`` can't be transformed.
+    """
+    if not CLOUDINARY_UPLOAD_URL.match(url or ''):
+        return ''
+    return ', '.join(
+        f"{transformed_image_url(url, preset)} {options['width']}w"
+        for preset, options in image_presets().items()
+        if options.get('width')
+    )
+
+
+@lru_cache(maxsize=None)
+def default_image_url(setting, fallback):
+    """
+    URL of the default image named by ``settings.<setting>``, falling back
+    to a relative path when Cloudinary cannot build one.
+    """
+    default_image = getattr(settings, setting, fallback)
+    try:
+        url = resolve_image_url(default_image)
+        if url:
+            return url
+    except Exception:
+        pass
+    return f"/{default_image}"
+
+
+@receiver(setting_changed)
+def clear_default_image_urls(setting, **kwargs):
+    if setting.startswith('CLOUDINARY_DEFAULT_'):
+        default_image_url.cache_clear()
+    elif setting == 'IMAGE_TRANSFORMATION_PRESETS':
+        transformed_image_url.cache_clear()
@@ -0,0 +1,172 @@
+"""
+Content-addressed local-disk storage for offline and dev deployments
+
+Files are stored under ``LOCAL_MEDIA_ROOT`` by the SHA-256 of their
+content (``ab/cd/abcd....jpg``), so saving the same image again reuses the
+existing file instead of writing a copy. Because a stored name always
+refers to the same bytes, ``serve_media`` can hand them out with
+long-lived immutable cache headers.
+
+Files are reference counted: backend.signals releases a file once the row
+that replaced or deleted it is committed, and ``release`` deletes it if no
+other row stores the same name. ``delete`` itself keeps a file that is
+still referenced.
+
+Select it with ``MEDIA_STORAGE_BACKEND=backend.local_storage.ContentAddressedStorage``.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import connections, models, transaction
+from django.utils.deconstruct import deconstructible
+
+from backend.cloudinary_uploads import file_fields
+from backend.image_urls import is_absolute_url
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def content_addressed_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+        and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def is_referenced(name):
+    """
+    Whether any content-addressed file field still stores ``name``. The
+    file fields are indexed (db_index=True) so this is one index lookup per
+    field, not a table scan, on every release.
+    """
+    return any(
+        model._base_manager.filter(**{field.name: name}).exists()
+        for model, field in file_fields()
+        if isinstance(field.storage, ContentAddressedStorage)
+    )
+
+
+def lock_name(name, using='default'):
+    """
+    Hold a PostgreSQL advisory lock on ``name`` until the current
+    transaction ends, so releasing a file waits for a transaction that is
+    saving the same content to commit its row. Other databases serialize
+    writes already.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    key = int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], 'big', signed=True)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+
+
+def mark_used(path):
+    # Set explicitly: the filesystem's coarse clock may lag time.time()
+    now = time.time()
+    os.utime(path, (now, now))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Local storage keyed by content hash. Identical uploads share one file,
+    which is only removed once no row references it.
+    """
+
+    def __init__(self, location=None, base_url=None, **kwargs):
+        super().__init__(
+            location=location or settings.LOCAL_MEDIA_ROOT,
+            base_url=base_url or settings.LOCAL_MEDIA_URL,
+            **kwargs
+        )
+
+    def hashed_name(self, name, content):
+        digest = content_hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        return f'{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    def get_available_name(self, name, max_length=None):
+        # _save picks the final name from the content, never a suffixed copy
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        path = self.path(name)
+        lock_name(name)
+        if os.path.exists(path):
+            mark_used(path)
+            return name
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file and move it into place, so a concurrent
+        # save of the same content never exposes a partial file
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    temp_file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, path)
+            mark_used(path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    def url(self, name):
+        # Rows uploaded to Cloudinary before switching backends keep working
+        if name and is_absolute_url(name):
+            return name
+        return super().url(name)
+
+    def exists(self, name):
+        if name and is_absolute_url(name):
+            return False
+        return super().exists(name)
+
+    def delete(self, name):
+        if not name or is_absolute_url(name):
+            return
+        # Other rows may share the same content
+        if is_referenced(name):
+            return
+        super().delete(name)
+
+    def release(self, name, released_at, using='default'):
+        """
+        Delete ``name`` once the row that stored it has been committed,
+        unless another row still stores it. A file saved again after
+        ``released_at`` is kept: the row saving it may not have committed
+        yet, and is_referenced cannot see it.
+        """
+        if not name or is_absolute_url(name):
+            return
+        with transaction.atomic(using=using):
+            lock_name(name, using)
+            try:
+                modified = os.path.getmtime(self.path(name))
+            except OSError:
+                return
+            if modified >= released_at:
+                return
+            self.delete(name)
@@ -0,0 +1,44 @@
+"""
+Logging handlers
+
+``QueueLogHandler`` only puts records on an in-memory queue; a listener
+thread formats them and writes them out, so requests never wait on log
+I/O (under gunicorn, every worker shares stdout). Python 3.12's dictConfig
+can wire a QueueHandler to a listener itself; this runtime is 3.11.
+"""
+import copy
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Write records to ``stream`` (stderr by default) from a background
+    thread. The formatter set on this handler is applied on that thread.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Merge the arguments now, as later changes to them must not show
+        # up in the log, but leave the formatting to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def close(self):
+        # Drains the queue before the process exits
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.target.close()
+        super().close()
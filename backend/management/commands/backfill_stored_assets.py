@@ -0,0 +1,121 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from backend.cloudinary_uploads import PENDING_PREFIX, file_fields, load_uploader
+from backend.image_urls import cloudinary_public_id, is_absolute_url
+from backend.models import StoredAsset
+
+# Most public_ids Cloudinary looks up in one call
+MAX_BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Register the images stored before the uploaded asset registry '
+        'existed, with their size and dimensions looked up on Cloudinary in '
+        'batches. Values Cloudinary does not know are reported; clear them '
+        'with cleanup_broken_images --unregistered.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MAX_BATCH_SIZE,
+            help=f'public_ids looked up per Cloudinary call (default and maximum: {MAX_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--uploader',
+            default=settings.CLOUDINARY_UPLOADER,
+            help='Uploader class path, e.g. backend.cloudinary_uploads.StubUploader for offline runs',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Look the images up without registering them',
+        )
+
+    def unregistered_names(self):
+        """Distinct stored file names with no registry entry"""
+        names = set()
+        for model, field in file_fields():
+            stored = OuterRef(field.name)
+            names.update(
+                model._base_manager
+                .exclude(**{f'{field.name}__isnull': True})
+                .exclude(**{field.name: ''})
+                .exclude(**{f'{field.name}__startswith': PENDING_PREFIX})
+                .exclude(Exists(StoredAsset.objects.filter(name=stored)))
+                .exclude(Exists(StoredAsset.objects.filter(public_id=stored)))
+                .values_list(field.name, flat=True)
+                .distinct()
+                .iterator()
+            )
+        return sorted(names)
+
+    def handle(self, *args, **options):
+        uploader = load_uploader(options['uploader'])
+        batch_size = min(max(1, options['batch_size']), MAX_BATCH_SIZE)
+        dry_run = options['dry_run']
+        totals = {'registered': 0, 'unknown': 0, 'skipped': 0, 'failed': 0}
+
+        # public_id -> stored names: a legacy public_id and its secure_url
+        # may both be in use
+        public_ids = {}
+        for name in self.unregistered_names():
+            public_id = (
+                cloudinary_public_id(name) if is_absolute_url(name)
+                else name.strip('/')
+            )
+            if public_id:
+                public_ids.setdefault(public_id, []).append(name)
+            else:
+                totals['skipped'] += 1
+        self.stdout.write(f'Looking up {len(public_ids)} unregistered images...')
+
+        pending = iter(sorted(public_ids))
+        while True:
+            batch = list(islice(pending, batch_size))
+            if not batch:
+                break
+            try:
+                resources = uploader.resources(batch)
+            except Exception as e:
+                self.stderr.write(f'Lookup of {batch[0]}... failed: {e}')
+                totals['failed'] += sum(len(public_ids[p]) for p in batch)
+                continue
+            found = {resource['public_id']: resource for resource in resources}
+            assets = []
+            for public_id in batch:
+                names = public_ids[public_id]
+                resource = found.get(public_id)
+                if resource is None:
+                    totals['unknown'] += len(names)
+                    for name in names:
+                        self.stdout.write(self.style.WARNING(f'Not on Cloudinary: {name}'))
+                    continue
+                totals['registered'] += len(names)
+                assets.extend(
+                    StoredAsset(
+                        name=name,
+                        public_id=public_id,
+                        version=str(resource.get('version') or ''),
+                        size=resource.get('bytes') or 0,
+                        width=resource.get('width'),
+                        height=resource.get('height'),
+                        format=resource.get('format') or '',
+                    )
+                    for name in names
+                )
+            if assets and not dry_run:
+                StoredAsset.objects.bulk_create(assets, ignore_conflicts=True)
+
+        verb = 'Would register' if dry_run else 'Registered'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['registered']} images. "
+            f"{totals['unknown']} not on Cloudinary, "
+            f"{totals['skipped']} not Cloudinary URLs, "
+            f"{totals['failed']} failed lookups."
+        ))
@@ -0,0 +1,176 @@
+import json
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from benchmarks import suite
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the hot API endpoints against a seeded test database: '
+        'p50/p95 latency, SQL query count and response bytes per endpoint, '
+        'compared with a stored baseline. Exits non-zero on regressions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--baseline',
+            default=os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json'),
+            help='Baseline JSON to compare with (default: benchmarks/baseline.json)',
+        )
+        parser.add_argument(
+            '--update-baseline',
+            action='store_true',
+            help='Write the results to the baseline instead of comparing',
+        )
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            default=[],
+            choices=[name for name, _, _ in suite.ENDPOINTS],
+            help='Only benchmark this endpoint; may be repeated',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=30,
+            help='Timed requests per endpoint (default: 30)',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=3,
+            help='Untimed requests per endpoint first (default: 3)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the results as JSON to this file',
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the seeded test database between runs',
+        )
+        parser.add_argument(
+            '--noinput', '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Delete a leftover test database without asking',
+        )
+
+    def load_baseline(self, path):
+        try:
+            with open(path) as baseline_file:
+                return json.load(baseline_file)
+        except FileNotFoundError:
+            raise CommandError(
+                f'No baseline at {path}; create one with --update-baseline.'
+            )
+        except ValueError as e:
+            raise CommandError(f'Cannot read baseline {path}: {e}')
+
+    def seed(self):
+        if User.objects.filter(username__startswith=f'{suite.DATASET_PREFIX}_').exists():
+            return
+        self.stdout.write('Seeding the benchmark database...')
+        call_command(
+            'generate_load_dataset',
+            prefix=suite.DATASET_PREFIX,
+            seed=suite.DATASET_SEED,
+            verbosity=0,
+            **suite.DATASET_VOLUMES,
+        )
+
+    def measure(self, options):
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment(debug=False)
+        connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=not options['interactive'],
+            keepdb=options['keepdb'],
+        )
+        try:
+            self.seed()
+            return suite.run(
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                names=options['endpoint'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+
+    def handle(self, *args, **options):
+        baseline = None
+        if not options['update_baseline']:
+            baseline = self.load_baseline(options['baseline'])
+            if baseline.get('dataset') != suite.dataset():
+                raise CommandError(
+                    'The baseline was recorded on a different dataset; '
+                    'rerun with --update-baseline.'
+                )
+
+        results = self.measure(options)
+
+        self.stdout.write(
+            f"{'endpoint':<18} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'bytes':>9}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<18} {result['p50_ms']:>8} {result['p95_ms']:>8} "
+                f"{result['queries']:>8} {result['bytes']:>9}"
+            )
+        report = {
+            'database': connection.vendor,
+            'dataset': suite.dataset(),
+            'iterations': options['iterations'],
+            'recorded': timezone.now().isoformat(),
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+
+        if options['update_baseline']:
+            if options['endpoint'] and os.path.exists(options['baseline']):
+                # Keep the endpoints that weren't measured this time
+                previous = self.load_baseline(options['baseline'])
+                report['endpoints'] = {**previous.get('endpoints', {}), **results}
+                report['tolerances'] = previous.get('tolerances', suite.DEFAULT_TOLERANCES)
+            else:
+                report['tolerances'] = suite.DEFAULT_TOLERANCES
+            with open(options['baseline'], 'w') as baseline_file:
+                json.dump(report, baseline_file, indent=2)
+                baseline_file.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}."))
+            return
+
+        # Latency only carries over between runs on the same database engine
+        latency = baseline.get('database') == connection.vendor
+        if not latency:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline was recorded on {baseline.get('database')}, not "
+                f"{connection.vendor}; comparing queries and bytes only."
+            ))
+        regressions = suite.compare(
+            results, baseline, baseline.get('tolerances'), latency=latency
+        )
+        if regressions:
+            raise CommandError(
+                'Benchmark regressions:\n' + '\n'.join(f'  {line}' for line in regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(results)} endpoint(s) within the baseline.'
+        ))
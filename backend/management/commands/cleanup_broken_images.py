@@ -1,44 +1,92 @@
 from django.core.management.base import BaseCommand
-from experts.models import ExpertProfile
-from podcasts.models import Podcast
+from django.db import models
+from django.db.models import Exists, OuterRef, Q
+from backend.cloudinary_storage import CustomCloudinaryStorage
+from backend.cloudinary_uploads import PENDING_PREFIX, file_fields
+from backend.models import StoredAsset
+
+# Known-bad uploads whose references are always cleared
+DEFAULT_PATTERNS = ['Black_Siorc_Logo']
 
 
 class Command(BaseCommand):
-    help = 'Clean up broken image references in the database'
-    
+    help = (
+        'Clean up broken image references in the database. Every image '
+        'field is audited with one set-based UPDATE, so it runs in '
+        'constant memory on large tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pattern',
+            action='append',
+            dest='patterns',
+            help=(
+                'Clear references containing this text; may be repeated '
+                f'(default: {", ".join(DEFAULT_PATTERNS)})'
+            ),
+        )
+        parser.add_argument(
+            '--unregistered',
+            action='store_true',
+            help=(
+                'Also clear references missing from the uploaded asset '
+                'registry, in fields stored on Cloudinary. Only use once the '
+                'registry has been backfilled with backfill_stored_assets.'
+            ),
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count broken references without clearing them',
+        )
+
+    def broken_references(self, field, patterns, unregistered):
+        """Q matching values of ``field`` the rules consider broken"""
+        broken = Q()
+        for pattern in patterns:
+            broken |= Q(**{f'{field.name}__contains': pattern})
+        if unregistered:
+            stored = OuterRef(field.name)
+            broken |= (
+                ~Q(**{f'{field.name}__startswith': PENDING_PREFIX})
+                & ~Exists(StoredAsset.objects.filter(name=stored))
+                & ~Exists(StoredAsset.objects.filter(public_id=stored))
+            )
+        return broken
+
     def handle(self, *args, **options):
+        patterns = options['patterns'] or DEFAULT_PATTERNS
+        dry_run = options['dry_run']
         self.stdout.write('Starting cleanup of broken image references...')
-        
-        # Clean up expert profile pictures
-        self.stdout.write('Cleaning up expert profile pictures...')
-        experts = ExpertProfile.objects.all()
-        
-        for expert in experts:
-            if expert.profile_picture and expert.profile_picture.name:
-                # Check if the image name contains the broken pattern
-                if 'Black_Siorc_Logo' in expert.profile_picture.name:
-                    self.stdout.write(
-                        f'Removing broken image reference for expert: '
-                        f'{expert.name}'
-                    )
-                    expert.profile_picture = None
-                    expert.save()
-        
-        # Clean up podcast images
-        self.stdout.write('Cleaning up podcast images...')
-        podcasts = Podcast.objects.all()
-        
-        for podcast in podcasts:
-            if podcast.image and podcast.image.name:
-                # Check if the image name contains the broken pattern
-                if 'Black_Siorc_Logo' in podcast.image.name:
-                    self.stdout.write(
-                        f'Removing broken image reference for podcast: '
-                        f'{podcast.title}'
-                    )
-                    podcast.image = None
-                    podcast.save()
-        
-        self.stdout.write(
-            self.style.SUCCESS('Cleanup completed successfully!')
-        )
+
+        total = 0
+        for model, field in file_fields():
+            if not isinstance(field, models.ImageField):
+                continue
+            rows = (
+                model._base_manager
+                .exclude(**{f'{field.name}__isnull': True})
+                .exclude(**{field.name: ''})
+                .filter(self.broken_references(
+                    field, patterns,
+                    # Only Cloudinary uploads are ever registered
+                    options['unregistered']
+                    and isinstance(field.storage, CustomCloudinaryStorage),
+                ))
+            )
+            # One UPDATE per field; skips save(), signals and auto_now
+            cleared = None if field.null else ''
+            count = rows.count() if dry_run else rows.update(**{field.name: cleared})
+            total += count
+            if count:
+                verb = 'Would clear' if dry_run else 'Cleared'
+                self.stdout.write(
+                    f'{verb} {count} broken {model._meta.label}.{field.name} '
+                    f'references'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Cleanup completed: {total} broken references "
+            f"{'found' if dry_run else 'cleared'}."
+        ))
@@ -0,0 +1,412 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from backend.bulk_load import insert_rows, rebuild_search_vectors, reset_sequences
+from experts.models import (
+    ExpertCategory, ExpertComment, ExpertProfile, ExpertReaction,
+)
+from podcasts.models import (
+    Category, Podcast, PodcastComment, PodcasterProfile, PodcastLike,
+)
+from user_messages.models import Conversation, Message
+from users.models import UserProfile
+
+User = get_user_model()
+
+# Timestamps are spread over this window so every run produces the same rows
+EPOCH = datetime(2023, 1, 1, tzinfo=dt_timezone.utc)
+SPAN_SECONDS = 2 * 365 * 24 * 60 * 60
+
+CATEGORY_NAMES = [
+    'Technology', 'Business', 'Science', 'Health', 'Education',
+    'Entertainment', 'Sports', 'News', 'Arts', 'Lifestyle', 'History',
+    'Comedy',
+]
+WORDS = (
+    'data cloud design market health science story music future climate '
+    'startup money culture travel food code space energy city mind game '
+    'learning leadership product history art sport news life tech world'
+).split()
+FIRST_NAMES = 'Ada Alan Grace Linus Margaret Ken Barbara Dennis Frances Tim Radia Guido'.split()
+LAST_NAMES = 'Lovelace Turing Hopper Torvalds Hamilton Thompson Liskov Ritchie Allen Lee Perlman Rossum'.split()
+
+
+class Zipf:
+    """
+    Draw from ``items`` with Zipf-like skew: after a seeded shuffle, the
+    i-th item is picked in proportion to 1 / (i + 1) ** s.
+    """
+
+    def __init__(self, items, rng, s=1.1):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.rng = rng
+        self.cum_weights = list(accumulate(1 / (i + 1) ** s for i in range(len(self.items))))
+
+    def __call__(self, k=None):
+        if k is None:
+            return self.rng.choices(self.items, cum_weights=self.cum_weights)[0]
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large, deterministic dataset for load tests and '
+        'benchmarks: users, experts, podcasts, comment threads, likes, '
+        'reactions and conversations, with popularity skewed towards a '
+        'few hot rows. The same --seed always produces the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument('--prefix', default='load', help='Username prefix of generated users (default: load)')
+        volumes = (
+            ('users', 2000), ('experts', 300), ('podcasters', 200),
+            ('podcasts', 1000), ('comments', 10000), ('likes', 20000),
+            ('expert-views', 6000), ('bookmarks', 1500), ('reactions', 3000),
+            ('conversations', 1500), ('messages', 20000),
+            ('expert-comments', 3000),
+        )
+        for name, default in volumes:
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Number of {name.replace("-", " ")} (default: {default})',
+            )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Rows per INSERT batch (default: 2000)',
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete users with the prefix (and everything they own) first',
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = max(1, options['batch_size'])
+        self.prefix = options['prefix']
+        generated_users = User.objects.filter(username__startswith=f'{self.prefix}_')
+        if options['clear']:
+            deleted, _ = generated_users.delete()
+            self.stdout.write(f'Deleted {deleted} previously generated rows.')
+        elif generated_users.exists():
+            raise CommandError(
+                f"Users prefixed '{self.prefix}_' already exist; use --clear or another --prefix."
+            )
+        if options['experts'] + options['podcasters'] > options['users']:
+            raise CommandError('--experts plus --podcasters cannot exceed --users.')
+
+        started = time.perf_counter()
+        self.counts = {}
+        with transaction.atomic():
+            users = self.create_users(options['users'], options['experts'])
+            expert_users = users[:options['experts']]
+            podcaster_users = users[options['experts']:options['experts'] + options['podcasters']]
+            experts = self.create_experts(expert_users)
+            podcasts = self.create_podcasts(podcaster_users, options['podcasts'])
+            self.create_expert_activity(experts, users, options)
+            self.create_comments(
+                PodcastComment, 'podcast', podcasts, users, options['comments']
+            )
+            self.create_likes(podcasts, users, options['likes'])
+            self.create_messages(users, options['conversations'], options['messages'])
+            self.create_comments(
+                ExpertComment, 'expert', experts, users, options['expert_comments']
+            )
+
+            touched = [
+                User, UserProfile, ExpertCategory, ExpertComment, ExpertProfile, ExpertReaction,
+                Category, PodcasterProfile, Podcast, PodcastComment, PodcastLike,
+                Message, Conversation,
+            ]
+            reset_sequences(touched)
+            rebuild_search_vectors([ExpertProfile, Podcast])
+            call_command(
+                'recount_podcast_counters',
+                stdout=self.stdout if options['verbosity'] > 1 else StringIO(),
+            )
+
+        if options['verbosity'] < 1:
+            return
+        for label, count in self.counts.items():
+            self.stdout.write(f'  {label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {sum(self.counts.values())} rows in '
+            f'{time.perf_counter() - started:.1f}s (seed {options["seed"]}).'
+        ))
+
+    # Helpers
+
+    def next_pk(self, model):
+        return (model._base_manager.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+    def timestamp(self, after=EPOCH):
+        remaining = SPAN_SECONDS - (after - EPOCH).total_seconds()
+        return after + timedelta(seconds=self.rng.uniform(0, max(remaining, 1)))
+
+    def sentence(self, words=8):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words)).capitalize()
+
+    def insert(self, model, instances):
+        """Insert a stream of instances in batches; returns how many"""
+        count = 0
+        instances = iter(instances)
+        while True:
+            batch = list(islice(instances, self.batch_size))
+            if not batch:
+                break
+            insert_rows(model, batch)
+            count += len(batch)
+        self.counts[model._meta.label] = self.counts.get(model._meta.label, 0) + count
+        return count
+
+    def insert_links(self, field, pairs):
+        """bulk_create (source pk, target pk) rows of an M2M through table"""
+        through = field.remote_field.through
+        source = f'{field.m2m_field_name()}_id'
+        target = f'{field.m2m_reverse_field_name()}_id'
+        through._base_manager.bulk_create(
+            [through(**{source: a, target: b}) for a, b in pairs],
+            batch_size=self.batch_size,
+        )
+        self.counts[through._meta.label] = len(pairs)
+
+    def unique_pairs(self, count, first, second):
+        """Up to ``count`` distinct (first(), second()) pairs"""
+        pairs = set()
+        attempts = 0
+        while len(pairs) < count and attempts < count * 10:
+            pairs.add((first(), second()))
+            attempts += 1
+        return sorted(pairs)
+
+    def categories(self, model, **extra):
+        existing = list(model.objects.order_by('pk'))
+        if existing:
+            return existing
+        return [
+            model.objects.create(name=name, **extra)
+            for name in CATEGORY_NAMES
+        ]
+
+    # Generators
+
+    def create_users(self, count, expert_count):
+        # One hash for everyone: hashing per user would dominate the run
+        password = make_password('loadtest', salt='loadtestsalt')
+        start = self.next_pk(User)
+        users = []
+        for i in range(count):
+            first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            users.append(User(
+                pk=start + i,
+                username=f'{self.prefix}_{i:07d}',
+                email=f'{self.prefix}_{i:07d}@example.com',
+                first_name=first, last_name=last, password=password,
+                user_type='expert' if i < expert_count else 'podcaster',
+                email_verified=True, is_active=self.rng.random() > 0.02,
+                date_joined=self.timestamp(),
+            ))
+        self.insert(User, users)
+        profile_start = self.next_pk(UserProfile)
+        self.insert(UserProfile, (
+            UserProfile(pk=profile_start + i, user_id=user.pk)
+            for i, user in enumerate(users)
+        ))
+        return users
+
+    def create_experts(self, users):
+        categories = Zipf(
+            [category.pk for category in self.categories(ExpertCategory)], self.rng
+        )
+        start = self.next_pk(ExpertProfile)
+        experts = [
+            ExpertProfile(
+                pk=start + i, user_id=user.pk,
+                name=f'{user.first_name} {user.last_name}',
+                bio=self.sentence(30), expertise=self.sentence(3),
+                experience_years=self.rng.randint(1, 40),
+                is_approved=self.rng.random() < 0.9,
+                is_featured=self.rng.random() < 0.02,
+                created_at=self.timestamp(user.date_joined),
+            )
+            for i, user in enumerate(users)
+        ]
+        self.insert(ExpertProfile, experts)
+        self.insert_links(ExpertProfile._meta.get_field('categories'), sorted({
+            (expert.pk, category)
+            for expert in experts
+            for category in categories(self.rng.randint(1, 3))
+        }))
+        return experts
+
+    def create_podcasts(self, users, count):
+        start = self.next_pk(PodcasterProfile)
+        owners = [
+            PodcasterProfile(
+                pk=start + i, user_id=user.pk, bio=self.sentence(20),
+                created_at=user.date_joined, updated_at=user.date_joined,
+            )
+            for i, user in enumerate(users)
+        ]
+        self.insert(PodcasterProfile, owners)
+        if not owners:
+            return []
+
+        categories = Zipf([
+            category.pk for category in self.categories(Category)
+        ], self.rng)
+        pick_owner = Zipf(owners, self.rng)
+        start = self.next_pk(Podcast)
+        podcasts = []
+        for i in range(count):
+            owner = pick_owner()
+            created = self.timestamp(owner.created_at)
+            podcasts.append(Podcast(
+                pk=start + i, owner_id=owner.pk, category_id=categories(),
+                title=self.sentence(4), description=self.sentence(40),
+                link=f'https://example.com/podcasts/{start + i}',
+                is_approved=self.rng.random() < 0.9,
+                is_featured=self.rng.random() < 0.03,
+                created_at=created, updated_at=created,
+            ))
+        self.insert(Podcast, podcasts)
+        return podcasts
+
+    def create_expert_activity(self, experts, users, options):
+        if not experts:
+            return
+        pick_expert = Zipf([expert.pk for expert in experts], self.rng)
+        user_ids = [user.pk for user in users]
+
+        def pick_user():
+            return self.rng.choice(user_ids)
+
+        for name, option in (('views', 'expert_views'), ('bookmarks', 'bookmarks')):
+            self.insert_links(
+                ExpertProfile._meta.get_field(name),
+                self.unique_pairs(options[option], pick_expert, pick_user),
+            )
+
+        start = self.next_pk(ExpertReaction)
+        reactions = []
+        pairs = self.unique_pairs(options['reactions'], pick_expert, pick_user)
+        for i, (expert_id, user_id) in enumerate(pairs):
+            created = self.timestamp()
+            reactions.append(ExpertReaction(
+                pk=start + i, expert_id=expert_id, user_id=user_id,
+                reaction_type='like' if self.rng.random() < 0.8 else 'dislike',
+                created_at=created, updated_at=created,
+            ))
+        self.insert(ExpertReaction, reactions)
+
+    def create_comments(self, model, target_field, targets, users, count):
+        """Threaded comments on ``targets`` (podcasts or experts)"""
+        if not targets:
+            return
+        pick_target = Zipf(targets, self.rng)
+        user_ids = [user.pk for user in users]
+        start = self.next_pk(model)
+        # Top-level comments per target, so replies stay within a thread
+        threads = {}
+
+        def comments():
+            for i in range(count):
+                target = pick_target()
+                thread = threads.setdefault(target.pk, [])
+                parent = None
+                if thread and self.rng.random() < 0.3:
+                    parent = self.rng.choice(thread)
+                created = self.timestamp(parent[1] if parent else target.created_at)
+                comment = model(
+                    pk=start + i, **{f'{target_field}_id': target.pk},
+                    user_id=self.rng.choice(user_ids),
+                    parent_id=parent[0] if parent else None,
+                    content=self.sentence(15),
+                    created_at=created, updated_at=created,
+                )
+                if parent is None:
+                    thread.append((comment.pk, created))
+                yield comment
+
+        self.insert(model, comments())
+
+    def create_likes(self, podcasts, users, count):
+        if not podcasts:
+            return
+        pick_podcast = Zipf([podcast.pk for podcast in podcasts], self.rng)
+        user_ids = [user.pk for user in users]
+        start = self.next_pk(PodcastLike)
+        self.insert(PodcastLike, (
+            PodcastLike(
+                pk=start + i, podcast_id=podcast_id, user_id=user_id,
+                created_at=self.timestamp(),
+            )
+            for i, (podcast_id, user_id) in enumerate(self.unique_pairs(
+                count, pick_podcast, lambda: self.rng.choice(user_ids)
+            ))
+        ))
+
+    def create_messages(self, users, conversation_count, message_count):
+        if len(users) < 2 or not conversation_count:
+            return
+        # A few very chatty users take part in most conversations
+        pick_user = Zipf([user.pk for user in users], self.rng)
+        pairs = set()
+        attempts = 0
+        while len(pairs) < conversation_count and attempts < conversation_count * 10:
+            attempts += 1
+            user_id, other_user_id = pick_user(), pick_user()
+            if user_id != other_user_id:
+                pairs.add(Conversation.participants(user_id, other_user_id))
+        pick_pair = Zipf(sorted(pairs), self.rng)
+        per_pair = {}
+        for pair in pick_pair(message_count):
+            per_pair[pair] = per_pair.get(pair, 0) + 1
+
+        message_start = self.next_pk(Message)
+        conversation_start = self.next_pk(Conversation)
+        summaries = []
+
+        def messages():
+            pk = message_start
+            for user_a_id, user_b_id in sorted(per_pair):
+                count = per_pair[(user_a_id, user_b_id)]
+                sent = self.timestamp()
+                unread = {user_a_id: 0, user_b_id: 0}
+                for index in range(count):
+                    # Replies arrive minutes to hours apart
+                    sent += timedelta(seconds=self.rng.expovariate(1 / 3600))
+                    sender, receiver = (
+                        (user_a_id, user_b_id) if self.rng.random() < 0.5
+                        else (user_b_id, user_a_id)
+                    )
+                    # The tail of busy conversations is still unread
+                    is_read = index < count - self.rng.randint(0, 3)
+                    if not is_read:
+                        unread[receiver] += 1
+                    yield Message(
+                        pk=pk, sender_id=sender, receiver_id=receiver,
+                        content=self.sentence(12), timestamp=sent,
+                        is_read=is_read, read_at=sent if is_read else None,
+                    )
+                    pk += 1
+                summaries.append(Conversation(
+                    pk=conversation_start + len(summaries),
+                    user_a_id=user_a_id, user_b_id=user_b_id,
+                    last_message_id=pk - 1, last_message_at=sent,
+                    user_a_unread_count=unread[user_a_id],
+                    user_b_unread_count=unread[user_b_id],
+                ))
+
+        self.insert(Message, messages())
+        self.insert(Conversation, summaries)
@@ -0,0 +1,177 @@
+import os
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import serializers
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from backend.bulk_load import (
+    dependency_order, insert_rows, rebuild_search_vectors, reset_sequences,
+)
+from podcasts.models import Podcast, PodcastComment, PodcastLike
+from user_messages.models import Conversation, Message
+
+
+class Command(BaseCommand):
+    help = (
+        'Load fixtures like loaddata, but in bulk: objects are grouped by '
+        'model, inserted in foreign key dependency order with multi-row '
+        'INSERTs, many-to-many links are written per through table and '
+        'sequences are reset afterwards. Signals and save() are skipped; '
+        'the podcast counters and conversation summaries of the loaded rows '
+        'are rebuilt instead.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'args',
+            metavar='fixture',
+            nargs='+',
+            help='Fixture files, or names looked up in fixtures/ and FIXTURE_DIRS',
+        )
+        parser.add_argument(
+            '--ignorenonexistent', '-i',
+            action='store_true',
+            help='Ignore fields and models that no longer exist, as loaddata does',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also time loaddata on the same fixtures (rolled back) and report the speedup',
+        )
+
+    def find_fixture(self, label):
+        if os.path.isfile(label):
+            return label
+        names = [label] if os.path.splitext(label)[1] else [label, f'{label}.json']
+        directories = [os.path.join(settings.BASE_DIR, 'fixtures')]
+        directories += [str(directory) for directory in getattr(settings, 'FIXTURE_DIRS', [])]
+        for directory in directories:
+            for name in names:
+                path = os.path.join(directory, name)
+                if os.path.isfile(path):
+                    return path
+        raise CommandError(f"No fixture named '{label}' found.")
+
+    def read_fixtures(self, paths, ignorenonexistent):
+        """
+        Deserialize every fixture. Returns {model: {pk: instance}} (later
+        objects replace earlier ones with the same pk, as with loaddata),
+        new objects without a pk, and {m2m field: {pk: [related pks]}}.
+        """
+        objects = defaultdict(dict)
+        unkeyed = defaultdict(list)
+        m2m = defaultdict(dict)
+        for path in paths:
+            format = os.path.splitext(path)[1].lstrip('.')
+            if format not in serializers.get_public_serializer_formats():
+                raise CommandError(f"Unsupported fixture format '{format}': {path}")
+            with open(path, 'rb') as fixture:
+                for deserialized in serializers.deserialize(
+                    format, fixture, ignorenonexistent=ignorenonexistent
+                ):
+                    instance = deserialized.object
+                    model = type(instance)
+                    if instance.pk is None:
+                        unkeyed[model].append(instance)
+                        continue
+                    objects[model][instance.pk] = instance
+                    for name, related in (deserialized.m2m_data or {}).items():
+                        field = model._meta.get_field(name)
+                        if field.remote_field.through._meta.auto_created:
+                            m2m[field][instance.pk] = related
+        return objects, unkeyed, m2m
+
+    def load_m2m(self, field, links):
+        """Replace the links of the loaded objects in one through table"""
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        through._base_manager.filter(**{f'{source}__in': list(links)}).delete()
+        through._base_manager.bulk_create(
+            [
+                through(**{f'{source}_id': pk, f'{target}_id': related_pk})
+                for pk, related in links.items() for related_pk in related
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        return through
+
+    def rebuild_summaries(self, objects, unkeyed):
+        """
+        Recompute what save() and the views keep in step: fixtures don't
+        carry the podcast counters (the upsert resets them) and loading
+        messages doesn't touch their conversation summaries
+        """
+        def loaded(model):
+            return list(objects[model].values()) + unkeyed[model]
+
+        podcast_ids = {podcast.pk for podcast in loaded(Podcast)}
+        for model in (PodcastLike, PodcastComment):
+            podcast_ids.update(row.podcast_id for row in loaded(model))
+        if podcast_ids:
+            Podcast.objects.filter(pk__in=podcast_ids).recount_counters()
+
+        pairs = {
+            Conversation.participants(message.sender_id, message.receiver_id)
+            for message in loaded(Message)
+        }
+        for user_id, other_user_id in sorted(pairs):
+            Conversation.refresh(user_id, other_user_id)
+
+    def load(self, paths, ignorenonexistent):
+        objects, unkeyed, m2m = self.read_fixtures(paths, ignorenonexistent)
+        models = dependency_order(list(set(objects) | set(unkeyed)))
+        touched = list(models)
+        count = 0
+        with transaction.atomic():
+            with connection.constraint_checks_disabled():
+                for model in models:
+                    if objects[model]:
+                        insert_rows(model, list(objects[model].values()), upsert=True)
+                    if unkeyed[model]:
+                        model._base_manager.bulk_create(unkeyed[model])
+                    count += len(objects[model]) + len(unkeyed[model])
+                for field, links in m2m.items():
+                    touched.append(self.load_m2m(field, links))
+            connection.check_constraints(
+                table_names=[model._meta.db_table for model in touched]
+            )
+            reset_sequences(models)
+            rebuild_search_vectors(models)
+            self.rebuild_summaries(objects, unkeyed)
+        return count, models
+
+    def handle(self, *labels, **options):
+        paths = [self.find_fixture(label) for label in labels]
+        ignorenonexistent = options['ignorenonexistent']
+
+        loaddata_seconds = None
+        if options['compare']:
+            started = time.perf_counter()
+            with transaction.atomic():
+                call_command(
+                    'loaddata', *paths, verbosity=0,
+                    ignorenonexistent=ignorenonexistent,
+                )
+                loaddata_seconds = time.perf_counter() - started
+                transaction.set_rollback(True)
+
+        started = time.perf_counter()
+        count, models = self.load(paths, ignorenonexistent)
+        seconds = time.perf_counter() - started
+
+        if options['verbosity'] < 1:
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Installed {count} object(s) of {len(models)} model(s) from '
+            f'{len(paths)} fixture(s) in {seconds:.3f}s.'
+        ))
+        if loaddata_seconds is not None:
+            self.stdout.write(
+                f'loaddata took {loaddata_seconds:.3f}s '
+                f'({loaddata_seconds / seconds:.1f}x slower).'
+            )
@@ -0,0 +1,115 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user_messages.realtime import SOCKET_PATH, MessageSocket, broker
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Open many concurrent message sockets in-process and measure how '
+        'long pushed events take to reach all of them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sockets',
+            type=int,
+            default=1000,
+            help='Number of concurrent sockets (default: 1000)',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100,
+            help='Number of existing users the sockets are spread over (default: 100)',
+        )
+        parser.add_argument(
+            '--events',
+            type=int,
+            default=20,
+            help='Number of events pushed to every user (default: 20)',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=10,
+            help='Seconds to wait for a socket event (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        users = list(
+            User.objects.filter(is_active=True).order_by('pk')[:options['users']]
+        )
+        if not users:
+            raise CommandError('No active users to connect as, load some data first.')
+        tokens = {user.pk: str(AccessToken.for_user(user)) for user in users}
+
+        self.stdout.write(
+            f"Opening {options['sockets']} sockets for {len(users)} users..."
+        )
+        connect_time, latencies = asyncio.run(self.run(
+            tokens, options['sockets'], options['events'], options['timeout']
+        ))
+
+        latencies.sort()
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(f'Connected in {connect_time:.2f}s')
+        self.stdout.write(
+            f'Delivered {len(latencies)} events: '
+            f'p50 {percentiles[49] * 1000:.1f}ms, '
+            f'p95 {percentiles[94] * 1000:.1f}ms, '
+            f'p99 {percentiles[98] * 1000:.1f}ms, '
+            f'max {latencies[-1] * 1000:.1f}ms'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Dropped {broker.dropped} events on full socket queues.'
+        ))
+
+    async def run(self, tokens, socket_count, event_count, timeout):
+        application = MessageSocket()
+        user_ids = list(tokens)
+        sockets = []
+
+        started = time.perf_counter()
+        for index in range(socket_count):
+            user_id = user_ids[index % len(user_ids)]
+            socket = ApplicationCommunicator(application, {
+                'type': 'websocket',
+                'path': SOCKET_PATH,
+                'query_string': f'token={tokens[user_id]}'.encode(),
+                'headers': [],
+            })
+            await socket.send_input({'type': 'websocket.connect'})
+            sockets.append(socket)
+        for socket in sockets:
+            response = await socket.receive_output(timeout)
+            if response['type'] != 'websocket.accept':
+                raise CommandError(f'Socket was rejected: {response}')
+        connect_time = time.perf_counter() - started
+
+        latencies = []
+
+        async def receive(socket, sent):
+            await socket.receive_output(timeout)
+            latencies.append(time.perf_counter() - sent)
+
+        try:
+            for sequence in range(event_count):
+                sent = time.perf_counter()
+                for user_id in user_ids:
+                    broker.publish(user_id, {'type': 'loadtest', 'sequence': sequence})
+                await asyncio.gather(*(receive(socket, sent) for socket in sockets))
+        finally:
+            for socket in sockets:
+                await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            for socket in sockets:
+                await socket.wait(timeout)
+        return connect_time, latencies
@@ -1,119 +1,211 @@
-from django.core.management.base import BaseCommand
-from django.conf import settings
+import json
 import os
-import cloudinary
-import cloudinary.uploader
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from backend.cloudinary_uploads import PENDING_PREFIX, load_uploader, with_retries
+from backend.models import StoredAsset
 from experts.models import ExpertProfile
 from podcasts.models import Podcast
 
+# (model, file field) pairs whose local images are migrated
+IMAGE_FIELDS = (
+    (ExpertProfile, 'profile_picture'),
+    (Podcast, 'image'),
+)
+
 
 class Command(BaseCommand):
-    help = 'Migrate existing local images to Cloudinary'
+    help = (
+        'Migrate existing local images to Cloudinary. Uploads run in a '
+        'thread pool, rows are updated in batches and progress is '
+        'checkpointed so an interrupted run can be resumed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default=getattr(settings, 'MEDIA_ROOT', '') or settings.BASE_DIR,
+            help='Directory the stored image names are relative to (default: MEDIA_ROOT or BASE_DIR)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent uploads (default: 8)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Rows uploaded and written per batch (default: 100)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, '.image_migration_checkpoint.json'),
+            help='File recording the last migrated primary key and the failed ones per model',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore an existing checkpoint and start from the beginning',
+        )
+        parser.add_argument(
+            '--uploader',
+            default=settings.CLOUDINARY_UPLOADER,
+            help='Uploader class path, e.g. backend.cloudinary_uploads.StubUploader for offline runs',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be uploaded without uploading or writing anything',
+        )
 
     def handle(self, *args, **options):
+        self.source = options['source']
+        self.dry_run = options['dry_run']
+        self.uploader = load_uploader(options['uploader'])
+        self.checkpoint_path = options['checkpoint']
+        self.checkpoint = {} if options['restart'] else self.load_checkpoint()
+        self.totals = {'uploaded': 0, 'bytes': 0, 'missing': 0, 'failed': 0}
+
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: nothing will be uploaded or saved.'))
         self.stdout.write('Starting image migration to Cloudinary...')
-        
-        # Configure Cloudinary
-        cloudinary.config(
-            cloud_name=settings.CLOUDINARY_STORAGE['CLOUD_NAME'],
-            api_key=settings.CLOUDINARY_STORAGE['API_KEY'],
-            api_secret=settings.CLOUDINARY_STORAGE['API_SECRET']
-        )
-        
-        # Migrate expert profile pictures
-        self.stdout.write('Migrating expert profile pictures...')
-        experts = ExpertProfile.objects.filter(profile_picture__isnull=False)
-        
-        for expert in experts:
-            if expert.profile_picture and expert.profile_picture.name:
-                local_path = os.path.join(
-                    settings.MEDIA_ROOT, 
-                    expert.profile_picture.name
-                )
-                
-                if os.path.exists(local_path):
-                    try:
-                        # Upload to Cloudinary
-                        cloudinary.uploader.upload(
-                            local_path,
-                            public_id=expert.profile_picture.name.replace(
-                                '.jpg', ''
-                            ).replace('.png', ''),
-                            resource_type='image',
-                            overwrite=True
-                        )
-                        
-                        # Update the model to use Cloudinary URL
-                        expert.profile_picture.name = expert.profile_picture.name
-                        expert.save()
-                        
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f'Successfully migrated expert {expert.name}: '
-                                f'{expert.profile_picture.name}'
-                            )
-                        )
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(
-                                f'Error migrating expert {expert.name}: {str(e)}'
-                            )
-                        )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'Local file not found for expert {expert.name}: '
-                            f'{local_path}'
-                        )
-                    )
-        
-        # Migrate podcast images
-        self.stdout.write('Migrating podcast images...')
-        podcasts = Podcast.objects.filter(image__isnull=False)
-        
-        for podcast in podcasts:
-            if podcast.image and podcast.image.name:
-                local_path = os.path.join(
-                    settings.MEDIA_ROOT, 
-                    podcast.image.name
-                )
-                
-                if os.path.exists(local_path):
-                    try:
-                        # Upload to Cloudinary
-                        cloudinary.uploader.upload(
-                            local_path,
-                            public_id=podcast.image.name.replace(
-                                '.jpg', ''
-                            ).replace('.png', ''),
-                            resource_type='image',
-                            overwrite=True
-                        )
-                        
-                        # Update the model to use Cloudinary URL
-                        podcast.image.name = podcast.image.name
-                        podcast.save()
-                        
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f'Successfully migrated podcast {podcast.title}: '
-                                f'{podcast.image.name}'
-                            )
-                        )
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(
-                                f'Error migrating podcast {podcast.title}: {str(e)}'
-                            )
-                        )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'Local file not found for podcast {podcast.title}: '
-                            f'{local_path}'
-                        )
-                    )
-        
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(
+            max_workers=max(1, options['workers']),
+            thread_name_prefix='image-migration',
+        ) as executor:
+            for model, field in IMAGE_FIELDS:
+                self.migrate(executor, model, field, max(1, options['batch_size']))
+        elapsed = time.perf_counter() - started
+
+        totals = self.totals
+        verb = 'Would upload' if self.dry_run else 'Uploaded'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['uploaded']} images "
+            f"({totals['bytes'] / 1024 / 1024:.1f} MB) in {elapsed:.1f}s: "
+            f"{totals['uploaded'] / elapsed if elapsed else 0:.1f} images/s, "
+            f"{totals['bytes'] / 1024 / 1024 / elapsed if elapsed else 0:.2f} MB/s. "
+            f"{totals['missing']} missing locally, {totals['failed']} failed."
+        ))
+
+    def migrate(self, executor, model, field, batch_size):
+        key = f'{model._meta.label}.{field}'
+        last_pk = self.checkpoint.get(key, 0)
+        failed = self.checkpoint.setdefault('failed', {})
+        # Rows that failed or were missing last time are retried first
+        retry = set(failed.get(key, []))
         self.stdout.write(
-            self.style.SUCCESS('Image migration completed!')
+            f'Migrating {key} (after pk {last_pk}, retrying {len(retry)})...'
         )
+
+        # Only local names: uploads already store a URL, pending ones are in flight
+        rows = (
+            model._base_manager
+            .filter(Q(pk__gt=last_pk) | Q(pk__in=retry))
+            .exclude(**{f'{field}__isnull': True})
+            .exclude(**{field: ''})
+            .exclude(**{f'{field}__startswith': 'http://'})
+            .exclude(**{f'{field}__startswith': 'https://'})
+            .exclude(**{f'{field}__startswith': PENDING_PREFIX})
+            .order_by('pk')
+            .values_list('pk', field)
+            .iterator(chunk_size=batch_size)
+        )
+        still_failed = set()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            results = executor.map(self.upload, (name for _, name in batch))
+            still_failed.update(self.save_batch(model, field, batch, list(results)))
+            if not self.dry_run:
+                last_seen = batch[-1][0]
+                retry = {pk for pk in retry if pk > last_seen}
+                self.checkpoint[key] = max(last_pk, last_seen)
+                failed[key] = sorted(retry | still_failed)
+                self.save_checkpoint()
+
+    def upload(self, name):
+        """Upload one local image; returns the uploader's result, 'missing' or None"""
+        path = os.path.join(self.source, name)
+        if not os.path.isfile(path):
+            return 'missing'
+        if self.dry_run:
+            return {'bytes': os.path.getsize(path)}
+        public_id = os.path.splitext(name.strip('/'))[0]
+        try:
+            return with_retries(
+                lambda: self.uploader.upload(path, public_id),
+                settings.CLOUDINARY_UPLOAD_MAX_ATTEMPTS,
+                settings.CLOUDINARY_UPLOAD_RETRY_DELAY,
+            )
+        except Exception as e:
+            self.stderr.write(f'Error uploading {name}: {e}')
+            return None
+
+    def save_batch(self, model, field, batch, results):
+        """Write the uploaded URLs; returns the pks that failed or were missing"""
+        updated = []
+        failed = []
+        # Keyed by URL: rows sharing an image must not repeat it in one upsert
+        assets = {}
+        for (pk, name), result in zip(batch, results):
+            if result == 'missing':
+                self.totals['missing'] += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Local file not found for {model.__name__} {pk}: {name}'
+                ))
+                failed.append(pk)
+                continue
+            if not result:
+                self.totals['failed'] += 1
+                failed.append(pk)
+                continue
+            self.totals['uploaded'] += 1
+            self.totals['bytes'] += result.get('bytes') or 0
+            if self.dry_run:
+                continue
+            url = result.get('secure_url') or result.get('public_id')
+            updated.append(model(pk=pk, **{field: url}))
+            assets[url] = StoredAsset(
+                name=url,
+                public_id=result.get('public_id', url),
+                version=str(result.get('version') or ''),
+                size=result.get('bytes') or 0,
+                width=result.get('width'),
+                height=result.get('height'),
+                format=result.get('format') or '',
+            )
+
+        if updated:
+            model._base_manager.bulk_update(updated, [field], batch_size=len(updated))
+            StoredAsset.objects.bulk_create(
+                list(assets.values()),
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=['public_id', 'version', 'size', 'width', 'height', 'format'],
+            )
+            self.stdout.write(f'  {len(updated)} {model.__name__} rows updated')
+        return failed
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as checkpoint:
+                return json.load(checkpoint)
+        except (OSError, ValueError):
+            return {}
+
+    def save_checkpoint(self):
+        # Replace atomically so an interrupted write never loses progress
+        temp_path = f'{self.checkpoint_path}.tmp'
+        with open(temp_path, 'w') as checkpoint:
+            json.dump(self.checkpoint, checkpoint)
+        os.replace(temp_path, self.checkpoint_path)
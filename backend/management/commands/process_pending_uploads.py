@@ -0,0 +1,71 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from backend.cloudinary_uploads import (
+    ABANDONED_STAGE_AGE, PENDING_PREFIX, discard_staged_file, file_fields,
+    process_pending_upload, staged_path,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Upload the staged files of deferred Cloudinary uploads that never '
+        'finished, e.g. because the process restarted, and remove staged '
+        'files no row stores'
+    )
+
+    def abandoned_names(self, referenced):
+        """
+        Pending names of staged files no row stores, left behind by saves
+        that raised or were rolled back. Recent files are skipped: their
+        rows may not be committed yet.
+        """
+        staging_dir = settings.CLOUDINARY_UPLOAD_STAGING_DIR
+        cutoff = time.time() - ABANDONED_STAGE_AGE
+        names = []
+        for root, _, files in os.walk(staging_dir):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = PENDING_PREFIX + os.path.relpath(path, staging_dir).replace(os.sep, '/')
+                if name not in referenced and os.path.getmtime(path) < cutoff:
+                    names.append(name)
+        return sorted(names)
+
+    def handle(self, *args, **options):
+        names = set()
+        for model, field in file_fields():
+            names.update(
+                model._base_manager.filter(
+                    **{f'{field.name}__startswith': PENDING_PREFIX}
+                ).values_list(field.name, flat=True)
+            )
+
+        uploaded = 0
+        failed = 0
+        for name in sorted(names):
+            if not os.path.exists(staged_path(name)):
+                self.stdout.write(
+                    self.style.WARNING(f'Staged file missing for {name}')
+                )
+                failed += 1
+                continue
+            try:
+                url = process_pending_upload(name)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Upload of {name} failed: {e}'))
+                failed += 1
+                continue
+            self.stdout.write(f'{name} -> {url}')
+            uploaded += 1
+
+        abandoned = self.abandoned_names(names)
+        for name in abandoned:
+            discard_staged_file(name)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Found {len(names)} pending uploads, {uploaded} uploaded, '
+                f'{failed} failed. Removed {len(abandoned)} abandoned staged files.'
+            )
+        )
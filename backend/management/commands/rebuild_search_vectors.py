@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from backend.bulk_load import rebuild_search_vectors
+from experts.models import ExpertProfile
+from podcasts.models import Podcast
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the podcast and expert full-text search vectors, e.g. '
+        'after changing SEARCH_CONFIG. Does nothing outside PostgreSQL.'
+    )
+
+    def handle(self, *args, **options):
+        rebuild_search_vectors([ExpertProfile, Podcast])
+        self.stdout.write(self.style.SUCCESS('Search vectors rebuilt.'))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from podcasts.models import Podcast
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the denormalized likes_count/comments_count columns '
+        'on Podcast from the like and comment tables'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of podcasts checked per UPDATE (default: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted podcasts without changing them',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        self.stdout.write('Checking podcast like/comment counters...')
+
+        checked = 0
+        repaired = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                Podcast.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            checked += len(batch)
+
+            drifted = Podcast.objects.filter(pk__in=batch).with_drifted_counts()
+            if dry_run:
+                for podcast in drifted.only('title', 'likes_count', 'comments_count'):
+                    self.stdout.write(
+                        f'Podcast {podcast.pk} "{podcast.title}": '
+                        f'likes {podcast.likes_count} -> '
+                        f'{podcast.actual_likes_count}, comments '
+                        f'{podcast.comments_count} -> '
+                        f'{podcast.actual_comments_count}'
+                    )
+                    repaired += 1
+                continue
+
+            with transaction.atomic():
+                drifted_pks = list(drifted.values_list('pk', flat=True))
+                if drifted_pks:
+                    repaired += Podcast.objects.filter(
+                        pk__in=drifted_pks
+                    ).recount_counters()
+
+        verb = 'would be repaired' if dry_run else 'repaired'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Checked {checked} podcasts, {repaired} {verb}.'
+            )
+        )
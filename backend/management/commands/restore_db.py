@@ -0,0 +1,178 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from backend.bulk_load import (
+    dependency_levels, insert_rows, rebuild_search_vectors, reset_sequences,
+)
+from backend.management.commands.backup_db import FORMAT_VERSION, MANIFEST_NAME
+
+
+def read_rows(path, fields, model, digest):
+    """Yield model instances from a backup file, feeding its lines to ``digest``"""
+    by_attname = {field.attname: field for field in model._meta.concrete_fields}
+    converters = [by_attname[name].to_python for name in fields]
+    with gzip.open(path, 'rb') as backup:
+        for line in backup:
+            digest.update(line)
+            yield model(**{
+                name: None if value is None else convert(value)
+                for name, convert, value in zip(fields, converters, json.loads(line))
+            })
+
+
+def load_model(model, directory, entry, batch_size):
+    """
+    Insert every row of ``model`` from its backup file in batches, then verify
+    the checksum and row count. Returns the seconds taken.
+    """
+    started = time.perf_counter()
+    path = os.path.join(directory, entry['file'])
+    digest = hashlib.sha256()
+    count = 0
+    batch = []
+    for instance in read_rows(path, entry['fields'], model, digest):
+        batch.append(instance)
+        count += 1
+        if len(batch) >= batch_size:
+            insert_rows(model, batch)
+            batch = []
+    if batch:
+        insert_rows(model, batch)
+
+    if digest.hexdigest() != entry['sha256'] or count != entry['rows']:
+        raise CommandError(
+            f"{entry['file']} is corrupt: expected {entry['rows']} rows "
+            f"with sha256 {entry['sha256']}, read {count} rows with "
+            f"{digest.hexdigest()}"
+        )
+    return time.perf_counter() - started
+
+
+def load_level(models, directory, entries, batch_size):
+    """Load models that don't reference each other in one transaction"""
+    with transaction.atomic():
+        with connection.constraint_checks_disabled():
+            seconds = [
+                load_model(model, directory, entries[model], batch_size)
+                for model in models
+            ]
+        connection.check_constraints(
+            table_names=[model._meta.db_table for model in models]
+        )
+    return seconds
+
+
+def load_model_in_worker(model, directory, entry, batch_size):
+    try:
+        return load_level([model], directory, {model: entry}, batch_size)[0]
+    finally:
+        # Worker threads get their own connections; don't leak them
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Restore a backup_db backup into empty tables with batched '
+        'multi-row inserts, checking row counts and checksums'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('backup', help='Directory written by backup_db')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows read per batch of inserts (default: 2000)',
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help=(
+                'Models restored in parallel. Above 1, each model commits '
+                'in its own transaction, so a failure leaves the models '
+                'restored so far in place (default: 1, all or nothing)'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        directory = options['backup']
+        try:
+            with open(os.path.join(directory, MANIFEST_NAME)) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read backup manifest: {e}')
+        if manifest.get('format') != FORMAT_VERSION:
+            raise CommandError(f"Unsupported backup format {manifest.get('format')}.")
+
+        entries = {}
+        for label, entry in manifest['models'].items():
+            try:
+                model = apps.get_model(label)
+            except LookupError:
+                raise CommandError(f'Backup contains unknown model {label}.')
+            missing = set(entry['fields']) - {
+                field.attname for field in model._meta.concrete_fields
+            }
+            if missing:
+                raise CommandError(
+                    f"{label} no longer has fields {', '.join(sorted(missing))}."
+                )
+            entries[model] = entry
+
+        models = list(entries)
+        occupied = [
+            model._meta.label_lower for model in models
+            if entries[model]['rows'] and model._base_manager.exists()
+        ]
+        if occupied:
+            raise CommandError(
+                f"Tables already hold data: {', '.join(occupied)}. "
+                f"Restore into an empty database (see manage.py flush)."
+            )
+
+        batch_size = max(1, options['batch_size'])
+        self.stdout.write(f'Restoring {len(models)} models from {directory}...')
+        started = time.perf_counter()
+        levels = dependency_levels(models)
+        timings = {}
+        if options['jobs'] > 1:
+            # Levels run in order so referenced rows are committed first
+            with ThreadPoolExecutor(
+                max_workers=options['jobs'], thread_name_prefix='restore-db'
+            ) as executor:
+                for level in levels:
+                    seconds = executor.map(
+                        load_model_in_worker, level,
+                        [directory] * len(level),
+                        [entries[model] for model in level],
+                        [batch_size] * len(level),
+                    )
+                    timings.update(zip(level, seconds))
+        else:
+            with transaction.atomic():
+                for level in levels:
+                    timings.update(zip(
+                        level, load_level(level, directory, entries, batch_size)
+                    ))
+
+        reset_sequences(models)
+        rebuild_search_vectors(models)
+
+        for model in models:
+            if entries[model]['rows']:
+                self.stdout.write(
+                    f"  {model._meta.label_lower}: {entries[model]['rows']} rows "
+                    f"in {timings[model]:.2f}s"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {sum(entry['rows'] for entry in entries.values())} rows "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
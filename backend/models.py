@@ -0,0 +1,51 @@
+from django.db import models
+from django.db.models import Q
+
+
+class StoredAssetQuerySet(models.QuerySet):
+    def for_name(self, name):
+        """
+        Assets a file field value refers to: new uploads store the
+        secure_url, legacy rows and get_available_name use the public_id.
+        """
+        if name.startswith('http://') or name.startswith('https://'):
+            return self.filter(name=name)
+        return self.filter(Q(name=name) | Q(public_id=name))
+
+    def record(self, name, result):
+        """Register (or refresh) an upload from the uploader's response"""
+        asset, _ = self.update_or_create(
+            name=name,
+            defaults={
+                'public_id': result.get('public_id', name),
+                'version': str(result.get('version') or ''),
+                'size': result.get('bytes') or 0,
+                'width': result.get('width'),
+                'height': result.get('height'),
+                'format': result.get('format') or '',
+            },
+        )
+        return asset
+
+
+class StoredAsset(models.Model):
+    """
+    Local registry of images uploaded through CustomCloudinaryStorage, so
+    exists(), size() and delete() are indexed reads instead of Cloudinary
+    API calls.
+    """
+    # Value stored in the file field (usually the secure_url)
+    name = models.CharField(max_length=500, unique=True)
+    public_id = models.CharField(max_length=255, db_index=True)
+    version = models.CharField(max_length=32, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    format = models.CharField(max_length=16, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = StoredAssetQuerySet.as_manager()
+
+    def __str__(self):
+        return self.public_id
@@ -0,0 +1,184 @@
+"""
+Keyset (seek) pagination shared by the API list endpoints
+"""
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import exceptions
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate over a fixed, unique ordering using opaque cursors.
+
+    A cursor holds the ordering values of the row at the edge of the
+    current page, so every page is a range scan on an index instead of an
+    OFFSET, and deep pages cost the same as the first one.
+
+    Pagination is opt-in so existing clients keep their plain list
+    responses: it only kicks in when the request carries a ``cursor`` or
+    ``page_size`` query parameter. Paginated requests can't also ask for
+    another ordering (OrderingFilter's ``ordering``); they get a 400.
+    """
+    ordering = ('-created_at', 'id')
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering_query_param = api_settings.ORDERING_PARAM
+    ordering_conflict_message = (
+        'Paginated results have a fixed ordering; '
+        'drop either this parameter or cursor/page_size.'
+    )
+
+    def is_requested(self, request):
+        params = request.query_params
+        return (
+            self.cursor_query_param in params or
+            self.page_size_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        if request.query_params.get(self.ordering_query_param):
+            raise exceptions.ValidationError(
+                {self.ordering_query_param: [self.ordering_conflict_message]}
+            )
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self.get_ordering(reverse)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return list(self.ordering)
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def seek_filter(self, ordering, position):
+        """
+        Build the row-value comparison "comes after ``position``" for
+        ``ordering``, e.g. (-created_at, id) after (t, 5) becomes
+        ``created_at < t OR (created_at = t AND id > 5)``.
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, position):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        token = self.encode_position(instance, r=int(reverse))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, token
+        )
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        position, payload = self.decode_position(token)
+        return position, bool(payload.get('r'))
+
+    def encode_position(self, instance, **extra):
+        """Opaque token holding the ordering values of ``instance``"""
+        position = [
+            self.get_field(name).value_to_string(instance)
+            for name in self.ordering
+        ]
+        payload = json.dumps({'p': position, **extra})
+        return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+    def decode_position(self, token):
+        """Return the ordering values and the payload held by ``token``"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                self.get_field(name).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+            return position, payload
+        except (
+            TypeError, ValueError, KeyError, ValidationError,
+            binascii.Error, UnicodeEncodeError
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_field(self, name):
+        return self.model._meta.get_field(name.lstrip('-'))
@@ -0,0 +1,230 @@
+"""
+Per-request instrumentation
+
+``RequestMetricsMiddleware`` records, for every request, the view that
+served it, the number of SQL queries and the time spent in them, the
+Cloudinary API calls made and the total latency. The totals are logged as
+one line on the ``backend.requests`` logger and sent back in a
+``Server-Timing`` header, which only carries the total latency unless
+``SERVER_TIMING`` is on. Only then is the time spent serializing (DRF
+``serializer.data``) measured too: that needs a wrapper around
+``BaseSerializer.data``, installed while the setting is on and removed
+when it is turned off.
+
+Requests slower than ``SLOW_REQUEST_MS`` are sampled (at
+``SLOW_REQUEST_SAMPLE_RATE``) into ``backend.requests.slow`` together with
+the query fingerprints they ran more than once, so N+1 patterns show up
+without anyone going looking for them.
+"""
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger('backend.requests')
+slow_logger = logging.getLogger('backend.requests.slow')
+
+# Metrics of the request being handled in this thread, if any
+_current = ContextVar('request_metrics', default=None)
+
+# How many repeated fingerprints a slow request log lists
+SLOW_REQUEST_FINGERPRINTS = 5
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    ``sql`` with literals, placeholders and IN lists replaced, so queries
+    that differ only in their values compare equal
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql.replace('%s', '?'))
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_seconds = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        # None when serialization isn't timed
+        self.serializer_seconds = 0.0 if serializer_timer_installed() else None
+        self.serializing = False
+        self.cloudinary_calls = 0
+        self.statements = []
+
+    def execute(self, execute, sql, params, many, context):
+        """Database execute wrapper timing and keeping every statement"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+            self.statements.append(sql)
+
+    def finish(self):
+        self.total_seconds = time.perf_counter() - self.started
+
+    def duplicate_queries(self, limit=SLOW_REQUEST_FINGERPRINTS):
+        """The most repeated query fingerprints, as (count, fingerprint)"""
+        counts = Counter(fingerprint(sql) for sql in self.statements)
+        return [
+            (count, sql) for sql, count in counts.most_common(limit)
+            if count > 1
+        ]
+
+    def server_timing(self, detailed=True):
+        total = f'total;dur={self.total_seconds * 1000:.1f}'
+        if not detailed:
+            return total
+        entries = [
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+        ]
+        if self.serializer_seconds is not None:
+            entries.append(f'serializer;dur={self.serializer_seconds * 1000:.1f}')
+        if self.cloudinary_calls:
+            entries.append(f'cloudinary;desc="{self.cloudinary_calls} calls"')
+        entries.append(total)
+        return ', '.join(entries)
+
+    def as_dict(self):
+        fields = {
+            'total_ms': round(self.total_seconds * 1000, 1),
+            'db_ms': round(self.db_seconds * 1000, 1),
+            'queries': self.queries,
+        }
+        if self.serializer_seconds is not None:
+            fields['serializer_ms'] = round(self.serializer_seconds * 1000, 1)
+        fields['cloudinary_calls'] = self.cloudinary_calls
+        return fields
+
+
+def count_cloudinary_call():
+    """Count a Cloudinary API call against the current request, if any"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cloudinary_calls += 1
+
+
+def serializer_timer_installed():
+    return getattr(BaseSerializer.data.fget, 'timed', False)
+
+
+def install_serializer_timer():
+    """
+    Time top-level ``serializer.data`` calls. Serializer and ListSerializer
+    both build their data through BaseSerializer.data; nested serializers
+    call to_representation directly and are covered by their parent.
+    """
+    if serializer_timer_installed():
+        return
+    original = BaseSerializer.data
+
+    def data(self):
+        metrics = _current.get()
+        if metrics is None or metrics.serializing:
+            return original.fget(self)
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            metrics.serializer_seconds += time.perf_counter() - started
+            metrics.serializing = False
+
+    data.timed = True
+    data.original = original
+    BaseSerializer.data = property(data)
+
+
+def uninstall_serializer_timer():
+    if serializer_timer_installed():
+        BaseSerializer.data = BaseSerializer.data.fget.original
+
+
+def sync_serializer_timer():
+    if settings.SERVER_TIMING:
+        install_serializer_timer()
+    else:
+        uninstall_serializer_timer()
+
+
+@receiver(setting_changed)
+def toggle_serializer_timer(setting, **kwargs):
+    if setting == 'SERVER_TIMING':
+        sync_serializer_timer()
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '-'
+    return match.view_name or match._func_path
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        sync_serializer_timer()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        metrics.finish()
+
+        response['Server-Timing'] = metrics.server_timing(settings.SERVER_TIMING)
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name(request),
+            'status': response.status_code,
+            **metrics.as_dict(),
+        }
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                'request %s',
+                ' '.join(f'{key}={value}' for key, value in fields.items()),
+                extra={'request_metrics': fields},
+            )
+
+        if (
+            metrics.total_seconds * 1000 >= settings.SLOW_REQUEST_MS
+            and random.random() < settings.SLOW_REQUEST_SAMPLE_RATE
+        ):
+            duplicates = metrics.duplicate_queries()
+            slow_logger.warning(
+                'slow request %s %s (%s, %.0fms, %d queries)%s',
+                request.method, request.path, fields['view'],
+                fields['total_ms'], metrics.queries,
+                ''.join(f'\n  {count}x {sql}' for count, sql in duplicates),
+                extra={
+                    'request_metrics': fields,
+                    'duplicate_queries': [
+                        {'count': count, 'sql': sql} for count, sql in duplicates
+                    ],
+                },
+            )
+        return response
@@ -0,0 +1,106 @@
+"""
+Response caching for anonymous catalogue reads
+
+``CachedResponseMixin`` keeps the serialized data of anonymous list
+responses in the shared cache, with an ETag computed once when the entry
+is filled, so repeat visitors get a 304 without the body being built or
+rendered. Keys carry the path, the query parameters and a version per
+cache group. Saving or deleting a model bumps the version of the groups
+it appears in (see the apps' signals.py), which orphans every entry for
+them at once; orphaned entries simply expire.
+
+Counters (views, likes, comments) and related rows such as owners'
+usernames don't invalidate anything, so cached lists may show them up to
+RESPONSE_CACHE_TIMEOUT seconds old.
+"""
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def version_key(group):
+    return f'response-cache:{group}:version'
+
+
+def group_version(group):
+    # A fresh timestamp rather than a counter, so a version evicted from
+    # the cache never comes back with entries from before it
+    version = cache.get(version_key(group))
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(version_key(group), version, None):
+            version = cache.get(version_key(group), version)
+    return version
+
+
+def invalidate(*groups):
+    """
+    Drop the cached responses of ``groups``, now and again once the
+    transaction commits, in case a request cached the old rows meanwhile
+    """
+    def bump():
+        cache.set_many({version_key(group): time.time_ns() for group in groups}, None)
+    bump()
+    transaction.on_commit(bump)
+
+
+def response_cache_key(group, request):
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(f'{request.path}?{params}'.encode()).hexdigest()
+    return f'response-cache:{group}:{group_version(group)}:{digest}'
+
+
+def data_etag(data):
+    encoded = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    return f'"{hashlib.md5(encoded).hexdigest()}"'
+
+
+def not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in {tag.removeprefix('W/') for tag in etags}
+
+
+class CachedResponseMixin:
+    """
+    Serve anonymous ``list`` responses from the cache, with ETag/304.
+    Views set ``cache_group`` to the group whose models they show.
+    """
+    cache_group = None
+
+    def should_cache_response(self, request):
+        return not request.user.is_authenticated
+
+    def list(self, request, *args, **kwargs):
+        if not self.should_cache_response(request):
+            return super().list(request, *args, **kwargs)
+
+        key = response_cache_key(self.cache_group, request)
+        entry = cache.get(key)
+        if entry is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = {'data': response.data, 'etag': data_etag(response.data)}
+            cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+
+        if not_modified(request, entry['etag']):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(entry['data'])
+        response['ETag'] = entry['etag']
+        # Signed-in users get uncached, possibly personalised responses
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,114 @@
+"""
+Full-text search over podcasts and expert profiles
+
+On PostgreSQL, searches match the precomputed, GIN-indexed
+``search_vector`` columns and are ordered by SearchRank, so latency stays
+flat as the tables grow. Other databases (SQLite in local development)
+fall back to ``icontains`` filters over the same fields.
+"""
+import re
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+
+
+def get_search_config():
+    return getattr(settings, 'SEARCH_CONFIG', 'english')
+
+
+def full_text_search_enabled(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def searchable_words(words, using='default'):
+    """
+    ``words`` without the stop words of the search config ("the", "and"),
+    which normalize to nothing: a tsquery made only of them is empty and
+    matches no row.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT word FROM unnest(%s::text[]) WITH ORDINALITY AS t(word, position) "
+            "WHERE to_tsvector(%s::regconfig, word) <> ''::tsvector ORDER BY position",
+            [words, get_search_config()],
+        )
+        return [word for word, in cursor.fetchall()]
+
+
+def build_search_query(term, using='default'):
+    """
+    Turn free text into a prefix-matching tsquery ("pod cas" matches
+    "podcast casting") so results keep up with the search box as the
+    user types. Returns None when the term has no searchable words.
+    """
+    words = re.findall(r'\w+', term)
+    if words:
+        words = searchable_words(words, using)
+    if not words:
+        return None
+    return SearchQuery(
+        ' & '.join(f'{word}:*' for word in words),
+        search_type='raw',
+        config=get_search_config(),
+    )
+
+
+def search_queryset(queryset, term, fallback_fields):
+    """
+    Filter ``queryset`` down to rows matching ``term``, best matches first.
+    ``fallback_fields`` are the lookups OR-ed with ``icontains`` when
+    full-text search is not available or ``term`` is only stop words.
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+
+    query = None
+    if full_text_search_enabled(queryset.db):
+        query = build_search_query(term, queryset.db)
+    if query is None:
+        condition = Q()
+        for field in fallback_fields:
+            condition |= Q(**{f'{field}__icontains': term})
+        return queryset.filter(condition)
+
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(F('search_vector'), query)
+    ).order_by('-search_rank', '-created_at')
+
+
+def weighted_vector_sql(columns):
+    """
+    SQL for a weighted tsvector over ``columns``, a list of
+    (sql_expression, weight) pairs, plus its parameters.
+    """
+    parts = [
+        f"setweight(to_tsvector(%s::regconfig, coalesce({column}, '')), '{weight}')"
+        for column, weight in columns
+    ]
+    return ' || '.join(parts), [get_search_config()] * len(parts)
+
+
+def update_search_vectors(queryset, table_alias, columns, joins='', join_condition=''):
+    """
+    Recompute ``search_vector`` for every row of ``queryset`` with a single
+    UPDATE ... FROM statement. No-op outside PostgreSQL.
+    """
+    if not full_text_search_enabled(queryset.db):
+        return 0
+
+    model = queryset.model
+    vector_sql, vector_params = weighted_vector_sql(columns)
+    pks_sql, pks_params = queryset.order_by().values('pk').query.sql_with_params()
+    conditions = [f'{table_alias}.{model._meta.pk.column} IN ({pks_sql})']
+    if join_condition:
+        conditions.insert(0, join_condition)
+    sql = (
+        f'UPDATE {model._meta.db_table} AS {table_alias} '
+        f'SET search_vector = {vector_sql} '
+        f'{joins} WHERE {" AND ".join(conditions)}'
+    )
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, vector_params + list(pks_params))
+        return cursor.rowcount
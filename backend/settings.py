@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'cloudinary',
     # Third party apps
     'rest_framework',
@@ -65,6 +66,8 @@ INSTALLED_APPS = [
 
 # Middleware configuration
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'backend.request_metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise middleware
@@ -76,6 +79,58 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request instrumentation (backend/request_metrics.py): whether the
+# Server-Timing header breaks the latency down into queries, DB time and
+# Cloudinary calls (every client can read it, so only under DEBUG unless
+# enabled; otherwise it carries the total alone), and which share of
+# requests slower than SLOW_REQUEST_MS get logged with their repeated queries
+SERVER_TIMING = os.getenv('SERVER_TIMING', str(DEBUG)) == 'True'
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', '500'))
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv('SLOW_REQUEST_SAMPLE_RATE', '0.1'))
+
+# Logging: each app logs under its own name, at LOG_LEVEL unless
+# <APP>_LOG_LEVEL overrides it (e.g. USERS_LOG_LEVEL=DEBUG), so debug
+# records are dropped before they're formatted unless asked for. Records
+# are written to stdout by a background thread (backend.log_handlers).
+# The one-line-per-request metrics log is INFO; REQUEST_LOG_LEVEL=INFO
+# turns it on (slow requests are logged as warnings either way).
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+REQUEST_LOG_LEVEL = os.getenv('REQUEST_LOG_LEVEL', 'WARNING')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'standard': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'backend.log_handlers.QueueLogHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': 'standard',
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        **{
+            app: {
+                'handlers': ['queue'],
+                'level': os.getenv(f'{app.upper()}_LOG_LEVEL', LOG_LEVEL),
+                'propagate': False,
+            }
+            for app in (
+                'backend', 'users', 'experts', 'podcasts', 'user_messages',
+                'bookmarks', 'ratings',
+            )
+        },
+        'backend.requests': {'level': REQUEST_LOG_LEVEL},
+    },
+}
+
 # Custom user model
 AUTH_USER_MODEL = 'users.CustomUser'
 
@@ -122,6 +177,50 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Shared cache. Local memory (per process) by default; set CACHE_URL to
+# redis://host:6379/0 (needs the redis package) or file:///path/to/dir
+# to share entries between workers.
+CACHE_URL = os.getenv('CACHE_URL', '')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith('file://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_URL.removeprefix('file://'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'backend',
+        }
+    }
+
+# Seconds anonymous catalogue lists (featured podcasts and experts,
+# categories) are served from the cache (backend.response_cache)
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '60'))
+
+# Text search configuration used for the podcast/expert search vectors and
+# queries; the search_vector migrations read it too. After changing it on
+# an existing database, run the rebuild_search_vectors command.
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'english')
+
+# Search box suggestions: minimum pg_trgm word similarity for a typo to
+# still match, and how long results for short prefixes are cached
+SEARCH_SUGGEST_SIMILARITY = float(os.getenv('SEARCH_SUGGEST_SIMILARITY', '0.3'))
+SEARCH_SUGGEST_CACHE_TIMEOUT = int(os.getenv('SEARCH_SUGGEST_CACHE_TIMEOUT', '300'))
+
+# Deepest reply level rendered by the threaded comment endpoints
+# (clients may request less with ?max_depth=)
+COMMENT_THREAD_MAX_DEPTH = int(os.getenv('COMMENT_THREAD_MAX_DEPTH', '10'))
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -221,6 +320,10 @@ STATICFILES_DIRS = [
 # MEDIA_URL = '/media/'  # Removed - Cloudinary handles this
 # MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Removed - Cloudinary handles this
 
+# Content-addressed local storage (backend.local_storage)
+LOCAL_MEDIA_ROOT = os.getenv('LOCAL_MEDIA_ROOT', os.path.join(BASE_DIR, 'media_store'))
+LOCAL_MEDIA_URL = '/media/'
+
 # Use WhiteNoise for better static file serving in production
 # WhiteNoise will serve static files directly from STATIC_ROOT
 # STATICFILES_STORAGE is now handled by STORAGES configuration above
@@ -255,7 +358,12 @@ ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', EMAIL_HOST_USER)
 # Cloudinary Storage Configuration
 STORAGES = {
     "default": {
-        "BACKEND": "backend.cloudinary_storage.CustomCloudinaryStorage",
+        # backend.local_storage.ContentAddressedStorage keeps uploads on
+        # local disk instead, for offline, dev and benchmark setups
+        "BACKEND": os.getenv(
+            'MEDIA_STORAGE_BACKEND',
+            'backend.cloudinary_storage.CustomCloudinaryStorage'
+        ),
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.StaticFilesStorage",
@@ -282,3 +390,29 @@ cloudinary.config(
 # Cloudinary default image settings
 CLOUDINARY_DEFAULT_EXPERT_IMAGE = os.getenv('CLOUDINARY_DEFAULT_EXPERT_IMAGE', 'expert_profiles/default_profile.png')
 CLOUDINARY_DEFAULT_PODCAST_IMAGE = os.getenv('CLOUDINARY_DEFAULT_PODCAST_IMAGE', 'podcast_images/default_podcast.png')
+
+# Number of public_id -> URL resolutions kept in memory (backend.image_urls)
+IMAGE_URL_CACHE_SIZE = int(os.getenv('IMAGE_URL_CACHE_SIZE', '4096'))
+
+# Cloudinary transformations behind the image variants in API responses
+IMAGE_TRANSFORMATION_PRESETS = {
+    'thumb': {'width': 160, 'height': 160, 'crop': 'fill', 'gravity': 'auto',
+              'fetch_format': 'auto', 'quality': 'auto'},
+    'card': {'width': 480, 'crop': 'limit',
+             'fetch_format': 'auto', 'quality': 'auto'},
+    'hero': {'width': 1280, 'crop': 'limit',
+             'fetch_format': 'auto', 'quality': 'auto'},
+}
+
+# Uploader used by the storage backend (swap in
+# backend.cloudinary_uploads.StubUploader to work offline)
+CLOUDINARY_UPLOADER = os.getenv('CLOUDINARY_UPLOADER', 'backend.cloudinary_uploads.CloudinaryUploader')
+
+# Deferred uploads: requests only stage the file locally and a background
+# worker pool pushes it to Cloudinary (0 workers uploads after commit
+# in the request thread)
+CLOUDINARY_DEFERRED_UPLOADS = os.getenv('CLOUDINARY_DEFERRED_UPLOADS', 'False') == 'True'
+CLOUDINARY_UPLOAD_STAGING_DIR = os.getenv('CLOUDINARY_UPLOAD_STAGING_DIR', os.path.join(BASE_DIR, 'upload_staging'))
+CLOUDINARY_UPLOAD_WORKERS = int(os.getenv('CLOUDINARY_UPLOAD_WORKERS', '4'))
+CLOUDINARY_UPLOAD_MAX_ATTEMPTS = int(os.getenv('CLOUDINARY_UPLOAD_MAX_ATTEMPTS', '5'))
+CLOUDINARY_UPLOAD_RETRY_DELAY = float(os.getenv('CLOUDINARY_UPLOAD_RETRY_DELAY', '1'))
@@ -0,0 +1,46 @@
+import time
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from backend.local_storage import content_addressed_fields
+
+
+@receiver(pre_save)
+def remember_stored_files(sender, instance, raw=False, **kwargs):
+    """Note the content-addressed file names the row stores before saving"""
+    fields = content_addressed_fields(sender)
+    if raw or not fields or instance._state.adding:
+        return
+    instance._stored_files = sender._base_manager.filter(
+        pk=instance.pk
+    ).values(*(field.attname for field in fields)).first() or {}
+
+
+@receiver(post_save)
+def release_replaced_files(sender, instance, using, **kwargs):
+    """
+    Release the files the row no longer stores, once the transaction has
+    committed; ContentAddressedStorage keeps those other rows still share
+    """
+    stored = instance.__dict__.pop('_stored_files', None)
+    if not stored:
+        return
+    for field in content_addressed_fields(sender):
+        name = stored.get(field.attname)
+        if name and name != getattr(instance, field.attname).name:
+            transaction.on_commit(
+                partial(field.storage.release, name, time.time(), using),
+                using=using,
+            )
+
+
+@receiver(post_delete)
+def release_deleted_files(sender, instance, using, **kwargs):
+    for field in content_addressed_fields(sender):
+        name = getattr(instance, field.attname).name
+        if name:
+            transaction.on_commit(
+                partial(field.storage.release, name, time.time(), using),
+                using=using,
+            )
@@ -0,0 +1,140 @@
+"""
+Search box suggestions for experts, podcasts and users
+
+Suggestions are bare id/label/type records matched against pg_trgm GIN
+indexes, so misspelled terms still find their target and the endpoint is
+cheap enough to call on every keystroke. Other databases (SQLite in local
+development) fall back to ``icontains`` matching. Short prefixes, which
+nearly every visitor types and which match the most rows, are cached.
+User suggestions are only offered to signed-in users, as the user search
+itself is, so anonymous visitors can't enumerate accounts.
+"""
+import hashlib
+from itertools import chain
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from experts.models import ExpertProfile
+from podcasts.models import Podcast
+
+from .search import full_text_search_enabled
+
+User = get_user_model()
+
+MIN_TERM_LENGTH = 2
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+CACHED_PREFIX_LENGTH = 4
+
+# (type, queryset, label field, matched fields)
+SUGGESTION_SOURCES = (
+    ('expert', ExpertProfile.objects.filter(is_approved=True), 'name',
+     ('name', 'expertise')),
+    ('podcast', Podcast.objects.filter(is_approved=True), 'title', ('title',)),
+)
+USER_SUGGESTION_SOURCE = (
+    'user', User.objects.filter(is_active=True), 'username', ('username',)
+)
+
+
+def suggestion_sources(include_users):
+    if include_users:
+        return SUGGESTION_SOURCES + (USER_SUGGESTION_SOURCE,)
+    return SUGGESTION_SOURCES
+
+
+def normalize_term(term):
+    return ' '.join(term.lower().split())
+
+
+def get_similarity_threshold():
+    return getattr(settings, 'SEARCH_SUGGEST_SIMILARITY', 0.3)
+
+
+def suggestion_queryset(source, term, limit, trigram):
+    suggestion_type, queryset, label, fields = source
+    condition = Q()
+    for field in fields:
+        if trigram:
+            # %> (word similarity) is answered by the gin_trgm_ops index and
+            # also matches plain substrings; icontains would compile to
+            # UPPER(field) LIKE and force a sequential scan.
+            condition |= Q(**{f'{field}__trigram_word_similar': term})
+        else:
+            condition |= Q(**{f'{field}__icontains': term})
+
+    if trigram:
+        scores = [TrigramWordSimilarity(term, field) for field in fields]
+        score = Greatest(*scores) if len(scores) > 1 else scores[0]
+    else:
+        score = Case(
+            When(**{f'{label}__istartswith': term}, then=Value(1.0)),
+            default=Value(0.5),
+            output_field=FloatField(),
+        )
+
+    return queryset.filter(condition).annotate(
+        suggest_score=score,
+        suggest_type=Value(suggestion_type),
+    ).order_by('-suggest_score', label).values_list(
+        'pk', label, 'suggest_score', 'suggest_type'
+    )[:limit]
+
+
+def find_suggestions(term, limit, include_users=False, using='default'):
+    trigram = full_text_search_enabled(using)
+    querysets = [
+        suggestion_queryset(source, term, limit, trigram).using(using)
+        for source in suggestion_sources(include_users)
+    ]
+    connection = connections[using]
+    if connection.features.supports_slicing_ordering_in_compound:
+        # One round trip for all the sources
+        rows = querysets[0].union(*querysets[1:], all=True)
+    else:
+        rows = chain.from_iterable(querysets)
+
+    if trigram:
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                    [str(get_similarity_threshold())]
+                )
+            rows = list(rows)
+
+    rows = sorted(rows, key=lambda row: -row[2])[:limit]
+    return [
+        {'id': pk, 'label': label, 'type': suggestion_type}
+        for pk, label, _, suggestion_type in rows
+    ]
+
+
+def get_suggestions(term, limit=DEFAULT_LIMIT, include_users=False):
+    """
+    Return up to ``limit`` suggestions for ``term``, best matches first,
+    as ``{'id', 'label', 'type'}`` dicts. Users are only suggested with
+    ``include_users``.
+    """
+    term = normalize_term(term)
+    if len(term) < MIN_TERM_LENGTH:
+        return []
+    if len(term) > CACHED_PREFIX_LENGTH:
+        return find_suggestions(term, limit, include_users)
+
+    digest = hashlib.md5(term.encode()).hexdigest()
+    key = f'search-suggest:{limit}:{int(include_users)}:{digest}'
+    suggestions = cache.get(key)
+    if suggestions is None:
+        suggestions = find_suggestions(term, limit, include_users)
+        cache.set(
+            key, suggestions,
+            getattr(settings, 'SEARCH_SUGGEST_CACHE_TIMEOUT', 300)
+        )
+    return suggestions
@@ -0,0 +1,906 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import generics, serializers
+from rest_framework.permissions import AllowAny
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from backend.cloudinary_uploads import (
+    ABANDONED_STAGE_AGE, StubUploader, deferred_uploads, get_uploader,
+    load_uploader, staged_names, staged_path,
+)
+from backend.conditional import ConditionalRetrieveMixin
+from backend.log_handlers import QueueLogHandler
+from backend.models import StoredAsset
+from backend.request_metrics import fingerprint, serializer_timer_installed
+from benchmarks import suite
+from experts.models import ExpertProfile
+from podcasts.models import Category, PodcasterProfile, Podcast, PodcastComment
+from user_messages.models import Conversation
+
+User = get_user_model()
+
+
+class SearchSuggestTests(APITestCase):
+    url = '/api/search/suggest/'
+
+    def setUp(self):
+        cache.clear()
+        self.expert = ExpertProfile.objects.create(
+            user=User.objects.create_user(
+                username='stargazer', password='pass', user_type='expert'
+            ),
+            name='Ada Stone', bio='Bio', expertise='Astronomy',
+            experience_years=3, is_approved=True,
+        )
+        ExpertProfile.objects.create(
+            user=User.objects.create_user(
+                username='pending', password='pass', user_type='expert'
+            ),
+            name='Astro Pending', bio='Bio', expertise='Astronomy',
+            experience_years=1,
+        )
+        self.podcast = Podcast.objects.create(
+            title='Astronomy Tonight', description='Description',
+            owner=PodcasterProfile.objects.create(
+                user=User.objects.create_user(username='host', password='pass')
+            ),
+            is_approved=True,
+        )
+
+    def suggest(self, term, **params):
+        response = self.client.get(self.url, {'q': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_returns_id_label_type_for_approved_matches(self):
+        results = self.suggest('astro')
+        self.assertCountEqual(results, [
+            {'id': self.expert.pk, 'label': 'Ada Stone', 'type': 'expert'},
+            {'id': self.podcast.pk, 'label': 'Astronomy Tonight',
+             'type': 'podcast'},
+        ])
+        self.assertEqual(len(self.suggest('astro', limit=1)), 1)
+
+    def test_users_are_only_suggested_to_signed_in_users(self):
+        self.assertEqual(self.suggest('star'), [])
+        self.assertEqual(self.suggest('stargazer'), [])
+
+        self.client.force_authenticate(self.expert.user)
+        self.assertEqual(
+            self.suggest('star'),
+            [{'id': self.expert.user.pk, 'label': 'stargazer', 'type': 'user'}]
+        )
+
+    def test_short_terms_are_ignored(self):
+        self.assertEqual(self.suggest(' a '), [])
+
+    def test_short_prefixes_are_cached(self):
+        self.client.force_authenticate(self.expert.user)
+        self.suggest('host')
+        with CaptureQueriesContext(connection) as queries:
+            results = self.suggest('HOST ')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(results[0]['label'], 'host')
+
+    @skipUnless(connection.vendor == 'postgresql', 'Trigram matching needs PostgreSQL')
+    def test_misspelled_terms_still_match(self):
+        results = self.suggest('astronmy tonite')
+        self.assertEqual(results[0]['id'], self.podcast.pk)
+        self.assertIn(
+            {'id': self.expert.pk, 'label': 'Ada Stone', 'type': 'expert'},
+            self.suggest('astronomu')
+        )
+
+
+class DeferredUploadMixin:
+    def setUp(self):
+        super().setUp()
+        self.staging_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.staging_dir, ignore_errors=True)
+        settings = override_settings(
+            CLOUDINARY_UPLOADER='backend.cloudinary_uploads.StubUploader',
+            CLOUDINARY_DEFERRED_UPLOADS=True,
+            CLOUDINARY_UPLOAD_STAGING_DIR=self.staging_dir,
+            CLOUDINARY_UPLOAD_WORKERS=0,
+            CLOUDINARY_UPLOAD_RETRY_DELAY=0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        load_uploader.cache_clear()
+        self.addCleanup(load_uploader.cache_clear)
+
+        self.podcast = Podcast.objects.create(
+            title='Podcast', description='Description', is_approved=True,
+            owner=PodcasterProfile.objects.create(
+                user=User.objects.create_user(username='host', password='pass')
+            ),
+        )
+
+    def save_image(self):
+        self.podcast.image.save('cover.png', ContentFile(b'image bytes'))
+        return self.podcast.image.name
+
+
+class DeferredUploadTests(DeferredUploadMixin, APITestCase):
+    def test_upload_is_staged_then_swapped_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            name = self.save_image()
+        self.assertTrue(name.startswith('pending/'))
+        self.assertTrue(os.path.exists(staged_path(name)))
+        self.assertEqual(get_uploader().uploads, [])
+
+        data = self.client.get(f'/api/podcasts/{self.podcast.pk}/').data
+        self.assertTrue(data['image_pending'])
+        self.assertIn('default_podcast', data['image_url'])
+
+        for callback in callbacks:
+            callback()
+        self.podcast.refresh_from_db()
+        self.assertEqual(self.podcast.image.size, len(b'image bytes'))
+        self.assertEqual(
+            self.podcast.image.name,
+            f'{StubUploader.base_url}/v1/podcast_images/cover.png'
+        )
+        self.assertFalse(os.path.exists(staged_path(name)))
+        data = self.client.get(f'/api/podcasts/{self.podcast.pk}/').data
+        self.assertFalse(data['image_pending'])
+        self.assertEqual(data['image_url'], self.podcast.image.name)
+
+    def test_failed_uploads_are_retried(self):
+        get_uploader().failures = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            self.save_image()
+        self.podcast.refresh_from_db()
+        self.assertFalse(self.podcast.image.name.startswith('pending/'))
+        self.assertEqual(len(get_uploader().uploads), 1)
+
+    @override_settings(CLOUDINARY_UPLOAD_MAX_ATTEMPTS=2)
+    def test_exhausted_uploads_can_be_resumed(self):
+        get_uploader().failures = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            name = self.save_image()
+        self.podcast.refresh_from_db()
+        self.assertEqual(self.podcast.image.name, name)
+
+        call_command('process_pending_uploads', stdout=StringIO())
+        self.podcast.refresh_from_db()
+        self.assertFalse(self.podcast.image.name.startswith('pending/'))
+
+
+    def test_abandoned_staged_files_are_removed(self):
+        # Staged, then the row's save fails
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.podcast.image.save('cover.png', ContentFile(b'image bytes'), save=False)
+            abandoned = self.podcast.image.name
+            raise RuntimeError
+        self.assertIn(abandoned, staged_names)
+        stale = time.time() - ABANDONED_STAGE_AGE - 1
+        os.utime(staged_path(abandoned), (stale, stale))
+
+        # Staging another file forgets the stale name; being recent, its own
+        # file is kept in case its row is still being committed
+        with mock.patch('backend.cloudinary_uploads.ABANDONED_STAGE_AGE', -1):
+            recent = self.podcast.image.storage.save('other.png', ContentFile(b'other'))
+        self.addCleanup(staged_names.pop, recent, None)
+        self.assertNotIn(abandoned, staged_names)
+
+        call_command('process_pending_uploads', stdout=StringIO())
+        self.assertFalse(os.path.exists(staged_path(abandoned)))
+        self.assertTrue(os.path.exists(staged_path(recent)))
+
+@override_settings(
+    CLOUDINARY_UPLOADER='backend.cloudinary_uploads.StubUploader',
+    CLOUDINARY_DEFERRED_UPLOADS=False,
+)
+class StoredAssetRegistryTests(APITestCase):
+    def setUp(self):
+        load_uploader.cache_clear()
+        self.addCleanup(load_uploader.cache_clear)
+        self.podcast = Podcast.objects.create(
+            title='Podcast', description='Description', is_approved=True,
+            owner=PodcasterProfile.objects.create(
+                user=User.objects.create_user(username='host', password='pass')
+            ),
+        )
+
+    def test_storage_metadata_comes_from_the_registry(self):
+        self.podcast.image.save('cover.png', ContentFile(b'image bytes'))
+        name = self.podcast.image.name
+        storage = self.podcast.image.storage
+        asset = StoredAsset.objects.get(name=name)
+        self.assertEqual(asset.public_id, 'podcast_images/cover.png')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(storage.size(name), len(b'image bytes'))
+            self.assertTrue(storage.exists('podcast_images/cover.png'))
+            self.assertFalse(storage.exists('podcast_images/other.png'))
+        self.assertEqual(len(queries), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            storage.delete(name)
+        self.assertFalse(StoredAsset.objects.exists())
+        self.assertEqual(get_uploader().destroyed, ['podcast_images/cover.png'])
+
+    def test_backfill_registers_existing_images(self):
+        uploader = get_uploader()
+        url = uploader.upload(ContentFile(b'old bytes'), 'podcast_images/old')['secure_url']
+        uploader.upload(ContentFile(b'legacy bytes'), 'podcast_images/legacy.png')
+        names = [url, 'podcast_images/legacy.png', f'{url}-gone']
+        for name in names:
+            Podcast.objects.create(
+                title=name, description='Description', image=name,
+                owner=self.podcast.owner,
+            )
+        storage = self.podcast.image.storage
+        self.assertEqual(storage.size(url), 0)
+
+        out = StringIO()
+        call_command(
+            'backfill_stored_assets', '--batch-size', '1',
+            '--uploader', 'backend.cloudinary_uploads.StubUploader', stdout=out,
+        )
+        self.assertIn('Registered 2 images. 1 not on Cloudinary', out.getvalue())
+        self.assertEqual(storage.size(url), len(b'old bytes'))
+        self.assertTrue(storage.exists('podcast_images/legacy.png'))
+        self.assertFalse(storage.exists(f'{url}-gone'))
+
+    def test_unregistered_urls_are_destroyed_by_public_id(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.podcast.image.storage.delete(
+                'https://res.cloudinary.com/demo/image/upload/v1712/podcast_images/old.jpg'
+            )
+        self.assertEqual(get_uploader().destroyed, ['podcast_images/old'])
+
+
+@override_settings(CLOUDINARY_UPLOAD_RETRY_DELAY=0)
+class MigrateImagesCommandTests(APITestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+        self.checkpoint = os.path.join(self.source, 'checkpoint.json')
+        load_uploader.cache_clear()
+        self.addCleanup(load_uploader.cache_clear)
+
+        owner = PodcasterProfile.objects.create(
+            user=User.objects.create_user(username='host', password='pass')
+        )
+        os.makedirs(os.path.join(self.source, 'podcast_images'))
+        self.podcasts = []
+        for i in range(5):
+            name = f'podcast_images/cover{i}.png'
+            if i != 3:
+                with open(os.path.join(self.source, name), 'wb') as image:
+                    image.write(b'x' * (i + 1))
+            self.podcasts.append(Podcast.objects.create(
+                title=f'Podcast {i}', description='Description', owner=owner,
+                image=name,
+            ))
+
+    def migrate(self, *args):
+        out = StringIO()
+        call_command(
+            'migrate_images_to_cloudinary', '--source', self.source,
+            '--checkpoint', self.checkpoint, '--batch-size', '2',
+            '--workers', '2',
+            '--uploader', 'backend.cloudinary_uploads.StubUploader',
+            *args, stdout=out, stderr=StringIO(),
+        )
+        return out.getvalue()
+
+    def image_names(self):
+        return list(
+            Podcast.objects.order_by('pk').values_list('image', flat=True)
+        )
+
+    def test_dry_run_changes_nothing(self):
+        output = self.migrate('--dry-run')
+        self.assertIn('Would upload 4 images', output)
+        self.assertIn('1 missing locally', output)
+        self.assertEqual(self.image_names()[0], 'podcast_images/cover0.png')
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_uploads_in_batches_and_resumes_from_checkpoint(self):
+        output = self.migrate()
+        self.assertIn('Uploaded 4 images', output)
+        names = self.image_names()
+        self.assertEqual(
+            names[0], f'{StubUploader.base_url}/v1/podcast_images/cover0'
+        )
+        self.assertEqual(names[3], 'podcast_images/cover3.png')
+        self.assertEqual(StoredAsset.objects.get(name=names[4]).size, 5)
+        with open(self.checkpoint) as checkpoint:
+            checkpoint = json.load(checkpoint)
+        self.assertEqual(
+            checkpoint['podcasts.Podcast.image'], self.podcasts[-1].pk
+        )
+        self.assertEqual(
+            checkpoint['failed']['podcasts.Podcast.image'],
+            [self.podcasts[3].pk]
+        )
+
+        # Resumed runs only retry the rows that failed
+        output = self.migrate()
+        self.assertIn('Uploaded 0 images', output)
+        self.assertIn('1 missing locally', output)
+        with open(os.path.join(self.source, names[3]), 'wb') as image:
+            image.write(b'x')
+        self.assertIn('Uploaded 1 images', self.migrate())
+        self.assertIn('Uploaded 0 images', self.migrate())
+
+    def test_pending_rows_do_not_end_the_run(self):
+        # A whole batch of in-flight deferred uploads comes first
+        for podcast in self.podcasts[:2]:
+            Podcast.objects.filter(pk=podcast.pk).update(
+                image=f'pending/abcd1234/podcast_images/new{podcast.pk}.png'
+            )
+        self.assertIn('Uploaded 2 images', self.migrate())
+
+
+class CleanupBrokenImagesCommandTests(APITestCase):
+    def setUp(self):
+        owner = PodcasterProfile.objects.create(
+            user=User.objects.create_user(username='host', password='pass')
+        )
+        registered = f'{StubUploader.base_url}/v1/podcast_images/ok.png'
+        StoredAsset.objects.create(name=registered, public_id='podcast_images/ok.png')
+        self.images = {
+            'logo': 'podcast_images/Black_Siorc_Logo_x.png',
+            'registered': registered,
+            'legacy': 'podcast_images/ok.png',
+            'unregistered': f'{StubUploader.base_url}/v1/podcast_images/gone.png',
+            'pending': 'pending/abcd1234/podcast_images/new.png',
+        }
+        for title, image in self.images.items():
+            Podcast.objects.create(
+                title=title, description='Description', owner=owner, image=image,
+            )
+        self.updated_at = dict(Podcast.objects.values_list('title', 'updated_at'))
+
+    def cleanup(self, *args):
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('cleanup_broken_images', *args, stdout=out)
+        return out.getvalue(), queries
+
+    def images_by_title(self):
+        return dict(Podcast.objects.values_list('title', 'image'))
+
+    def test_unregistered_rule_skips_local_storage(self):
+        local = override_settings(STORAGES={
+            'default': {'BACKEND': 'backend.local_storage.ContentAddressedStorage'},
+            'staticfiles': {
+                'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+            },
+        })
+        with local:
+            output, _ = self.cleanup('--unregistered')
+        self.assertIn('Cleared 1 broken podcasts.Podcast.image', output)
+        images = self.images_by_title()
+        self.assertIsNone(images['logo'])
+        self.assertEqual(images['unregistered'], self.images['unregistered'])
+
+    def test_dry_run_only_counts(self):
+        output, _ = self.cleanup('--dry-run', '--unregistered')
+        self.assertIn('Would clear 2 broken podcasts.Podcast.image', output)
+        self.assertEqual(self.images_by_title(), self.images)
+
+    def test_clears_matches_with_one_update_per_field(self):
+        output, queries = self.cleanup('--unregistered')
+        self.assertIn('Cleared 2 broken podcasts.Podcast.image', output)
+        self.assertEqual(
+            [query['sql'].split()[0] for query in queries], ['UPDATE'] * 3
+        )
+        images = self.images_by_title()
+        self.assertIsNone(images['logo'])
+        self.assertIsNone(images['unregistered'])
+        for title in ('registered', 'legacy', 'pending'):
+            self.assertEqual(images[title], self.images[title])
+        self.assertEqual(
+            dict(Podcast.objects.values_list('title', 'updated_at')),
+            self.updated_at
+        )
+
+        # Without --unregistered only the patterns apply
+        output, _ = self.cleanup('--pattern', 'ok.png')
+        self.assertIn('Cleared 2 broken', output)
+
+
+class BackupRestoreCommandTests(APITestCase):
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), 'backup')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.directory))
+        owner = PodcasterProfile.objects.create(
+            user=User.objects.create_user(username='host', password='pass')
+        )
+        self.podcasts = [
+            Podcast.objects.create(
+                title=f'Podcast {i}', description='Description', owner=owner,
+                is_approved=True,
+            )
+            for i in range(5)
+        ]
+        comment = PodcastComment.objects.create(
+            podcast=self.podcasts[0], user=owner.user, content='Top'
+        )
+        PodcastComment.objects.create(
+            podcast=self.podcasts[0], user=owner.user, content='Reply',
+            parent=comment,
+        )
+
+    def backup(self):
+        call_command(
+            'backup_db', 'users', 'podcasts', '--output', self.directory,
+            '--chunk-size', '2', '--jobs', '1', stdout=StringIO(),
+        )
+        with open(os.path.join(self.directory, 'manifest.json')) as manifest:
+            return json.load(manifest)
+
+    def restore(self):
+        User.objects.all().delete()
+        Category.objects.all().delete()
+        call_command('restore_db', self.directory, '--batch-size', '3', stdout=StringIO())
+
+    def test_round_trip_keeps_rows_and_keys(self):
+        expected = list(Podcast.objects.order_by('pk').values())
+        manifest = self.backup()
+        self.assertEqual(manifest['models']['podcasts.podcast']['rows'], 5)
+        self.assertNotIn('contenttypes.contenttype', manifest['models'])
+
+        self.restore()
+        self.assertEqual(list(Podcast.objects.order_by('pk').values()), expected)
+        reply = PodcastComment.objects.get(content='Reply')
+        self.assertEqual(reply.parent.content, 'Top')
+        # Sequences continue after the restored ids
+        self.assertGreater(
+            Podcast.objects.create(
+                title='New', description='Description',
+                owner=PodcasterProfile.objects.get(),
+            ).pk,
+            self.podcasts[-1].pk
+        )
+
+    def test_corrupt_backup_is_rolled_back(self):
+        manifest = self.backup()
+        manifest['models']['podcasts.podcast']['sha256'] = '0' * 64
+        with open(os.path.join(self.directory, 'manifest.json'), 'w') as output:
+            json.dump(manifest, output)
+
+        with self.assertRaisesMessage(CommandError, 'is corrupt'):
+            self.restore()
+        self.assertFalse(Podcast.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Exported snapshots need PostgreSQL')
+class ParallelBackupTests(TransactionTestCase):
+    def test_workers_share_one_snapshot(self):
+        directory = os.path.join(tempfile.mkdtemp(), 'backup')
+        self.addCleanup(shutil.rmtree, os.path.dirname(directory))
+        owner = PodcasterProfile.objects.create(
+            user=User.objects.create_user(username='host', password='pass')
+        )
+        for i in range(5):
+            Podcast.objects.create(
+                title=f'Podcast {i}', description='Description', owner=owner
+            )
+        call_command(
+            'backup_db', 'users', 'podcasts', '--output', directory,
+            '--chunk-size', '2', '--jobs', '3', stdout=StringIO(),
+        )
+        with open(os.path.join(directory, 'manifest.json')) as manifest:
+            models = json.load(manifest)['models']
+        self.assertEqual(models['podcasts.podcast']['rows'], 5)
+        self.assertEqual(models['podcasts.podcasterprofile']['rows'], 1)
+
+
+class LoadFixturesFastCommandTests(APITestCase):
+    def write_fixture(self, objects):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'fixture.json')
+        with open(path, 'w') as fixture:
+            json.dump(objects, fixture)
+        return path
+
+    def fixture_objects(self, categories):
+        return [
+            {'model': 'experts.expertprofile', 'pk': 7, 'fields': {
+                'user': 3, 'name': 'Ada', 'bio': 'Bio', 'expertise': 'Stars',
+                'experience_years': 4, 'is_approved': True,
+                'created_at': '2024-01-02T03:04:05.123456Z',
+                'categories': categories,
+            }},
+            {'model': 'users.customuser', 'pk': 3, 'fields': {
+                'username': 'ada', 'password': '!', 'user_type': 'expert',
+                'date_joined': '2024-01-01T00:00:00Z',
+            }},
+        ] + [
+            {'model': 'experts.expertcategory', 'pk': pk,
+             'fields': {'name': f'Category {pk}'}}
+            for pk in (1, 2)
+        ]
+
+    def test_loads_in_dependency_order_with_m2m_and_sequences(self):
+        path = self.write_fixture(self.fixture_objects([1, 2]))
+        call_command('load_fixtures_fast', path, verbosity=0)
+        expert = ExpertProfile.objects.get(pk=7)
+        self.assertEqual(expert.user.username, 'ada')
+        self.assertEqual(expert.created_at.microsecond, 123456)
+        self.assertEqual(
+            sorted(expert.categories.values_list('pk', flat=True)), [1, 2]
+        )
+        self.assertGreater(User.objects.create_user(username='new').pk, 3)
+
+        # Loading again overwrites the rows and replaces the links
+        path = self.write_fixture(self.fixture_objects([2]))
+        call_command('load_fixtures_fast', path, verbosity=0)
+        self.assertEqual(ExpertProfile.objects.count(), 1)
+        self.assertEqual(list(expert.categories.values_list('pk', flat=True)), [2])
+
+    def test_rebuilds_podcast_counters_and_conversations(self):
+        at = '2024-01-02T03:04:05Z'
+        stamps = {'created_at': at, 'updated_at': at}
+        users = [
+            {'model': 'users.customuser', 'pk': pk, 'fields': {
+                'username': f'user{pk}', 'password': '!', 'date_joined': at,
+            }}
+            for pk in (3, 4)
+        ]
+        path = self.write_fixture(users + [
+            {'model': 'podcasts.podcasterprofile', 'pk': 1,
+             'fields': {'user': 3, **stamps}},
+            {'model': 'podcasts.podcast', 'pk': 5, 'fields': {
+                'title': 'Podcast', 'description': 'Description', 'owner': 1,
+                **stamps,
+            }},
+            {'model': 'podcasts.podcastlike', 'pk': 1,
+             'fields': {'podcast': 5, 'user': 4, 'created_at': at}},
+            {'model': 'podcasts.podcastcomment', 'pk': 1, 'fields': {
+                'podcast': 5, 'user': 4, 'content': 'Hi', **stamps,
+            }},
+        ] + [
+            {'model': 'user_messages.message', 'pk': pk, 'fields': {
+                'sender': sender, 'receiver': 7 - sender, 'content': 'Hi',
+                'timestamp': f'2024-01-0{pk}T00:00:00Z', 'is_read': pk == 1,
+            }}
+            for pk, sender in ((1, 3), (2, 4))
+        ])
+        call_command('load_fixtures_fast', path, verbosity=0)
+
+        podcast = Podcast.objects.get(pk=5)
+        self.assertEqual((podcast.likes_count, podcast.comments_count), (1, 1))
+        conversation = Conversation.between(3, 4).get()
+        self.assertEqual(conversation.last_message_id, 2)
+        self.assertEqual(
+            (conversation.user_a_unread_count, conversation.user_b_unread_count),
+            (1, 0)
+        )
+
+
+class GenerateLoadDatasetCommandTests(APITestCase):
+    volumes = [
+        '--users', '40', '--experts', '10', '--podcasters', '5',
+        '--podcasts', '20', '--comments', '100', '--likes', '150',
+        '--expert-views', '50', '--bookmarks', '20', '--reactions', '30',
+        '--conversations', '15', '--messages', '120', '--expert-comments', '30',
+        '--batch-size', '7',
+    ]
+
+    def generate(self, *args):
+        call_command('generate_load_dataset', *self.volumes, *args, verbosity=0)
+        return (
+            list(Podcast.objects.order_by('pk').values_list(
+                'pk', 'title', 'owner_id', 'likes_count', 'comments_count'
+            )),
+            list(Conversation.objects.order_by('pk').values_list(
+                'user_a_id', 'user_b_id', 'last_message_id',
+                'user_a_unread_count', 'user_b_unread_count'
+            )),
+        )
+
+    def test_same_seed_same_dataset(self):
+        podcasts, conversations = self.generate()
+        self.assertEqual(len(podcasts), 20)
+        self.assertEqual(sum(podcast[3] for podcast in podcasts), 150)
+        self.assertEqual(sum(podcast[4] for podcast in podcasts), 100)
+        self.assertTrue(all(
+            comment.parent is None or comment.parent.podcast_id == comment.podcast_id
+            for comment in PodcastComment.objects.select_related('parent')
+        ))
+
+        # Summaries match what the message history implies
+        for user_a_id, user_b_id, *_ in conversations:
+            Conversation.refresh(user_a_id, user_b_id)
+        self.assertEqual(list(
+            Conversation.objects.order_by('pk').values_list(
+                'user_a_id', 'user_b_id', 'last_message_id',
+                'user_a_unread_count', 'user_b_unread_count'
+            )
+        ), conversations)
+
+        self.assertEqual(self.generate('--clear'), (podcasts, conversations))
+        self.assertNotEqual(self.generate('--clear', '--seed', '7')[0], podcasts)
+
+
+class BenchmarkSuiteTests(APITestCase):
+    def test_measures_every_endpoint_and_flags_regressions(self):
+        call_command(
+            'generate_load_dataset', *GenerateLoadDatasetCommandTests.volumes,
+            '--prefix', suite.DATASET_PREFIX, verbosity=0,
+        )
+        results = suite.run(iterations=2, warmup=0)
+        self.assertEqual(list(results), [name for name, _, _ in suite.ENDPOINTS])
+        for result in results.values():
+            self.assertGreater(result['queries'], 0)
+            self.assertGreater(result['bytes'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+        baseline = {'endpoints': results}
+        self.assertEqual(suite.compare(results, baseline), [])
+        worse = {
+            name: {**result, 'queries': result['queries'] + 1}
+            for name, result in results.items()
+        }
+        self.assertEqual(len(suite.compare(worse, baseline)), len(results))
+
+
+class RequestMetricsTests(APITestCase):
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t0 WHERE id IN (%s, %s) AND name = 'x' LIMIT 21"),
+            fingerprint('SELECT * FROM t0 WHERE id IN (%s) AND name = %s  LIMIT 5'),
+        )
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_and_request_log(self):
+        with self.assertLogs('backend.requests', 'INFO') as logs:
+            response = self.client.get('/api/podcasts/')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(timing, r'serializer;dur=[\d.]+')
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+        self.assertEqual(len(logs.records), 1)
+        fields = logs.records[0].request_metrics
+        self.assertEqual(fields['view'], 'podcast-main')
+        self.assertEqual(fields['status'], 200)
+        self.assertGreater(fields['queries'], 0)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_only_shows_the_total_by_default(self):
+        with self.assertLogs('backend.requests', 'INFO') as logs:
+            response = self.client.get('/api/podcasts/')
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+$')
+        self.assertNotIn('serializer_ms', logs.records[0].request_metrics)
+
+    def test_serializers_are_only_wrapped_while_server_timing_is_on(self):
+        with override_settings(SERVER_TIMING=True):
+            self.assertTrue(serializer_timer_installed())
+        with override_settings(SERVER_TIMING=False):
+            self.assertFalse(serializer_timer_installed())
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_SAMPLE_RATE=1)
+    def test_slow_requests_list_repeated_queries(self):
+        searcher = User.objects.create_user(username='searcher', password='pass')
+        for i in range(3):
+            ExpertProfile.objects.create(
+                user=User.objects.create_user(
+                    username=f'found{i}', password='pass', user_type='expert'
+                ),
+                name=f'Found {i}', bio='Bio', expertise='Astronomy',
+                experience_years=1,
+            )
+        self.client.force_authenticate(searcher)
+        with self.assertLogs('backend.requests.slow', 'WARNING') as logs:
+            self.client.get('/api/users/search/search/?search=found')
+        duplicates = logs.records[0].duplicate_queries
+        self.assertEqual(duplicates[0]['count'], 3)
+        self.assertIn('experts_expertprofile', duplicates[0]['sql'])
+        self.assertIn('3x SELECT', logs.output[0])
+
+
+class ConditionalRetrieveMixinTests(APITestCase):
+    class PodcastTitleSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = Podcast
+            fields = ['id', 'title']
+
+    class PodcastTitleView(ConditionalRetrieveMixin, generics.RetrieveAPIView):
+        queryset = Podcast.objects.all()
+        permission_classes = [AllowAny]
+
+    def get(self, pk, **headers):
+        request = APIRequestFactory().get('/', **headers)
+        view = self.PodcastTitleView.as_view(
+            serializer_class=self.PodcastTitleSerializer
+        )
+        return view(request, pk=pk)
+
+    def test_default_state_uses_pk_and_updated_at(self):
+        podcast = Podcast.objects.create(
+            title='Podcast', description='Description', is_approved=True,
+            owner=PodcasterProfile.objects.create(
+                user=User.objects.create_user(username='host', password='pass')
+            ),
+        )
+        response = self.get(podcast.pk)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.get(podcast.pk, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        podcast.title = 'Renamed'
+        podcast.save()
+        self.assertEqual(self.get(podcast.pk, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.get(podcast.pk + 1).status_code, 404)
+
+
+class QueueLogHandlerTests(SimpleTestCase):
+    def test_records_are_written_by_the_listener_thread(self):
+        formatted_on = []
+
+        class Formatter(logging.Formatter):
+            def format(self, record):
+                formatted_on.append(threading.current_thread())
+                return super().format(record)
+
+        stream = StringIO()
+        handler = QueueLogHandler(stream)
+        handler.setFormatter(Formatter('%(levelname)s %(message)s'))
+        logger = logging.getLogger('backend.tests.queue')
+        logger.addHandler(handler)
+        logger.propagate = False
+        try:
+            values = ['before']
+            logger.warning('values %s', values)
+            values.append('after')
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+        self.assertEqual(stream.getvalue(), "WARNING values ['before']\n")
+        self.assertNotIn(threading.current_thread(), formatted_on)
+
+
+class DeferredUploadWorkerTests(DeferredUploadMixin, TransactionTestCase):
+    @override_settings(CLOUDINARY_UPLOAD_WORKERS=2)
+    def test_worker_pool_uploads_in_the_background(self):
+        self.save_image()
+        deferred_uploads.wait(timeout=10)
+        self.podcast.refresh_from_db()
+        self.assertTrue(
+            self.podcast.image.name.startswith(StubUploader.base_url)
+        )
+
+    def test_upload_waits_for_the_row_under_autocommit(self):
+        # on_commit runs at once here, so the upload must not be queued
+        # before the row storing the pending name is written
+        self.podcast.image.save(
+            'cover.png', ContentFile(b'image bytes'), save=False
+        )
+        name = self.podcast.image.name
+        self.assertEqual(get_uploader().uploads, [])
+        self.assertTrue(os.path.exists(staged_path(name)))
+
+        self.podcast.save()
+        self.podcast.refresh_from_db()
+        self.assertTrue(
+            self.podcast.image.name.startswith(StubUploader.base_url)
+        )
+
+    def test_failed_uploads_are_logged_and_left_staged(self):
+        get_uploader().failures = settings.CLOUDINARY_UPLOAD_MAX_ATTEMPTS
+        with self.assertLogs('backend.cloudinary_uploads', 'ERROR'):
+            name = self.save_image()
+        self.podcast.refresh_from_db()
+        self.assertEqual(self.podcast.image.name, name)
+        self.assertTrue(os.path.exists(staged_path(name)))
+
+
+class ContentAddressedStorageTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings = override_settings(
+            STORAGES={
+                'default': {
+                    'BACKEND': 'backend.local_storage.ContentAddressedStorage',
+                },
+                'staticfiles': {
+                    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+                },
+            },
+            LOCAL_MEDIA_ROOT=self.media_root,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        owner = PodcasterProfile.objects.create(
+            user=User.objects.create_user(username='host', password='pass')
+        )
+        self.podcasts = [
+            Podcast.objects.create(
+                title=f'Podcast {i}', description='Description', owner=owner,
+                is_approved=True,
+            )
+            for i in range(2)
+        ]
+
+    def stored_files(self):
+        return [
+            os.path.join(root, name)
+            for root, _, names in os.walk(self.media_root) for name in names
+        ]
+
+    def test_identical_uploads_share_one_file(self):
+        for index, podcast in enumerate(self.podcasts):
+            podcast.image.save(f'cover{index}.PNG', ContentFile(b'same bytes'))
+        first, second = (podcast.image.name for podcast in self.podcasts)
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith('.png'))
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(self.podcasts[0].image_url, f'/media/{first}')
+
+        # Still referenced by both rows
+        self.podcasts[0].image.storage.delete(first)
+        self.assertEqual(len(self.stored_files()), 1)
+        Podcast.objects.filter(image=first).update(image='')
+        self.podcasts[0].image.storage.delete(first)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_replaced_and_deleted_files_are_released_on_commit(self):
+        for podcast in self.podcasts:
+            podcast.image.save('cover.png', ContentFile(b'shared bytes'))
+        shared = self.podcasts[0].image.name
+
+        # The second row still uses the old file
+        with self.captureOnCommitCallbacks(execute=True):
+            self.podcasts[0].image.save('new.png', ContentFile(b'new bytes'))
+        self.assertEqual(len(self.stored_files()), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.podcasts[1].image.save('new.png', ContentFile(b'new bytes'))
+        self.assertFalse(self.podcasts[0].image.storage.exists(shared))
+        self.assertEqual(len(self.stored_files()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.podcasts[0].delete()
+        self.assertEqual(len(self.stored_files()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.podcasts[1].delete()
+        self.assertEqual(self.stored_files(), [])
+
+    def test_files_saved_again_before_the_release_runs_are_kept(self):
+        self.podcasts[0].image.save('cover.png', ContentFile(b'shared bytes'))
+        shared = self.podcasts[0].image.name
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.podcasts[0].image.save('new.png', ContentFile(b'new bytes'))
+        # Another transaction saves the same content but has not committed
+        # its row when the release runs
+        storage = self.podcasts[0].image.storage
+        self.assertEqual(storage.save('again.png', ContentFile(b'shared bytes')), shared)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(storage.exists(shared))
+
+    def test_media_is_served_as_immutable(self):
+        self.podcasts[0].image.save('cover.png', ContentFile(b'image bytes'))
+        response = self.client.get(self.podcasts[0].image_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'image bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get('/media/missing.png').status_code, 404)
@@ -17,7 +17,9 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include, re_path
 from backend.admin_dashboard.views import admin_stats
-from backend.views import serve_react_app, contact_submit
+from backend.views import (
+    serve_react_app, contact_submit, search_suggest, serve_media,
+)
 
 
 urlpatterns = [
@@ -29,11 +31,16 @@ urlpatterns = [
     path('api/podcasts/', include('podcasts.urls')),
     path('api/user_messages/', include('user_messages.urls')),
     path('api/contact/', contact_submit, name='contact_submit'),
+    path('api/search/suggest/', search_suggest, name='search_suggest'),
 ]
 
 # Add static and media file serving
 # WhiteNoise handles static file serving automatically
 # No need to add static() patterns when using WhiteNoise
+# Media is only stored locally with backend.local_storage
+urlpatterns.append(
+    re_path(r'^media/(?P<path>.+)$', serve_media, name='serve_media')
+)
 
 # Serve React App for all other routes (SPA routing) - must come last
 # Use a more specific pattern that excludes admin, API, static, and media routes
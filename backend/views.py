@@ -5,10 +5,17 @@ import os
 import json
 from django.http import JsonResponse, HttpResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_http_methods, require_safe
 from django.core.mail import send_mail
 from django.conf import settings
 from django.views.static import serve
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from backend.suggest import DEFAULT_LIMIT, MAX_LIMIT, get_suggestions
+
+# One year, the longest lifetime caches honour
+MEDIA_CACHE_SECONDS = 365 * 24 * 60 * 60
 
 
 def serve_static_file(request, file_path):
@@ -71,6 +78,18 @@ def serve_react_static(request, file_path):
     return response
 
 
+@require_safe
+def serve_media(request, path):
+    """
+    Serve files from the content-addressed local storage. A stored name
+    never changes content, so browsers and proxies may cache it forever.
+    """
+    response = serve(request, path, document_root=settings.LOCAL_MEDIA_ROOT)
+    response['Cache-Control'] = f'public, max-age={MEDIA_CACHE_SECONDS}, immutable'
+    response['ETag'] = '"%s"' % os.path.splitext(os.path.basename(path))[0]
+    return response
+
+
 def serve_react_app(request, path):
     """Serve React app for all routes that don't match API routes"""
     build_path = os.path.join(settings.BASE_DIR, 'frontend', 'build')
@@ -165,3 +184,23 @@ This message was sent from the CONNECT platform contact form.
                 'Please try again later.'
             )
         }, status=500)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_suggest(request):
+    """
+    Suggest experts and podcasts matching ?q= for the search box, and users
+    too when the request is authenticated (JWT, like the user search)
+    """
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    limit = max(1, min(limit, MAX_LIMIT))
+    return Response({
+        'results': get_suggestions(
+            request.query_params.get('q', ''), limit,
+            include_users=request.user.is_authenticated,
+        )
+    })
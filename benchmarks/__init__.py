@@ -0,0 +1,8 @@
+"""
+Benchmarks for the hot API endpoints
+
+``python manage.py benchmark_api`` seeds a throwaway test database with
+generate_load_dataset, requests each endpoint in ``suite.ENDPOINTS``
+through the Django test client and compares p50/p95 latency, SQL query
+count and response size with ``baseline.json``, failing on regressions.
+"""
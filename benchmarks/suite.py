@@ -0,0 +1,157 @@
+import math
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from experts.models import ExpertProfile
+from podcasts.models import Podcast
+from user_messages.models import Message
+
+User = get_user_model()
+
+# generate_load_dataset options for the seeded database. Changing them
+# invalidates the baseline, so update it in the same commit.
+DATASET_PREFIX = 'bench'
+DATASET_SEED = 42
+DATASET_VOLUMES = {
+    'users': 600, 'experts': 120, 'podcasters': 60, 'podcasts': 400,
+    'comments': 4000, 'likes': 6000, 'expert_views': 1500,
+    'bookmarks': 400, 'reactions': 800, 'conversations': 400,
+    'messages': 6000, 'expert_comments': 1500,
+}
+
+# (name, path, who requests it). Paths are formatted with the subjects
+# picked by pick_subjects(); 'reader' requests are authenticated.
+ENDPOINTS = [
+    ('podcast_list', '/api/podcasts/', None),
+    ('expert_list', '/api/experts/', None),
+    ('expert_profiles', '/api/experts/profiles/', None),
+    ('conversations', '/api/user_messages/conversations/', 'reader'),
+    ('chat_with_user', '/api/user_messages/chat_with_user/?user_id={partner}', 'reader'),
+    ('user_search', '/api/users/search/search/?search={search}', 'reader'),
+    ('podcast_comments', '/api/podcasts/{podcast}/comments/', None),
+    ('expert_comments', '/api/experts/profiles/{expert}/comments/', 'reader'),
+]
+
+# How far a result may exceed the baseline before it counts as a
+# regression: extra queries, relative growth in bytes, and relative plus
+# absolute (ms) growth in latency, which is noisy at the low end
+DEFAULT_TOLERANCES = {
+    'queries': 0,
+    'bytes': 0.05,
+    'latency': 1.0,
+    'latency_ms': 5.0,
+}
+
+
+def dataset():
+    return {'prefix': DATASET_PREFIX, 'seed': DATASET_SEED, 'volumes': DATASET_VOLUMES}
+
+
+def pick_subjects():
+    """
+    The busiest rows of the seeded data: the user and partner with the
+    longest chat history, and the podcast and expert with the most comments
+    """
+    pair = (
+        Message.objects.values('sender_id', 'receiver_id')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'sender_id', 'receiver_id')
+        .first()
+    )
+    podcast = Podcast.objects.order_by('-comments_count', 'pk').first()
+    expert = (
+        ExpertProfile.objects.annotate(comment_count=Count('comments'))
+        .order_by('-comment_count', 'pk')
+        .first()
+    )
+    if pair is None or podcast is None or expert is None:
+        raise ValueError('The database holds no messages, podcasts or experts to benchmark.')
+    return {
+        'reader': User.objects.get(pk=pair['receiver_id']),
+        'partner': pair['sender_id'],
+        'podcast': podcast.pk,
+        'expert': expert.pk,
+        # Matches a hundred generated usernames
+        'search': f'{DATASET_PREFIX}_00001',
+    }
+
+
+def percentile(samples, percent):
+    """Nearest-rank percentile of ``samples``"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def measure(client, path, iterations, warmup):
+    """
+    GET ``path`` ``warmup`` times, once more counting queries, then
+    ``iterations`` timed times
+    """
+    for _ in range(warmup):
+        client.get(path)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(path)
+    # Read now: the next request resets the connection's query log
+    query_count = len(queries)
+    if response.status_code != 200:
+        raise ValueError(f'GET {path} returned {response.status_code}.')
+    timings = []
+    for _ in range(max(1, iterations)):
+        started = time.perf_counter()
+        client.get(path)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'queries': query_count,
+        'bytes': len(response.content),
+    }
+
+
+def run(iterations=30, warmup=3, names=None):
+    """Measure every endpoint (or those in ``names``) against the current database"""
+    subjects = pick_subjects()
+    results = {}
+    for name, path, user in ENDPOINTS:
+        if names and name not in names:
+            continue
+        client = APIClient()
+        if user:
+            client.force_authenticate(subjects[user])
+        results[name] = measure(client, path.format(**subjects), iterations, warmup)
+    return results
+
+
+def compare(results, baseline, tolerances=None, latency=True):
+    """
+    Regressions of ``results`` against ``baseline['endpoints']``, as
+    readable lines. Endpoints missing from the baseline are not compared.
+    """
+    tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get('endpoints', {}).get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries'] + tolerances['queries']:
+            regressions.append(
+                f"{name}: {result['queries']} queries (baseline {expected['queries']})"
+            )
+        if result['bytes'] > expected['bytes'] * (1 + tolerances['bytes']):
+            regressions.append(
+                f"{name}: {result['bytes']} bytes (baseline {expected['bytes']})"
+            )
+        if not latency:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            limit = expected[key] * (1 + tolerances['latency']) + tolerances['latency_ms']
+            if result[key] > limit:
+                regressions.append(
+                    f'{name}: {key} {result[key]} (baseline {expected[key]}, limit {limit:.2f})'
+                )
+    return regressions
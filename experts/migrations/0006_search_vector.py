@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:58
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def populate_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # Same configuration as backend.search uses at runtime
+    config = getattr(settings, 'SEARCH_CONFIG', 'english')
+    schema_editor.execute(
+        """
+        UPDATE experts_expertprofile AS e SET search_vector =
+            setweight(to_tsvector(%s::regconfig, coalesce(e.name, '')), 'A') ||
+            setweight(to_tsvector(%s::regconfig, coalesce(e.expertise, '')), 'A') ||
+            setweight(to_tsvector(%s::regconfig, coalesce(e.bio, '')), 'B') ||
+            setweight(to_tsvector(%s::regconfig, coalesce(u.username, '')), 'C')
+        FROM users_customuser AS u
+        WHERE u.id = e.user_id
+        """,
+        [config] * 4
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experts', '0005_expertprofile_email'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expertprofile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='expertprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='expert_search_vector_gin'),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
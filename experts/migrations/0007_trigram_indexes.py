@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:04
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experts', '0006_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='expertprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='expert_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='expertprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['expertise'], name='expert_expertise_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experts', '0007_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expertprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='expertcomment',
+            index=models.Index(fields=['expert', '-updated_at'], name='expert_comment_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expertreaction',
+            index=models.Index(fields=['expert', '-updated_at'], name='expert_reaction_updated_idx'),
+        ),
+    ]
@@ -1,10 +1,18 @@
 import os
 import cloudinary
 import cloudinary.uploader
-from cloudinary.utils import cloudinary_url
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from backend.cloudinary_uploads import is_pending_upload
+from backend.image_urls import (
+    default_image_url, image_srcset, image_variants,
+)
+from backend.search import update_search_vectors
 
 User = get_user_model()
 
@@ -29,6 +37,77 @@ class ExpertCategory(models.Model):
         verbose_name_plural = "Expert Categories"
 
 
+def expert_count(model, field, **filters):
+    """Correlated COUNT(*) of ``model`` rows whose ``field`` is the outer expert"""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}, **filters)
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def expert_latest(model, field, timestamp):
+    """Correlated MAX(``timestamp``) of ``model`` rows whose ``field`` is the outer expert"""
+    # ORDER BY ... LIMIT 1 walks the (expert, -timestamp) index backwards
+    return Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by(f'-{timestamp}').values(timestamp)[:1]
+    )
+
+
+class ExpertProfileQuerySet(models.QuerySet):
+    def with_list_relations(self):
+        """
+        Load everything ExpertProfileListSerializer reads in a fixed number
+        of queries. Each counter is its own correlated subquery so the
+        views/bookmarks/reactions joins never multiply each other's rows.
+        """
+        views = ExpertProfile.views.through
+        bookmarks = ExpertProfile.bookmarks.through
+        return self.select_related('user').prefetch_related(
+            'categories'
+        ).annotate(
+            views_total=expert_count(views, 'expertprofile'),
+            bookmarks_total=expert_count(bookmarks, 'expertprofile'),
+            likes_total=expert_count(
+                ExpertReaction, 'expert', reaction_type='like'
+            ),
+            dislikes_total=expert_count(
+                ExpertReaction, 'expert', reaction_type='dislike'
+            ),
+        )
+
+    def with_last_activity(self):
+        """
+        Annotate when the expert's comments and reactions last changed, and
+        the related row counts, which also change when rows are deleted
+        """
+        return self.annotate(
+            last_comment_at=expert_latest(ExpertComment, 'expert', 'updated_at'),
+            last_reaction_at=expert_latest(
+                ExpertReaction, 'expert', 'updated_at'
+            ),
+            comments_total=expert_count(ExpertComment, 'expert'),
+            reactions_total=expert_count(ExpertReaction, 'expert'),
+            views_total=expert_count(ExpertProfile.views.through, 'expertprofile'),
+            bookmarks_total=expert_count(
+                ExpertProfile.bookmarks.through, 'expertprofile'
+            ),
+        )
+
+    def update_search_vectors(self):
+        """Recompute search_vector from name, expertise, bio and username"""
+        return update_search_vectors(
+            self, 'e',
+            [
+                ('e.name', 'A'), ('e.expertise', 'A'), ('e.bio', 'B'),
+                ('u.username', 'C'),
+            ],
+            joins=f'FROM {User._meta.db_table} AS u',
+            join_condition='u.id = e.user_id',
+        )
+
+
 class ExpertProfile(models.Model):
     user = models.OneToOneField(
         'users.CustomUser',
@@ -46,11 +125,13 @@ class ExpertProfile(models.Model):
     profile_picture = models.ImageField(
         upload_to='expert_profiles/', 
         blank=True, 
-        null=True
+        null=True,
+        db_index=True
     )
     is_approved = models.BooleanField(default=False)
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
     views = models.ManyToManyField(
         'users.CustomUser', 
         related_name='viewed_experts', 
@@ -61,6 +142,29 @@ class ExpertProfile(models.Model):
         related_name='bookmarked_experts', 
         blank=True
     )
+    # Full-text search document, maintained by experts.signals
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ExpertProfileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(
+                fields=['search_vector'],
+                name='expert_search_vector_gin'
+            ),
+            # Trigram indexes backing the search suggestions
+            GinIndex(
+                fields=['name'],
+                name='expert_name_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+            GinIndex(
+                fields=['expertise'],
+                name='expert_expertise_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+        ]
 
     def get_likes_count(self):
         return self.reactions.filter(reaction_type='like').count()
@@ -80,37 +184,32 @@ class ExpertProfile(models.Model):
     @property
     def profile_picture_url(self):
         """Return profile picture URL or default image if no profile picture exists"""
-        if self.profile_picture and hasattr(self.profile_picture, 'name') and self.profile_picture.name:
-            # Generate Cloudinary URL directly
+        # Deferred uploads show the default image until they finish
+        if (self.profile_picture and hasattr(self.profile_picture, 'name')
+                and self.profile_picture.name
+                and not is_pending_upload(self.profile_picture.name)):
             try:
-                # Remove leading slash if present and build URL via Cloudinary
-                clean_name = self.profile_picture.name.lstrip('/')
-                url, _ = cloudinary_url(clean_name, secure=True, resource_type="image")
+                # Goes through the configured storage (Cloudinary or local)
+                url = self.profile_picture.url
                 if url:
                     return url
             except Exception:
                 pass
-        
+
         # Return a default placeholder image URL
-        try:
-            from django.conf import settings
-            default_image = getattr(
-                settings, 'CLOUDINARY_DEFAULT_EXPERT_IMAGE',
-                'expert_profiles/default_profile.png'
-            )
-            url, _ = cloudinary_url(default_image, secure=True, resource_type="image")
-            if url:
-                return url
-        except Exception:
-            pass
-        
-        # Fallback to relative path if Cloudinary config fails
-        from django.conf import settings
-        default_image = getattr(
-            settings, 'CLOUDINARY_DEFAULT_EXPERT_IMAGE',
+        return default_image_url(
+            'CLOUDINARY_DEFAULT_EXPERT_IMAGE',
             'expert_profiles/default_profile.png'
         )
-        return f"/{default_image}"
+
+    @property
+    def profile_picture_variants(self):
+        """Preset name -> resized URL derived from profile_picture_url"""
+        return image_variants(self.profile_picture_url)
+
+    @property
+    def profile_picture_srcset(self):
+        return image_srcset(self.profile_picture_url)
 
     def save(self, *args, **kwargs):
         """Override save to handle any additional logic if needed"""
@@ -138,6 +237,13 @@ class ExpertComment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Backs ExpertProfile.objects.with_last_activity()
+            models.Index(
+                fields=['expert', '-updated_at'],
+                name='expert_comment_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'Comment by {self.user.username} on {self.expert.name}\'s profile'
@@ -160,6 +266,13 @@ class ExpertReaction(models.Model):
 
     class Meta:
         unique_together = ('expert', 'user')
+        indexes = [
+            # Backs ExpertProfile.objects.with_last_activity()
+            models.Index(
+                fields=['expert', '-updated_at'],
+                name='expert_reaction_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} {self.reaction_type}d {self.expert.name}"
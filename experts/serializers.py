@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from backend.cloudinary_uploads import is_pending_upload
 from django.contrib.auth import get_user_model
 from .models import (
     ExpertProfile, ExpertComment, ExpertCategory, ExpertReaction
@@ -41,8 +42,13 @@ class ExpertCommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
     def get_replies(self, obj):
-        replies = ExpertComment.objects.filter(parent=obj)
-        return ExpertCommentSerializer(replies, many=True).data
+        # Assembled in memory by backend.comment_tree.build_comment_tree()
+        replies = getattr(obj, 'tree_replies', None)
+        if replies is None:
+            replies = obj.replies.select_related('user')
+        return ExpertCommentSerializer(
+            replies, many=True, context=self.context
+        ).data
 
 
 class ExpertReactionSerializer(serializers.ModelSerializer):
@@ -72,28 +78,37 @@ class ExpertProfileSerializer(serializers.ModelSerializer):
     # Keep profile_picture as a regular ImageField for file uploads
     # Add a separate field for the Cloudinary URL
     profile_picture_display_url = serializers.SerializerMethodField()
+    profile_picture_pending = serializers.SerializerMethodField()
     
     class Meta:
         model = ExpertProfile
         fields = [
             'id', 'user', 'name', 'bio', 'expertise', 'categories',
             'category_ids', 'experience_years', 'website', 'social_media',
-            'email', 'profile_picture', 'profile_picture_display_url', 'is_approved',
+            'email', 'profile_picture', 'profile_picture_display_url',
+            'profile_picture_pending', 'is_approved',
             'is_featured', 'created_at', 'total_views', 'total_bookmarks',
             'comments', 'likes_count', 'dislikes_count'
         ]
         read_only_fields = ['is_approved']
 
     def get_total_views(self, obj):
+        # Annotated by ExpertProfile.objects.with_list_relations()
+        if hasattr(obj, 'views_total'):
+            return obj.views_total
         return obj.get_total_views()
 
     def get_total_bookmarks(self, obj):
+        if hasattr(obj, 'bookmarks_total'):
+            return obj.bookmarks_total
         return obj.get_total_bookmarks()
 
     def get_profile_picture_display_url(self, obj):
         """Return Cloudinary URL for profile picture"""
         if not obj or not obj.profile_picture:
             return None
+        if is_pending_upload(obj.profile_picture.name):
+            return obj.profile_picture_url
         
         # Use the file field's url property which already contains the correct Cloudinary URL
         if hasattr(obj.profile_picture, 'url'):
@@ -101,10 +116,18 @@ class ExpertProfileSerializer(serializers.ModelSerializer):
         
         return None
 
+    def get_profile_picture_pending(self, obj):
+        """Whether a deferred profile picture upload is still in progress"""
+        return is_pending_upload(obj.profile_picture.name)
+
     def get_likes_count(self, obj):
+        if hasattr(obj, 'likes_total'):
+            return obj.likes_total
         return obj.get_likes_count()
 
     def get_dislikes_count(self, obj):
+        if hasattr(obj, 'dislikes_total'):
+            return obj.dislikes_total
         return obj.get_dislikes_count()
 
     def create(self, validated_data):
@@ -124,3 +147,35 @@ class ExpertProfileSerializer(serializers.ModelSerializer):
             expert_profile.categories.set(category_ids)
 
         return expert_profile
+
+
+class ExpertProfileListSerializer(ExpertProfileSerializer):
+    """
+    Read-only card representation used by the expert list endpoints.
+    Leaves out the comment tree; pair it with
+    ExpertProfile.objects.with_list_relations() so the counters come from
+    annotations instead of per-row COUNT queries.
+    """
+    comments = None
+    category_ids = None
+    # Resized derivatives (thumb/card/hero) for list cards
+    profile_picture_variants = serializers.SerializerMethodField()
+    profile_picture_srcset = serializers.SerializerMethodField()
+
+    class Meta(ExpertProfileSerializer.Meta):
+        fields = [
+            'id', 'user', 'name', 'bio', 'expertise', 'categories',
+            'experience_years', 'website', 'social_media', 'email',
+            'profile_picture', 'profile_picture_display_url',
+            'profile_picture_pending', 'profile_picture_variants',
+            'profile_picture_srcset', 'is_approved',
+            'is_featured', 'created_at', 'total_views', 'total_bookmarks',
+            'likes_count', 'dislikes_count'
+        ]
+        read_only_fields = fields
+
+    def get_profile_picture_variants(self, obj):
+        return obj.profile_picture_variants
+
+    def get_profile_picture_srcset(self, obj):
+        return obj.profile_picture_srcset
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from backend.response_cache import invalidate
+from .models import ExpertCategory, ExpertProfile
+
+
+@receiver(post_save, sender=ExpertProfile)
+def update_expert_search_vector(sender, instance, raw=False, **kwargs):
+    """Keep the expert's full-text search document in step with its fields"""
+    if raw:
+        return
+    ExpertProfile.objects.filter(pk=instance.pk).update_search_vectors()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def update_user_expert_search_vector(sender, instance, raw=False,
+                                     update_fields=None, **kwargs):
+    """The username is part of the expert's search document"""
+    if raw or (update_fields and 'username' not in update_fields):
+        return
+    ExpertProfile.objects.filter(user=instance).update_search_vectors()
+
+
+@receiver(post_save, sender=ExpertProfile)
+@receiver(post_delete, sender=ExpertProfile)
+@receiver(m2m_changed, sender=ExpertProfile.categories.through)
+def invalidate_cached_expert_lists(sender, **kwargs):
+    invalidate('experts')
+
+
+@receiver(post_save, sender=ExpertCategory)
+@receiver(post_delete, sender=ExpertCategory)
+def invalidate_cached_expert_categories(sender, **kwargs):
+    # Experts embed their categories
+    invalidate('experts', 'expert-categories')
@@ -1 +1,301 @@
-# Create your tests here.
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from .models import ExpertCategory, ExpertComment, ExpertProfile, ExpertReaction
+from .views import ExpertCommentViewSet
+
+User = get_user_model()
+
+
+class ExpertCommentThreadTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fan', password='pass')
+        self.expert = ExpertProfile.objects.create(
+            user=User.objects.create_user(
+                username='expert', password='pass', user_type='expert'
+            ),
+            name='Expert',
+            bio='Bio',
+            expertise='Testing',
+            experience_years=5,
+            is_approved=True,
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_thread(self, depth):
+        parent = None
+        for level in range(depth + 1):
+            parent = ExpertComment.objects.create(
+                expert=self.expert, user=self.user,
+                content=f'Level {level}', parent=parent
+            )
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def get_comment_list(self):
+        # The nested comments/ route is shadowed by the profile's comments
+        # action in the URLconf, so call the viewset directly.
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.user)
+        view = ExpertCommentViewSet.as_view({'get': 'list'})
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, expert_pk=self.expert.pk)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def depth_of(self, comment):
+        if not comment['replies']:
+            return 0
+        return 1 + max(self.depth_of(reply) for reply in comment['replies'])
+
+    def test_threads_are_built_from_one_comment_query(self):
+        url = f'/api/experts/profiles/{self.expert.pk}/comments/'
+        fetchers = (lambda: self.get(url), self.get_comment_list)
+        self.create_thread(depth=1)
+        small = [fetch()[1] for fetch in fetchers]
+        for _ in range(5):
+            self.create_thread(depth=4)
+        for fetch, expected in zip(fetchers, small):
+            data, queries = fetch()
+            self.assertEqual(queries, expected)
+            self.assertEqual(len(data), 6)
+            self.assertEqual(max(self.depth_of(c) for c in data), 4)
+
+    def test_depth_is_capped(self):
+        self.create_thread(depth=6)
+        url = f'/api/experts/profiles/{self.expert.pk}/comments/'
+
+        data, _ = self.get(f'{url}?max_depth=3')
+        self.assertEqual(self.depth_of(data[0]), 3)
+        with self.settings(COMMENT_THREAD_MAX_DEPTH=2):
+            data, _ = self.get(url)
+            self.assertEqual(self.depth_of(data[0]), 2)
+
+
+class ExpertListQueryCountTests(APITestCase):
+    # Experts (with user joined and counters annotated) and categories
+    MAX_LIST_QUERIES = 2
+    LIST_URLS = (
+        '/api/experts/',
+        '/api/experts/featured/',
+        '/api/experts/profiles/',
+        '/api/experts/profiles/featured/',
+    )
+
+    def setUp(self):
+        self.category = ExpertCategory.objects.create(name='Science')
+        self.fans = [
+            User.objects.create_user(username=f'fan{i}', password='pass')
+            for i in range(3)
+        ]
+
+    def create_experts(self, count):
+        start = ExpertProfile.objects.count()
+        for i in range(start, start + count):
+            expert = ExpertProfile.objects.create(
+                user=User.objects.create_user(
+                    username=f'expert{i}', password='pass', user_type='expert'
+                ),
+                name=f'Expert {i}',
+                bio='Bio',
+                expertise='Testing',
+                experience_years=5,
+                is_approved=True,
+                is_featured=True,
+            )
+            expert.categories.add(self.category)
+            expert.views.add(*self.fans)
+            expert.bookmarks.add(self.fans[0])
+            ExpertReaction.objects.create(
+                expert=expert, user=self.fans[0], reaction_type='like'
+            )
+            ExpertReaction.objects.create(
+                expert=expert, user=self.fans[1], reaction_type='like'
+            )
+            ExpertReaction.objects.create(
+                expert=expert, user=self.fans[2], reaction_type='dislike'
+            )
+            ExpertComment.objects.create(
+                expert=expert, user=self.fans[0], content='Comment'
+            )
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_list_query_count_is_constant(self):
+        self.create_experts(2)
+        small = {url: self.get(url)[1] for url in self.LIST_URLS}
+        self.create_experts(5)
+        for url in self.LIST_URLS:
+            data, queries = self.get(url)
+            self.assertTrue(data)
+            self.assertEqual(queries, small[url])
+            self.assertLessEqual(queries, self.MAX_LIST_QUERIES)
+
+    def test_list_payload_uses_annotated_counters(self):
+        self.create_experts(1)
+        data, _ = self.get('/api/experts/')
+        expert = data[0]
+
+        self.assertNotIn('comments', expert)
+        self.assertEqual(expert['total_views'], 3)
+        self.assertEqual(expert['total_bookmarks'], 1)
+        self.assertEqual(expert['likes_count'], 2)
+        self.assertEqual(expert['dislikes_count'], 1)
+        self.assertEqual(expert['categories'][0]['name'], 'Science')
+
+    def test_detail_view_keeps_full_payload(self):
+        self.create_experts(1)
+        expert = ExpertProfile.objects.get()
+        data, _ = self.get(f'/api/experts/{expert.pk}/')
+
+        self.assertEqual(len(data['comments']), 1)
+        self.assertEqual(data['likes_count'], 2)
+
+
+class ExpertResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = ExpertCategory.objects.create(name='Science')
+        self.expert = ExpertProfile.objects.create(
+            user=User.objects.create_user(
+                username='expert', password='pass', user_type='expert'
+            ),
+            name='Ada', bio='Bio', expertise='Testing', experience_years=5,
+            is_approved=True, is_featured=True,
+        )
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_featured_experts_follow_category_changes(self):
+        self.get('/api/experts/featured/')
+        self.assertEqual(self.get('/api/experts/featured/')[1], 0)
+
+        self.expert.categories.add(self.category)
+        data, queries = self.get('/api/experts/featured/')
+        self.assertGreater(queries, 0)
+        self.assertEqual(data[0]['categories'][0]['name'], 'Science')
+
+        self.get('/api/experts/categories/')
+        ExpertCategory.objects.create(name='History')
+        data, queries = self.get('/api/experts/categories/')
+        self.assertGreater(queries, 0)
+        self.assertEqual(len(data), 2)
+
+
+class ExpertConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            username='expert', password='pass', user_type='expert'
+        )
+        self.fan = User.objects.create_user(username='fan', password='pass')
+        self.expert = ExpertProfile.objects.create(
+            user=self.owner, name='Ada', bio='Bio', expertise='Testing',
+            experience_years=5, is_approved=True,
+        )
+        self.url = f'/api/experts/{self.expert.pk}/'
+
+    def get(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, headers=headers)
+        return response, len(queries)
+
+    def test_unchanged_profile_costs_one_query(self):
+        first, _ = self.get()
+        self.assertEqual(first.status_code, 200)
+        response, queries = self.get(if_none_match=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, 1)
+
+    def test_reactions_comments_and_edits_change_the_etag(self):
+        etag = self.get()[0]['ETag']
+        reaction = ExpertReaction.objects.create(
+            expert=self.expert, user=self.fan, reaction_type='like'
+        )
+        etags = {etag, self.get()[0]['ETag']}
+
+        reaction.reaction_type = 'dislike'
+        reaction.save()
+        etags.add(self.get()[0]['ETag'])
+
+        ExpertComment.objects.create(
+            expert=self.expert, user=self.fan, content='Comment'
+        )
+        etags.add(self.get()[0]['ETag'])
+
+        self.expert.bookmarks.add(self.fan)
+        etags.add(self.get()[0]['ETag'])
+
+        ExpertProfile.objects.filter(pk=self.expert.pk).update(
+            profile_picture='https://res.cloudinary.com/demo/image/upload/v1/ada.png'
+        )
+        etags.add(self.get()[0]['ETag'])
+
+        self.expert.bio = 'New bio'
+        self.expert.save()
+        response, _ = self.get(if_none_match=', '.join(etags))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['bio'], 'New bio')
+        self.assertEqual(len(etags), 6)
+
+    def test_unapproved_profile_is_only_shown_to_its_owner(self):
+        ExpertProfile.objects.filter(pk=self.expert.pk).update(is_approved=False)
+        self.assertEqual(self.get(if_none_match='*')[0].status_code, 403)
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.get(if_none_match='*')[0].status_code, 304)
+
+
+class ExpertSearchTests(APITestCase):
+    LIST_URLS = ('/api/experts/', '/api/experts/profiles/')
+
+    def setUp(self):
+        self.experts = [
+            ExpertProfile.objects.create(
+                user=User.objects.create_user(
+                    username=username, password='pass', user_type='expert'
+                ),
+                name=name, bio=bio, expertise=expertise,
+                experience_years=3, is_approved=True,
+            )
+            for username, name, bio, expertise in (
+                ('astro', 'Ada Stone', 'Writes about telescopes', 'Astronomy'),
+                ('chef', 'Carl Bake', 'Loves astronomy documentaries', 'Cooking'),
+                ('coder', 'Cody Byte', 'Backend engineer', 'Python'),
+            )
+        ]
+
+    def search(self, url, term):
+        response = self.client.get(url, {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data]
+
+    def test_search_matches_name_bio_expertise_and_username(self):
+        astro, chef, coder = self.experts
+        for url in self.LIST_URLS:
+            self.assertCountEqual(
+                self.search(url, 'astronomy'), [astro.pk, chef.pk]
+            )
+            self.assertEqual(self.search(url, 'Cody'), [coder.pk])
+            self.assertEqual(self.search(url, 'coder'), [coder.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search needs PostgreSQL')
+    def test_expertise_matches_rank_above_bio_matches(self):
+        astro, chef, _ = self.experts
+        for url in self.LIST_URLS:
+            self.assertEqual(self.search(url, 'astro'), [astro.pk, chef.pk])
@@ -1,3 +1,5 @@
+import logging
+
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status, filters, viewsets
 from rest_framework.response import Response
@@ -7,14 +9,35 @@ from rest_framework.pagination import PageNumberPagination
 from .models import ExpertProfile, ExpertComment, ExpertReaction, ExpertCategory
 from .serializers import (
     ExpertProfileSerializer,
+    ExpertProfileListSerializer,
     ExpertCommentSerializer,
     ExpertReactionSerializer,
     ExpertCategorySerializer
 )
 from rest_framework.decorators import action
-from django.db.models import Q
-
-# Create your views here.
+from backend.comment_tree import CommentThreadsMixin
+from backend.conditional import ConditionalRetrieveMixin
+from backend.response_cache import CachedResponseMixin
+from backend.search import search_queryset
+
+logger = logging.getLogger(__name__)
+
+# Fields matched by ?search= when full-text search is unavailable
+EXPERT_SEARCH_FIELDS = ['name', 'bio', 'expertise', 'user__username']
+
+
+def log_saved_profile_picture(expert):
+    # Resolving .url isn't free, so only do it when debug logging is on
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    picture = expert.profile_picture
+    if picture:
+        logger.debug(
+            'Saved profile picture of expert %s: stored %s, url %s',
+            expert.pk, picture.name, picture.url
+        )
+    else:
+        logger.debug('Expert %s has no profile picture after save', expert.pk)
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -30,14 +53,20 @@ class IsExpertOwner(permissions.BasePermission):
         return obj.user == request.user
 
 
-class ExpertListView(generics.ListAPIView):
-    serializer_class = ExpertProfileSerializer
+class ExpertListView(CachedResponseMixin, generics.ListAPIView):
+    serializer_class = ExpertProfileListSerializer
     permission_classes = [permissions.AllowAny]
+    cache_group = 'experts'
+
+    def should_cache_response(self, request):
+        # Only the featured list; searches would fill the cache with misses
+        return (
+            request.path.endswith('/featured/')
+            and super().should_cache_response(request)
+        )
 
     def get_queryset(self):
-        from django.db.models import Q
-        
-        queryset = ExpertProfile.objects.all()
+        queryset = ExpertProfile.objects.with_list_relations()
         
         # Check if this is a featured request
         if self.request.path.endswith('/featured/'):
@@ -55,11 +84,8 @@ class ExpertListView(generics.ListAPIView):
         # Handle search filter
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(bio__icontains=search) |
-                Q(expertise__icontains=search) |
-                Q(user__username__icontains=search)
+            queryset = search_queryset(
+                queryset, search, EXPERT_SEARCH_FIELDS
             )
         
         return queryset
@@ -81,11 +107,30 @@ class ExpertProfileCreateView(generics.CreateAPIView):
         serializer.save(user=self.request.user, is_approved=False)
 
 
-class ExpertProfileDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ExpertProfileDetailView(
+    ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView
+):
     serializer_class = ExpertProfileSerializer
     permission_classes = [permissions.AllowAny]
     queryset = ExpertProfile.objects.all()
 
+    def get_validator_state(self):
+        state = get_object_or_404(
+            ExpertProfile.objects.with_last_activity().values(
+                'user_id', 'is_approved', 'updated_at', 'last_comment_at',
+                'last_reaction_at', 'comments_total', 'reactions_total',
+                'views_total', 'bookmarks_total',
+                # Changed with update(), which leaves updated_at alone
+                'profile_picture',
+                'user__username', 'user__email',
+            ),
+            pk=self.kwargs['pk'],
+        )
+        if (not state['is_approved'] and not self.request.user.is_staff and
+                state['user_id'] != self.request.user.pk):
+            raise PermissionDenied("This profile is not approved yet.")
+        return state
+
     def get_object(self):
         obj = super().get_object()
         if (not obj.is_approved and not self.request.user.is_staff and
@@ -120,15 +165,15 @@ class ExpertProfileListView(generics.ListAPIView):
     List all approved expert profiles.
     Supports pagination, searching, and filtering.
     """
-    serializer_class = ExpertProfileSerializer
+    serializer_class = ExpertProfileListSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = StandardResultsSetPagination
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['specialty', 'user__username', 'bio', 'expertise', 'user__email']
-    ordering_fields = ['user__username', 'specialty', 'created_at']
+    # ?search= is handled in get_queryset with full-text search
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['user__username', 'created_at']
 
     def get_queryset(self):
-        queryset = ExpertProfile.objects.all()
+        queryset = ExpertProfile.objects.with_list_relations()
         if not self.request.user.is_staff:
             queryset = queryset.filter(is_approved=True)
 
@@ -138,12 +183,8 @@ class ExpertProfileListView(generics.ListAPIView):
 
         search_term = self.request.query_params.get('search', None)
         if search_term:
-            queryset = queryset.filter(
-                Q(specialty__icontains=search_term) |
-                Q(user__username__icontains=search_term) |
-                Q(bio__icontains=search_term) |
-                Q(expertise__icontains=search_term) |
-                Q(user__email__icontains=search_term)
+            queryset = search_queryset(
+                queryset, search_term, EXPERT_SEARCH_FIELDS
             )
 
         return queryset
@@ -165,25 +206,17 @@ class MyExpertProfileView(generics.RetrieveUpdateAPIView):
         instance = self.get_object()
         
         if profile_picture:
-            # Log before deletion
             if instance.profile_picture:
-                print(f"🗑️ Deleting old profile picture: {instance.profile_picture.name}")
-                instance.profile_picture.delete()
-            
-            print(f"📤 Uploading new profile picture: {profile_picture.name} ({profile_picture.size} bytes)")
+                logger.debug('Deleting old profile picture %s', instance.profile_picture.name)
+                instance.profile_picture.delete(save=False)
+            logger.debug(
+                'Uploading new profile picture %s (%d bytes)',
+                profile_picture.name, profile_picture.size
+            )
 
         # Save the instance (this will trigger the storage backend to upload to Cloudinary)
         saved_instance = serializer.save(user=self.request.user)
-        
-        # Log after save to verify the file was saved correctly
-        # This confirms that the DB value is the secure Cloudinary URL and .url returns the same URL
-        if saved_instance.profile_picture:
-            print("✅ [MyExpertProfileView] Profile picture saved:")
-            print(f"   - DB stored value (instance.profile_picture.name): {saved_instance.profile_picture.name}")
-            print(f"   - URL from .url property: {saved_instance.profile_picture.url}")
-            print(f"   - Values match: {saved_instance.profile_picture.name == saved_instance.profile_picture.url}")
-        else:
-            print("⚠️ [MyExpertProfileView] No profile picture after save")
+        log_saved_profile_picture(saved_instance)
 
 
 class ExpertStatsView(APIView):
@@ -211,21 +244,30 @@ class ExpertStatsView(APIView):
         })
 
 
-class ExpertProfileViewSet(viewsets.ModelViewSet):
+class ExpertProfileViewSet(CommentThreadsMixin, viewsets.ModelViewSet):
     queryset = ExpertProfile.objects.all()
     serializer_class = ExpertProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['name', 'bio', 'expertise', 'user__username']
+    # ?search= is handled in get_queryset with full-text search
+    filter_backends = [filters.OrderingFilter]
     ordering_fields = ['name', 'created_at', 'experience_years']
+    # Actions rendered with the lightweight list representation
+    list_actions = ['list', 'featured']
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'featured']:
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
 
+    def get_serializer_class(self):
+        if self.action in self.list_actions:
+            return ExpertProfileListSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         queryset = ExpertProfile.objects.all()
+        if self.action in self.list_actions:
+            queryset = queryset.with_list_relations()
         category = self.request.query_params.get('category', None)
         search = self.request.query_params.get('search', None)
 
@@ -233,12 +275,7 @@ class ExpertProfileViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(categories__id=category)
 
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(bio__icontains=search) |
-                Q(expertise__icontains=search) |
-                Q(user__username__icontains=search)
-            )
+            queryset = search_queryset(queryset, search, EXPERT_SEARCH_FIELDS)
 
         if self.action == 'list':
             queryset = queryset.filter(is_approved=True)
@@ -253,9 +290,10 @@ class ExpertProfileViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
         expert = self.get_object()
-        comments = ExpertComment.objects.filter(expert=expert, parent=None)
-        serializer = ExpertCommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        return self.comment_threads_response(
+            ExpertComment.objects.filter(expert=expert),
+            ExpertCommentSerializer
+        )
 
     @action(detail=True, methods=['post'])
     def add_comment(self, request, pk=None):
@@ -407,11 +445,13 @@ class PendingExpertProfilesView(generics.ListAPIView):
     List all pending expert profiles.
     Only accessible by admin users.
     """
-    serializer_class = ExpertProfileSerializer
+    serializer_class = ExpertProfileListSerializer
     permission_classes = [permissions.IsAdminUser]
 
     def get_queryset(self):
-        return ExpertProfile.objects.filter(is_approved=False)
+        return ExpertProfile.objects.with_list_relations().filter(
+            is_approved=False
+        )
 
 
 class ExpertProfileUpdateView(generics.UpdateAPIView):
@@ -427,28 +467,17 @@ class ExpertProfileUpdateView(generics.UpdateAPIView):
         instance = self.get_object()
         
         if profile_picture:
-            # Log before deletion
             if instance.profile_picture:
-                print(f"🗑️ [ExpertProfileUpdateView] Deleting old profile picture: {instance.profile_picture.name}")
-                instance.profile_picture.delete()
-            
-            print(
-                f"📤 [ExpertProfileUpdateView] Uploading new profile picture: "
-                f"{profile_picture.name} ({profile_picture.size} bytes)"
+                logger.debug('Deleting old profile picture %s', instance.profile_picture.name)
+                instance.profile_picture.delete(save=False)
+            logger.debug(
+                'Uploading new profile picture %s (%d bytes)',
+                profile_picture.name, profile_picture.size
             )
 
         # Save the instance (this will trigger the storage backend to upload to Cloudinary)
         saved_instance = serializer.save(user=self.request.user)
-        
-        # Log after save to verify the file was saved correctly
-        # This confirms that the DB value is the secure Cloudinary URL and .url returns the same URL
-        if saved_instance.profile_picture:
-            print("✅ [ExpertProfileUpdateView] Profile picture saved:")
-            print(f"   - DB stored value (instance.profile_picture.name): {saved_instance.profile_picture.name}")
-            print(f"   - URL from .url property: {saved_instance.profile_picture.url}")
-            print(f"   - Values match: {saved_instance.profile_picture.name == saved_instance.profile_picture.url}")
-        else:
-            print("⚠️ [ExpertProfileUpdateView] No profile picture after save")
+        log_saved_profile_picture(saved_instance)
 
 
 class ExpertCategoryViewSet(viewsets.ModelViewSet):
@@ -457,13 +486,14 @@ class ExpertCategoryViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class ExpertCategoryListView(generics.ListAPIView):
+class ExpertCategoryListView(CachedResponseMixin, generics.ListAPIView):
     """
     List all expert categories.
     """
     queryset = ExpertCategory.objects.all()
     serializer_class = ExpertCategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_group = 'expert-categories'
 
 
 class ExpertReactionViewSet(viewsets.ModelViewSet):
@@ -478,13 +508,19 @@ class ExpertReactionViewSet(viewsets.ModelViewSet):
         serializer.save(expert=expert, user=self.request.user)
 
 
-class ExpertCommentViewSet(viewsets.ModelViewSet):
+class ExpertCommentViewSet(CommentThreadsMixin, viewsets.ModelViewSet):
     serializer_class = ExpertCommentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return ExpertComment.objects.filter(expert_id=self.kwargs.get('expert_pk'))
 
+    def list(self, request, *args, **kwargs):
+        """Return the expert's comments as threads, built from one query"""
+        return self.comment_threads_response(
+            self.get_queryset(), self.get_serializer_class()
+        )
+
     def perform_create(self, serializer):
         expert = get_object_or_404(ExpertProfile, pk=self.kwargs.get('expert_pk'))
         serializer.save(expert=expert, user=self.request.user)
@@ -18,7 +18,10 @@ class PodcasterProfileAdmin(admin.ModelAdmin):
 
 @admin.register(Podcast)
 class PodcastAdmin(admin.ModelAdmin):
-    list_display = ('title', 'owner', 'category', 'is_approved', 'is_featured', 'created_at')
+    list_display = (
+        'title', 'owner', 'category', 'is_approved', 'is_featured',
+        'likes_count', 'comments_count', 'created_at'
+    )
     list_filter = ('is_approved', 'is_featured', 'category', 'created_at')
     search_fields = ('title', 'description', 'owner__user__username')
     actions = ['feature_podcasts', 'unfeature_podcasts']
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('podcasts', '0016_podcastlike'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='podcast',
+            index=models.Index(fields=['-created_at', 'id'], name='podcast_created_at_id_idx'),
+        ),
+    ]
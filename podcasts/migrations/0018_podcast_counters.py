@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Podcast = apps.get_model('podcasts', 'Podcast')
+    PodcastLike = apps.get_model('podcasts', 'PodcastLike')
+    PodcastComment = apps.get_model('podcasts', 'PodcastComment')
+
+    def count_of(model):
+        return Coalesce(Subquery(
+            model.objects.filter(podcast=OuterRef('pk'))
+            .order_by().values('podcast')
+            .annotate(total=Count('pk')).values('total')
+        ), 0)
+
+    Podcast.objects.update(
+        likes_count=count_of(PodcastLike),
+        comments_count=count_of(PodcastComment),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('podcasts', '0017_podcast_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='podcast',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='podcast',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
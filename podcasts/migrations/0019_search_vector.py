@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:58
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def populate_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # Same configuration as backend.search uses at runtime
+    config = getattr(settings, 'SEARCH_CONFIG', 'english')
+    schema_editor.execute(
+        """
+        UPDATE podcasts_podcast AS p SET search_vector =
+            setweight(to_tsvector(%s::regconfig, coalesce(p.title, '')), 'A') ||
+            setweight(to_tsvector(%s::regconfig, coalesce(p.description, '')), 'B') ||
+            setweight(to_tsvector(%s::regconfig, coalesce(u.username, '')), 'C')
+        FROM podcasts_podcasterprofile AS pp
+        JOIN users_customuser AS u ON u.id = pp.user_id
+        WHERE pp.id = p.owner_id
+        """,
+        [config] * 3
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('podcasts', '0018_podcast_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='podcast',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='podcast',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='podcast_search_vector_gin'),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:04
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('podcasts', '0019_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='podcast',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='podcast_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
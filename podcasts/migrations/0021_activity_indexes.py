@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('podcasts', '0020_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='podcastcomment',
+            index=models.Index(fields=['podcast', '-updated_at'], name='podcast_comment_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='podcastlike',
+            index=models.Index(fields=['podcast', '-created_at'], name='podcast_like_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('podcasts', '0022_file_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='podcast',
+            name='views',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
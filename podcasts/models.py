@@ -1,11 +1,19 @@
 import os
 import cloudinary
 import cloudinary.uploader
-from cloudinary.utils import cloudinary_url
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.utils.text import slugify
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from backend.cloudinary_uploads import is_pending_upload
+from backend.image_urls import (
+    default_image_url, image_srcset, image_variants,
+)
+from backend.search import update_search_vectors
 
 User = get_user_model()
 
@@ -63,6 +71,85 @@ class PodcasterProfile(models.Model):
         return profile
 
 
+def related_count(model):
+    """Correlated COUNT(*) of ``model`` rows pointing at the outer podcast"""
+    return Coalesce(Subquery(
+        model.objects.filter(podcast=OuterRef('pk'))
+        .order_by().values('podcast')
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def related_latest(model, field):
+    """Correlated MAX(``field``) of ``model`` rows pointing at the outer podcast"""
+    # ORDER BY ... LIMIT 1 walks the (podcast, -field) index backwards
+    return Subquery(
+        model.objects.filter(podcast=OuterRef('pk'))
+        .order_by(f'-{field}').values(field)[:1]
+    )
+
+
+class PodcastQuerySet(models.QuerySet):
+    def with_list_relations(self):
+        """
+        Load everything PodcastSerializer reads in a fixed number of queries,
+        however many podcasts are returned.
+        """
+        replies = PodcastComment.objects.select_related('user')
+        top_level_comments = (
+            PodcastComment.objects.filter(parent=None)
+            .select_related('user')
+            .prefetch_related(Prefetch('replies', queryset=replies))
+        )
+        return self.select_related('owner__user', 'category').prefetch_related(
+            Prefetch(
+                'podcast_comments',
+                queryset=top_level_comments,
+                to_attr='top_level_comments'
+            )
+        )
+
+    def with_actual_counts(self):
+        """Annotate the like/comment counts computed from the related rows"""
+        return self.annotate(
+            actual_likes_count=related_count(PodcastLike),
+            actual_comments_count=related_count(PodcastComment),
+        )
+
+    def with_last_activity(self):
+        """Annotate when the podcast's comments and likes last changed"""
+        return self.annotate(
+            last_comment_at=related_latest(PodcastComment, 'updated_at'),
+            last_like_at=related_latest(PodcastLike, 'created_at'),
+        )
+
+    def with_drifted_counts(self):
+        """Podcasts whose stored counters disagree with the related rows"""
+        return self.with_actual_counts().exclude(
+            likes_count=F('actual_likes_count'),
+            comments_count=F('actual_comments_count'),
+        )
+
+    def update_search_vectors(self):
+        """Recompute search_vector from title, description and owner username"""
+        return update_search_vectors(
+            self, 'p',
+            [('p.title', 'A'), ('p.description', 'B'), ('u.username', 'C')],
+            joins=(
+                f'FROM {PodcasterProfile._meta.db_table} AS pp '
+                f'JOIN {User._meta.db_table} AS u ON u.id = pp.user_id'
+            ),
+            join_condition='pp.id = p.owner_id',
+        )
+
+    def recount_counters(self):
+        """Rewrite the stored counters from the related rows in one UPDATE"""
+        return self.update(
+            likes_count=related_count(PodcastLike),
+            comments_count=related_count(PodcastComment),
+        )
+
+
 class Podcast(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -81,16 +168,43 @@ class Podcast(models.Model):
     image = models.ImageField(
         upload_to='podcast_images/',
         null=True,
-        blank=True
+        blank=True,
+        db_index=True
     )
     link = models.URLField(null=True, blank=True, default='')
     is_approved = models.BooleanField(default=False)
     is_featured = models.BooleanField(default=False)
+    # Denormalized counters, kept in step by adjust_counters()
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped with an F() update by the view action
+    views = models.PositiveIntegerField(default=0, editable=False)
+    # Full-text search document, maintained by podcasts.signals
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PodcastQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Backs the keyset pagination on (-created_at, id)
+            models.Index(
+                fields=['-created_at', 'id'],
+                name='podcast_created_at_id_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='podcast_search_vector_gin'
+            ),
+            # Trigram index backing the search suggestions
+            GinIndex(
+                fields=['title'],
+                name='podcast_title_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -98,35 +212,55 @@ class Podcast(models.Model):
     @property
     def image_url(self):
         """Return image URL or default image if no image exists"""
-        if self.image and hasattr(self.image, 'name') and self.image.name:
+        # Deferred uploads show the default image until they finish
+        if (self.image and hasattr(self.image, 'name') and self.image.name
+                and not is_pending_upload(self.image.name)):
             try:
-                clean_name = self.image.name.lstrip('/')
-                url, _ = cloudinary_url(clean_name, secure=True, resource_type="image")
+                # Goes through the configured storage (Cloudinary or local)
+                url = self.image.url
                 if url:
                     return url
             except Exception:
                 pass
-        
+
         # Return a default placeholder image URL
-        try:
-            from django.conf import settings
-            default_image = getattr(settings, 'CLOUDINARY_DEFAULT_PODCAST_IMAGE', 'podcast_images/default_podcast.png')
-            url, _ = cloudinary_url(default_image, secure=True, resource_type="image")
-            if url:
-                return url
-        except Exception:
-            pass
-        
-        # Fallback to relative path if Cloudinary config fails
-        from django.conf import settings
-        default_image = getattr(settings, 'CLOUDINARY_DEFAULT_PODCAST_IMAGE', 'podcast_images/default_podcast.png')
-        return f"/{default_image}"
+        return default_image_url(
+            'CLOUDINARY_DEFAULT_PODCAST_IMAGE',
+            'podcast_images/default_podcast.png'
+        )
+
+    @property
+    def image_variants(self):
+        """Preset name -> resized URL derived from image_url"""
+        return image_variants(self.image_url)
+
+    @property
+    def image_srcset(self):
+        return image_srcset(self.image_url)
 
     def save(self, *args, **kwargs):
         """Override save to handle any additional logic if needed"""
         # Call the parent save method
         super().save(*args, **kwargs)
 
+    @classmethod
+    def adjust_counters(cls, pk, likes=0, comments=0):
+        """
+        Shift the denormalized counters with a single
+        UPDATE ... SET likes_count = likes_count + n, so concurrent
+        requests never lose an increment. Call inside the transaction
+        that creates or deletes the like/comment rows.
+        """
+        changes = {}
+        if likes:
+            changes['likes_count'] = Greatest(F('likes_count') + likes, 0)
+        if comments:
+            changes['comments_count'] = Greatest(
+                F('comments_count') + comments, 0
+            )
+        if changes:
+            cls.objects.filter(pk=pk).update(**changes)
+
 
 class PodcastComment(models.Model):
     podcast = models.ForeignKey(
@@ -148,6 +282,13 @@ class PodcastComment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Backs Podcast.objects.with_last_activity()
+            models.Index(
+                fields=['podcast', '-updated_at'],
+                name='podcast_comment_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'Comment by {self.user.username} on {self.podcast.title}'
@@ -164,6 +305,13 @@ class PodcastLike(models.Model):
 
     class Meta:
         unique_together = ('podcast', 'user')
+        indexes = [
+            # Backs Podcast.objects.with_last_activity()
+            models.Index(
+                fields=['podcast', '-created_at'],
+                name='podcast_like_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} liked {self.podcast.title}'
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from backend.cloudinary_uploads import is_pending_upload
 from .models import Category, PodcasterProfile, Podcast, PodcastComment
 from django.contrib.auth import get_user_model
 
@@ -21,7 +22,8 @@ class PodcasterProfileSerializer(serializers.ModelSerializer):
     def get_podcasts(self, obj):
         request = self.context.get('request')
         if request and request.user == obj.user:
-            return PodcastSerializer(obj.podcasts.all(), many=True).data
+            podcasts = obj.podcasts.with_list_relations()
+            return PodcastSerializer(podcasts, many=True).data
         return []
 
 
@@ -49,10 +51,16 @@ class PodcastCommentSerializer(serializers.ModelSerializer):
         }
 
     def get_replies(self, obj):
-        if obj.parent is not None:  # Don't get replies for replies
-            return []
-        replies = PodcastComment.objects.filter(parent=obj)
-        serializer = PodcastCommentSerializer(replies, many=True)
+        # Assembled in memory by backend.comment_tree.build_comment_tree()
+        replies = getattr(obj, 'tree_replies', None)
+        if replies is None:
+            if obj.parent_id is not None:  # Don't get replies for replies
+                return []
+            # Served from the prefetch cache when the queryset prefetched replies
+            replies = obj.replies.all()
+        serializer = PodcastCommentSerializer(
+            replies, many=True, context=self.context
+        )
         return serializer.data
 
 
@@ -64,22 +72,26 @@ class PodcastSerializer(serializers.ModelSerializer):
         required=False
     )
     comments = serializers.SerializerMethodField()
-    likes_count = serializers.SerializerMethodField()
     views = serializers.IntegerField(read_only=True, default=0)
     image_url = serializers.SerializerMethodField()
     
     # Keep image as a regular ImageField for file uploads
     # Add a separate field for the Cloudinary URL
     image_display_url = serializers.SerializerMethodField()
+    image_pending = serializers.SerializerMethodField()
+    # Resized derivatives (thumb/card/hero) for list cards
+    image_variants = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Podcast
         fields = [
             'id', 'title', 'description', 'owner', 'category', 
-            'category_id', 'image', 'image_display_url', 'image_url', 'link', 'is_approved', 
-            'created_at', 'comments', 'likes_count', 'views'
+            'category_id', 'image', 'image_display_url', 'image_url', 'image_pending',
+            'image_variants', 'image_srcset', 'link', 'is_approved', 
+            'created_at', 'comments', 'comments_count', 'likes_count', 'views'
         ]
-        read_only_fields = ['created_at']
+        read_only_fields = ['created_at', 'comments_count', 'likes_count']
 
     def get_owner(self, obj):
         return {
@@ -96,13 +108,23 @@ class PodcastSerializer(serializers.ModelSerializer):
         """Return Cloudinary URL for podcast image or default image"""
         return obj.image_url
 
+    def get_image_pending(self, obj):
+        """Whether a deferred image upload is still in progress"""
+        return is_pending_upload(obj.image.name)
+
+    def get_image_variants(self, obj):
+        return obj.image_variants
+
+    def get_image_srcset(self, obj):
+        return obj.image_srcset
+
     def get_comments(self, obj):
-        comments = obj.podcast_comments.filter(parent=None)
+        # Prefetched by Podcast.objects.with_list_relations()
+        comments = getattr(obj, 'top_level_comments', None)
+        if comments is None:
+            comments = obj.podcast_comments.filter(parent=None)
         return PodcastCommentSerializer(comments, many=True).data
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
-
 
 class PodcastStatsSerializer(serializers.ModelSerializer):
     class Meta:
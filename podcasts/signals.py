@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from backend.response_cache import invalidate
+from .models import Category, Podcast
+
+
+@receiver(post_save, sender=Podcast)
+def update_podcast_search_vector(sender, instance, raw=False, **kwargs):
+    """Keep the podcast's full-text search document in step with its fields"""
+    if raw:
+        return
+    Podcast.objects.filter(pk=instance.pk).update_search_vectors()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def update_owner_podcast_search_vectors(sender, instance, raw=False,
+                                        update_fields=None, **kwargs):
+    """The owner's username is part of every podcast's search document"""
+    if raw or (update_fields and 'username' not in update_fields):
+        return
+    Podcast.objects.filter(owner__user=instance).update_search_vectors()
+
+
+@receiver(post_save, sender=Podcast)
+@receiver(post_delete, sender=Podcast)
+def invalidate_cached_podcast_lists(sender, **kwargs):
+    # Counters are updated without save(), so they may lag in cached lists
+    invalidate('podcasts')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_cached_categories(sender, **kwargs):
+    # Podcasts embed their category
+    invalidate('podcasts', 'podcast-categories')
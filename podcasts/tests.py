@@ -1 +1,582 @@
-# Create your tests here.
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from backend.image_urls import cloudinary_image_url, image_url_cache_info
+
+from .models import (
+    Category, PodcasterProfile, Podcast, PodcastComment, PodcastLike
+)
+
+User = get_user_model()
+
+
+class PodcastListQueryCountTests(APITestCase):
+    # Podcasts (with owner, user and category joined), top-level comments
+    # and their replies.
+    MAX_LIST_QUERIES = 3
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Technology')
+        self.owner = PodcasterProfile.objects.create(
+            user=User.objects.create_user(username='host', password='pass')
+        )
+        self.listeners = [
+            User.objects.create_user(username=f'listener{i}', password='pass')
+            for i in range(3)
+        ]
+
+    def create_podcasts(self, count):
+        for i in range(count):
+            podcast = Podcast.objects.create(
+                title=f'Podcast {i}',
+                description='Description',
+                owner=self.owner,
+                category=self.category,
+                is_approved=True,
+            )
+            for listener in self.listeners:
+                PodcastLike.objects.create(podcast=podcast, user=listener)
+                comment = PodcastComment.objects.create(
+                    podcast=podcast, user=listener, content='Comment'
+                )
+                PodcastComment.objects.create(
+                    podcast=podcast,
+                    user=self.owner.user,
+                    content='Reply',
+                    parent=comment,
+                )
+        Podcast.objects.recount_counters()
+
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_list_view_query_count_is_constant(self):
+        self.create_podcasts(2)
+        small, _ = self.count_list_queries('/api/podcasts/')
+        self.create_podcasts(20)
+        large, data = self.count_list_queries('/api/podcasts/')
+
+        self.assertEqual(len(data), 22)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.MAX_LIST_QUERIES)
+
+    def test_viewset_list_query_count_is_constant(self):
+        self.create_podcasts(20)
+        count, data = self.count_list_queries('/api/podcasts/podcasts/')
+
+        self.assertEqual(len(data), 20)
+        self.assertLessEqual(count, self.MAX_LIST_QUERIES)
+
+    def test_list_payload_matches_relations(self):
+        self.create_podcasts(1)
+        _, data = self.count_list_queries('/api/podcasts/list/')
+        podcast = data[0]
+
+        self.assertEqual(podcast['owner']['username'], 'host')
+        self.assertEqual(podcast['category']['name'], 'Technology')
+        self.assertEqual(podcast['likes_count'], 3)
+        self.assertEqual(len(podcast['comments']), 3)
+        for comment in podcast['comments']:
+            self.assertEqual(len(comment['replies']), 1)
+            self.assertEqual(comment['replies'][0]['replies'], [])
+
+
+class PodcastCursorPaginationTests(APITestCase):
+    def setUp(self):
+        owner = PodcasterProfile.objects.create(
+            user=User.objects.create_user(username='host', password='pass')
+        )
+        self.podcasts = [
+            Podcast.objects.create(
+                title=f'Podcast {i}',
+                description='Description',
+                owner=owner,
+                is_approved=True,
+            )
+            for i in range(7)
+        ]
+        # Force created_at ties so the id tie-breaker is exercised
+        Podcast.objects.filter(
+            pk__in=[p.pk for p in self.podcasts[2:5]]
+        ).update(created_at=self.podcasts[2].created_at)
+        self.expected = list(
+            Podcast.objects.order_by('-created_at', 'id')
+            .values_list('id', flat=True)
+        )
+
+    def collect_pages(self, url):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get('/api/podcasts/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+
+    def test_walks_every_endpoint_in_order(self):
+        for url in ('/api/podcasts/', '/api/podcasts/list/',
+                    '/api/podcasts/podcasts/'):
+            ids, pages = self.collect_pages(f'{url}?page_size=3')
+            self.assertEqual(ids, self.expected)
+            self.assertEqual(pages, 3)
+
+    def test_featured_endpoint_is_paginated(self):
+        Podcast.objects.filter(
+            pk__in=self.expected[:4]
+        ).update(is_featured=True)
+        ids, _ = self.collect_pages('/api/podcasts/featured/?page_size=3')
+        self.assertEqual(ids, self.expected[:4])
+
+    def test_previous_cursor_returns_preceding_page(self):
+        first = self.client.get('/api/podcasts/?page_size=3').data
+        second = self.client.get(first['next']).data
+        self.assertIsNone(first['previous'])
+
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [item['id'] for item in back['results']],
+            [item['id'] for item in first['results']]
+        )
+        self.assertIsNone(back['previous'])
+
+    def test_deep_page_costs_the_same_as_first_page(self):
+        first = self.client.get('/api/podcasts/?page_size=2')
+        with CaptureQueriesContext(connection) as first_queries:
+            self.client.get('/api/podcasts/?page_size=2')
+        url = first.data['next']
+        while True:
+            with CaptureQueriesContext(connection) as page_queries:
+                response = self.client.get(url)
+            if not response.data['next']:
+                break
+            url = response.data['next']
+        self.assertEqual(len(page_queries), len(first_queries))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/podcasts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_ordering_cannot_be_combined_with_pagination(self):
+        response = self.client.get('/api/podcasts/?ordering=title&page_size=3')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.data)
+
+        response = self.client.get('/api/podcasts/?ordering=title')
+        self.assertEqual(
+            [item['title'] for item in response.data],
+            sorted(podcast.title for podcast in self.podcasts)
+        )
+
+
+class PodcastCounterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fan', password='pass')
+        self.podcast = Podcast.objects.create(
+            title='Podcast',
+            description='Description',
+            owner=PodcasterProfile.objects.create(
+                user=User.objects.create_user(username='host', password='pass')
+            ),
+            is_approved=True,
+        )
+        self.client.force_authenticate(self.user)
+
+    def assertCounters(self, likes, comments):
+        self.podcast.refresh_from_db()
+        self.assertEqual(self.podcast.likes_count, likes)
+        self.assertEqual(self.podcast.comments_count, comments)
+
+    def test_like_toggles_update_counter(self):
+        url = f'/api/podcasts/podcasts/{self.podcast.pk}/like/'
+        self.assertEqual(self.client.post(url).data['status'], 'liked')
+        self.assertCounters(likes=1, comments=0)
+        self.assertEqual(self.client.post(url).data['status'], 'unliked')
+        self.assertCounters(likes=0, comments=0)
+
+        url = f'/api/podcasts/{self.podcast.pk}/like/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertCounters(likes=1, comments=0)
+        response = self.client.get(f'/api/podcasts/{self.podcast.pk}/likes/')
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertEqual(response.data['liked_by'], ['fan'])
+        self.assertTrue(response.data['current_user_liked'])
+
+    def test_comment_create_and_delete_update_counter(self):
+        url = f'/api/podcasts/{self.podcast.pk}/comments/'
+        parent = self.client.post(url, {'content': 'First'}).data
+        self.client.post(url, {'content': 'Reply', 'parent': parent['id']})
+        self.client.post(
+            f'/api/podcasts/podcasts/{self.podcast.pk}/add_comment/',
+            {'content': 'Second'}
+        )
+        self.assertCounters(likes=0, comments=3)
+
+        # Deleting a comment also removes its replies
+        self.client.delete(f"{url}{parent['id']}/")
+        self.assertCounters(likes=0, comments=1)
+
+    def test_view_counter_skips_save(self):
+        url = f'/api/podcasts/podcasts/{self.podcast.pk}/view/'
+        self.client.post(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url)
+        self.assertEqual(response.data, {'views': 2})
+        # Just the counter, without the save() signals
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"views"', updates[0])
+        response = self.client.get(f'/api/podcasts/{self.podcast.pk}/')
+        self.assertEqual(response.data['views'], 2)
+
+    def test_recount_command_repairs_drift(self):
+        PodcastLike.objects.create(podcast=self.podcast, user=self.user)
+        PodcastComment.objects.create(
+            podcast=self.podcast, user=self.user, content='Comment'
+        )
+        self.assertCounters(likes=0, comments=0)
+
+        out = StringIO()
+        call_command('recount_podcast_counters', '--dry-run', stdout=out)
+        self.assertIn('1 would be repaired', out.getvalue())
+        self.assertCounters(likes=0, comments=0)
+
+        call_command('recount_podcast_counters', stdout=out)
+        self.assertCounters(likes=1, comments=1)
+
+
+class PodcastCommentThreadTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fan', password='pass')
+        self.podcast = Podcast.objects.create(
+            title='Podcast',
+            description='Description',
+            owner=PodcasterProfile.objects.create(
+                user=User.objects.create_user(username='host', password='pass')
+            ),
+            is_approved=True,
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_threads(self, count):
+        for i in range(count):
+            root = PodcastComment.objects.create(
+                podcast=self.podcast, user=self.user, content=f'Root {i}'
+            )
+            reply = PodcastComment.objects.create(
+                podcast=self.podcast, user=self.user, content='Reply',
+                parent=root
+            )
+            PodcastComment.objects.create(
+                podcast=self.podcast, user=self.user, content='Nested',
+                parent=reply
+            )
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_threads_are_built_from_one_comment_query(self):
+        urls = (
+            f'/api/podcasts/{self.podcast.pk}/comments/',
+            f'/api/podcasts/podcasts/{self.podcast.pk}/comments/',
+        )
+        self.create_threads(2)
+        small = [self.get(url)[1] for url in urls]
+        self.create_threads(10)
+        for url, expected in zip(urls, small):
+            data, queries = self.get(url)
+            self.assertEqual(queries, expected)
+            self.assertEqual(len(data), 12)
+            self.assertEqual(len(data[0]['replies']), 1)
+            # Podcasts only render replies to top-level comments by default
+            self.assertEqual(data[0]['replies'][0]['replies'], [])
+
+    def test_max_depth_and_thread_pagination(self):
+        self.create_threads(3)
+        url = f'/api/podcasts/{self.podcast.pk}/comments/'
+
+        data, _ = self.get(f'{url}?max_depth=2')
+        self.assertEqual(len(data[0]['replies'][0]['replies']), 1)
+        data, _ = self.get(f'{url}?max_depth=0')
+        self.assertEqual(data[0]['replies'], [])
+
+        data, _ = self.get(f'{url}?page_size=2')
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(len(data['results'][0]['replies']), 1)
+        data, _ = self.get(f'{url}?page_size=2&page=2')
+        self.assertEqual(len(data['results']), 1)
+
+
+class PodcastSearchTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='gardener', password='pass')
+        owner = PodcasterProfile.objects.create(user=self.host)
+        self.title_match = Podcast.objects.create(
+            title='Composting basics', description='Soil and worms',
+            owner=owner, is_approved=True,
+        )
+        self.description_match = Podcast.objects.create(
+            title='Weekend chat', description='We talk about composting',
+            owner=owner, is_approved=True,
+        )
+        Podcast.objects.create(
+            title='Space news', description='Rockets', owner=owner,
+            is_approved=True,
+        )
+
+    def search(self, url, term):
+        response = self.client.get(url, {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data]
+
+    def test_search_matches_title_description_and_owner(self):
+        for url in ('/api/podcasts/', '/api/podcasts/podcasts/'):
+            self.assertCountEqual(
+                self.search(url, 'composting'),
+                [self.title_match.pk, self.description_match.pk]
+            )
+            self.assertEqual(len(self.search(url, 'gardener')), 3)
+            self.assertEqual(self.search(url, 'volcano'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search needs PostgreSQL')
+    def test_full_text_search_ranks_and_tracks_username(self):
+        self.assertEqual(
+            self.search('/api/podcasts/', 'compost'),
+            [self.title_match.pk, self.description_match.pk]
+        )
+        self.host.username = 'beekeeper'
+        self.host.save()
+        self.assertEqual(len(self.search('/api/podcasts/', 'beekeep')), 3)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search needs PostgreSQL')
+    def test_stop_words_are_left_out_of_the_full_text_query(self):
+        self.assertEqual(
+            self.search('/api/podcasts/', 'the compost'),
+            [self.title_match.pk, self.description_match.pk]
+        )
+        # Only stop words: matched with icontains instead
+        self.assertEqual(self.search('/api/podcasts/', 'and'), [self.title_match.pk])
+
+
+class PodcastImageUrlTests(APITestCase):
+    def setUp(self):
+        owner = PodcasterProfile.objects.create(
+            user=User.objects.create_user(username='host', password='pass')
+        )
+        images = [f'podcast_images/cover{i % 5}.jpg' for i in range(450)]
+        images += ['https://res.cloudinary.com/demo/image/upload/v1/x.jpg'] * 25
+        images += [''] * 25
+        Podcast.objects.bulk_create([
+            Podcast(
+                title=f'Podcast {i}', description='Description', owner=owner,
+                image=image, is_approved=True,
+            )
+            for i, image in enumerate(images)
+        ])
+        cloudinary_image_url.cache_clear()
+
+    def test_list_resolves_each_public_id_once(self):
+        response = self.client.get('/api/podcasts/list/')
+        self.assertEqual(len(response.data), 500)
+        info = image_url_cache_info()
+        # Five legacy public_ids; stored URLs and the default skip the SDK
+        self.assertEqual(info.misses, 5)
+        self.assertEqual(info.currsize, 5)
+        self.assertGreaterEqual(info.hits, 445)
+
+        self.client.get('/api/podcasts/list/')
+        self.assertEqual(image_url_cache_info().misses, 5)
+        urls = {podcast['image_url'] for podcast in response.data}
+        self.assertIn('https://res.cloudinary.com/demo/image/upload/v1/x.jpg', urls)
+        self.assertTrue(any('default_podcast' in url for url in urls))
+
+    def test_list_emits_resized_variants(self):
+        podcast = next(
+            podcast for podcast in self.client.get('/api/podcasts/list/').data
+            if podcast['title'] == 'Podcast 450'
+        )
+        original = 'https://res.cloudinary.com/demo/image/upload/v1/x.jpg'
+        self.assertEqual(podcast['image_url'], original)
+        self.assertEqual(
+            podcast['image_variants']['card'],
+            'https://res.cloudinary.com/demo/image/upload/'
+            'c_limit,f_auto,q_auto,w_480/v1/x.jpg'
+        )
+        self.assertEqual(set(podcast['image_variants']), {'thumb', 'card', 'hero'})
+        self.assertEqual(
+            [entry.rsplit(' ', 1)[1] for entry in podcast['image_srcset'].split(', ')],
+            ['160w', '480w', '1280w']
+        )
+
+
+class PodcastResponseCacheTests(APITestCase):
+    url = '/api/podcasts/featured/'
+
+    def setUp(self):
+        cache.clear()
+        self.podcast = Podcast.objects.create(
+            title='Featured',
+            description='Description',
+            owner=PodcasterProfile.objects.create(
+                user=User.objects.create_user(username='host', password='pass')
+            ),
+            category=Category.objects.create(name='Technology'),
+            is_approved=True,
+            is_featured=True,
+        )
+
+    def get(self, url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, headers=headers)
+        return response, len(queries)
+
+    def test_featured_list_is_cached_until_a_podcast_changes(self):
+        first, queries = self.get(self.url)
+        self.assertGreater(queries, 0)
+        self.assertEqual(first.data[0]['title'], 'Featured')
+
+        second, queries = self.get(self.url)
+        self.assertEqual(queries, 0)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        # Query parameters are part of the key
+        _, queries = self.get(f'{self.url}?page_size=1')
+        self.assertGreater(queries, 0)
+
+        not_modified, queries = self.get(self.url, if_none_match=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(queries, 0)
+
+        self.podcast.title = 'Renamed'
+        self.podcast.save()
+        changed, queries = self.get(self.url, if_none_match=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertGreater(queries, 0)
+        self.assertEqual(changed.data[0]['title'], 'Renamed')
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_signed_in_users_and_other_lists_are_not_cached(self):
+        self.client.force_authenticate(self.podcast.owner.user)
+        self.get(self.url)
+        response, queries = self.get(self.url)
+        self.assertGreater(queries, 0)
+        self.assertNotIn('ETag', response)
+
+        self.client.force_authenticate(None)
+        self.get('/api/podcasts/')
+        _, queries = self.get('/api/podcasts/')
+        self.assertGreater(queries, 0)
+
+    def test_category_changes_invalidate_category_and_podcast_lists(self):
+        self.get('/api/podcasts/categories/')
+        self.get(self.url)
+        self.podcast.category.name = 'Tech'
+        self.podcast.category.save()
+
+        categories, _ = self.get('/api/podcasts/categories/')
+        podcasts, _ = self.get(self.url)
+        self.assertEqual(categories.data[0]['name'], 'Tech')
+        self.assertEqual(podcasts.data[0]['category']['name'], 'Tech')
+
+
+class PodcastConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fan', password='pass')
+        self.podcast = Podcast.objects.create(
+            title='Podcast',
+            description='Description',
+            owner=PodcasterProfile.objects.create(
+                user=User.objects.create_user(username='host', password='pass')
+            ),
+            is_approved=True,
+        )
+        self.url = f'/api/podcasts/{self.podcast.pk}/'
+
+    def get(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, headers=headers)
+        return response, len(queries)
+
+    def test_unchanged_podcast_costs_one_query(self):
+        first, _ = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+
+        response, queries = self.get(if_none_match=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(queries, 1)
+
+        response, queries = self.get(if_modified_since=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, 1)
+
+    def test_comments_and_likes_change_the_etag(self):
+        etag = self.get()[0]['ETag']
+        self.client.force_authenticate(self.user)
+        self.client.post(
+            f'/api/podcasts/{self.podcast.pk}/comments/', {'content': 'New'}
+        )
+        response, _ = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['comments']), 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        like_url = f'/api/podcasts/{self.podcast.pk}/like/'
+        self.client.post(like_url)
+        liked, _ = self.get(if_none_match=etag)
+        self.assertEqual(liked.status_code, 200)
+        self.assertEqual(liked.data['likes_count'], 1)
+
+        # Unliking deletes the row; the counter still moves the ETag
+        self.client.post(like_url)
+        unliked, _ = self.get(if_none_match=liked['ETag'])
+        self.assertEqual(unliked.status_code, 200)
+        self.assertEqual(unliked.data['likes_count'], 0)
+
+    def test_image_swaps_and_owner_renames_change_the_etag(self):
+        etag = self.get()[0]['ETag']
+        # Deferred uploads swap the name in with update(), not save()
+        Podcast.objects.filter(pk=self.podcast.pk).update(
+            image='https://res.cloudinary.com/demo/image/upload/v1/cover.png'
+        )
+        response, _ = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['image_pending'])
+
+        etag = response['ETag']
+        self.podcast.owner.user.username = 'renamed'
+        self.podcast.owner.user.save()
+        response, _ = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['owner']['username'], 'renamed')
+
+    def test_unapproved_podcast_is_still_refused(self):
+        Podcast.objects.filter(pk=self.podcast.pk).update(is_approved=False)
+        response, _ = self.get(if_none_match='*')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get('/api/podcasts/0/').status_code, 404)
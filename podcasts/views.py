@@ -4,12 +4,18 @@ from rest_framework import (
 )
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F, Sum
 from .models import (
     Podcast, PodcasterProfile, Category, PodcastComment, PodcastLike
 )
 from rest_framework.decorators import action
 from rest_framework.views import APIView
+from backend.comment_tree import CommentThreadsMixin
+from backend.conditional import ConditionalRetrieveMixin
+from backend.pagination import KeysetPagination
+from backend.response_cache import CachedResponseMixin
+from backend.search import search_queryset
 from .serializers import (
     PodcastSerializer,
     PodcasterProfileSerializer,
@@ -18,21 +24,47 @@ from .serializers import (
 )
 
 
+# Fields matched by ?search= when full-text search is unavailable
+PODCAST_SEARCH_FIELDS = ['title', 'description', 'owner__user__username']
+
+
 class IsPodcastOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.user == request.user
 
 
-class PodcastListView(generics.ListAPIView):
+def delete_comment_thread(comment):
+    """Delete a comment with its replies and keep comments_count in step"""
+    with transaction.atomic():
+        _, deleted = comment.delete()
+        Podcast.adjust_counters(
+            comment.podcast_id,
+            comments=-deleted.get(PodcastComment._meta.label, 0)
+        )
+
+
+class PodcastCursorPagination(KeysetPagination):
+    # Matches Podcast.Meta.ordering, with id breaking created_at ties
+    ordering = ('-created_at', 'id')
+
+
+class PodcastListView(CachedResponseMixin, generics.ListAPIView):
     serializer_class = PodcastSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PodcastCursorPagination
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['title', 'created_at', 'views']
+    cache_group = 'podcasts'
+
+    def should_cache_response(self, request):
+        # Only the featured list; searches would fill the cache with misses
+        return (
+            request.path.endswith('/featured/')
+            and super().should_cache_response(request)
+        )
 
     def get_queryset(self):
-        from django.db.models import Q
-        
-        queryset = Podcast.objects.all()
+        queryset = Podcast.objects.with_list_relations()
         
         # Check if this is a featured request
         if self.request.path.endswith('/featured/'):
@@ -50,10 +82,8 @@ class PodcastListView(generics.ListAPIView):
         # Handle search filter
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(owner__user__username__icontains=search)
+            queryset = search_queryset(
+                queryset, search, PODCAST_SEARCH_FIELDS
             )
         
         return queryset
@@ -70,11 +100,29 @@ class PodcastCreateView(generics.CreateAPIView):
         serializer.save(owner=podcaster_profile, is_approved=False)
 
 
-class PodcastDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PodcastDetailView(
+    ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView
+):
     serializer_class = PodcastSerializer
     permission_classes = [permissions.AllowAny]
     queryset = Podcast.objects.all()
 
+    def get_validator_state(self):
+        state = get_object_or_404(
+            Podcast.objects.with_last_activity().values(
+                'is_approved', 'updated_at', 'likes_count', 'comments_count',
+                'last_comment_at', 'last_like_at', 'views',
+                # Changed with update(), which leaves updated_at alone
+                'image',
+                # Nested in the response but saved on their own rows
+                'owner__user__username', 'category__name',
+            ),
+            pk=self.kwargs['pk'],
+        )
+        if not state['is_approved'] and not self.request.user.is_staff:
+            raise PermissionDenied("This podcast is not approved yet.")
+        return state
+
     def get_object(self):
         obj = get_object_or_404(Podcast, pk=self.kwargs['pk'])
         
@@ -102,12 +150,17 @@ class PodcastDetailView(generics.RetrieveUpdateDestroyAPIView):
             )
 
 
-class PodcastViewSet(viewsets.ModelViewSet):
+class PodcastViewSet(CommentThreadsMixin, viewsets.ModelViewSet):
     queryset = Podcast.objects.all()
     serializer_class = PodcastSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PodcastCursorPagination
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['title', 'created_at', 'views']
+    # Actions that render PodcastSerializer and need its relations loaded
+    serialized_actions = ['list', 'retrieve', 'featured', 'my_podcasts']
+    # Podcasts only show replies to top-level comments
+    comment_max_depth = 1
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'featured']:
@@ -115,9 +168,9 @@ class PodcastViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated()]
 
     def get_queryset(self):
-        from django.db.models import Q
-        
         queryset = Podcast.objects.all()
+        if self.action in self.serialized_actions:
+            queryset = queryset.with_list_relations()
         
         # Filter by approval status for non-staff users
         if not self.request.user.is_staff:
@@ -136,10 +189,8 @@ class PodcastViewSet(viewsets.ModelViewSet):
         # Handle search filter
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(owner__user__username__icontains=search)
+            queryset = search_queryset(
+                queryset, search, PODCAST_SEARCH_FIELDS
             )
         
         return queryset
@@ -147,6 +198,10 @@ class PodcastViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         """Override list action to return podcast data instead of router URLs"""
         queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -158,9 +213,9 @@ class PodcastViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
         podcast = self.get_object()
-        comments = podcast.podcast_comments.all()
-        serializer = PodcastCommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        return self.comment_threads_response(
+            podcast.podcast_comments.all(), PodcastCommentSerializer
+        )
 
     @action(detail=True, methods=['post'])
     def add_comment(self, request, pk=None):
@@ -170,7 +225,9 @@ class PodcastViewSet(viewsets.ModelViewSet):
             'parent': request.data.get('parent')
         })
         if serializer.is_valid():
-            serializer.save(podcast=podcast, user=request.user)
+            with transaction.atomic():
+                serializer.save(podcast=podcast, user=request.user)
+                Podcast.adjust_counters(podcast.pk, comments=1)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -184,11 +241,13 @@ class PodcastViewSet(viewsets.ModelViewSet):
         
         serializer = PodcastCommentSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(
-                podcast=podcast,
-                user=request.user,
-                parent=parent_comment
-            )
+            with transaction.atomic():
+                serializer.save(
+                    podcast=podcast,
+                    user=request.user,
+                    parent=parent_comment
+                )
+                Podcast.adjust_counters(podcast.pk, comments=1)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -197,22 +256,24 @@ class PodcastViewSet(viewsets.ModelViewSet):
         podcast = self.get_object()
         user = request.user
         
-        # Check if user already liked this podcast
-        existing_like = PodcastLike.objects.filter(podcast=podcast, user=user).first()
-        
-        if existing_like:
-            # Unlike: remove the like
-            existing_like.delete()
-            return Response({'status': 'unliked'})
-        else:
+        with transaction.atomic():
+            # Unlike if the user already liked this podcast
+            unliked, _ = PodcastLike.objects.filter(
+                podcast=podcast, user=user
+            ).delete()
+            if unliked:
+                Podcast.adjust_counters(podcast.pk, likes=-1)
+                return Response({'status': 'unliked'})
+
             # Like: create new like
             PodcastLike.objects.create(podcast=podcast, user=user)
+            Podcast.adjust_counters(podcast.pk, likes=1)
             return Response({'status': 'liked'})
 
     @action(detail=True, methods=['get'])
     def likes(self, request, pk=None):
         podcast = self.get_object()
-        likes = podcast.likes.all()
+        likes = podcast.likes.select_related('user')
         
         # Get current user's like status
         current_user_liked = False
@@ -231,7 +292,7 @@ class PodcastViewSet(viewsets.ModelViewSet):
         
         return Response({
             'likes': likes_data,
-            'total_likes': likes.count(),
+            'total_likes': podcast.likes_count,
             'current_user_liked': current_user_liked,
             'current_user_id': request.user.id if request.user.is_authenticated else None
         })
@@ -249,8 +310,10 @@ class PodcastViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def view(self, request, pk=None):
         podcast = self.get_object()
-        podcast.views += 1
-        podcast.save()
+        # One UPDATE: concurrent views never overwrite each other, and the
+        # save() signals (search vector, cached lists) don't run
+        Podcast.objects.filter(pk=podcast.pk).update(views=F('views') + 1)
+        podcast.refresh_from_db(fields=['views'])
         return Response({'views': podcast.views})
 
     @action(detail=False, methods=['get'])
@@ -311,7 +374,7 @@ class PodcastViewSet(viewsets.ModelViewSet):
                 "You don't have permission to delete this comment."
             )
         
-        comment.delete()
+        delete_comment_thread(comment)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'])
@@ -328,7 +391,9 @@ class PodcastViewSet(viewsets.ModelViewSet):
                 {'detail': 'You do not have permission to view pending podcasts'}, 
                 status=status.HTTP_403_FORBIDDEN
             )
-        pending_podcasts = Podcast.objects.filter(is_approved=False)
+        pending_podcasts = Podcast.objects.with_list_relations().filter(
+            is_approved=False
+        )
         serializer = self.get_serializer(pending_podcasts, many=True)
         return Response(serializer.data)
 
@@ -395,10 +460,11 @@ class PodcasterProfileViewSet(viewsets.ModelViewSet):
             )
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cache_group = 'podcast-categories'
 
 
 class PodcastLikeView(APIView):
@@ -408,17 +474,16 @@ class PodcastLikeView(APIView):
         """Get likes for a podcast"""
         try:
             podcast = Podcast.objects.get(pk=pk)
-            likes = PodcastLike.objects.filter(podcast=podcast)
-            current_user_liked = PodcastLike.objects.filter(
-                podcast=podcast, 
-                user=request.user
-            ).exists()
+            liked_by = list(
+                PodcastLike.objects.filter(podcast=podcast)
+                .values_list('user__username', flat=True)
+            )
             
             return Response({
                 'podcast_id': pk,
-                'likes_count': likes.count(),
-                'current_user_liked': current_user_liked,
-                'liked_by': [like.user.username for like in likes]
+                'likes_count': podcast.likes_count,
+                'current_user_liked': request.user.username in liked_by,
+                'liked_by': liked_by
             })
         except Podcast.DoesNotExist:
             return Response(
@@ -430,10 +495,15 @@ class PodcastLikeView(APIView):
         """Like/unlike a podcast (toggle functionality)"""
         try:
             podcast = Podcast.objects.get(pk=pk)
-            like, created = PodcastLike.objects.get_or_create(
-                podcast=podcast, 
-                user=request.user
-            )
+            with transaction.atomic():
+                like, created = PodcastLike.objects.get_or_create(
+                    podcast=podcast, 
+                    user=request.user
+                )
+                if not created:
+                    # User already liked it, so unlike it
+                    like.delete()
+                Podcast.adjust_counters(podcast.pk, likes=1 if created else -1)
             
             if created:
                 # User liked the podcast
@@ -442,8 +512,6 @@ class PodcastLikeView(APIView):
                     'message': 'Podcast liked successfully'
                 }, status=status.HTTP_201_CREATED)
             else:
-                # User already liked it, so unlike it
-                like.delete()
                 return Response({
                     'status': 'unliked',
                     'message': 'Podcast unliked successfully'
@@ -456,21 +524,31 @@ class PodcastLikeView(APIView):
             )
 
 
-class PodcastCommentViewSet(viewsets.ModelViewSet):
+class PodcastCommentViewSet(CommentThreadsMixin, viewsets.ModelViewSet):
     serializer_class = PodcastCommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # Podcasts only show replies to top-level comments
+    comment_max_depth = 1
 
     def get_queryset(self):
         podcast_id = self.kwargs.get('podcast_pk')
         return PodcastComment.objects.filter(podcast_id=podcast_id)
 
+    def list(self, request, *args, **kwargs):
+        """Return the podcast's comments as threads, built from one query"""
+        return self.comment_threads_response(
+            self.get_queryset(), self.get_serializer_class()
+        )
+
     def perform_create(self, serializer):
         podcast_id = self.kwargs.get('podcast_pk')
         podcast = get_object_or_404(Podcast, pk=podcast_id)
-        serializer.save(
-            podcast=podcast,
-            user=self.request.user
-        )
+        with transaction.atomic():
+            serializer.save(
+                podcast=podcast,
+                user=self.request.user
+            )
+            Podcast.adjust_counters(podcast.pk, comments=1)
 
     def perform_update(self, serializer):
         comment = self.get_object()
@@ -481,4 +559,4 @@ class PodcastCommentViewSet(viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         if instance.user != self.request.user:
             raise PermissionDenied("You can only delete your own comments.")
-        instance.delete()
+        delete_comment_thread(instance)
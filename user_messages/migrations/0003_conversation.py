@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_conversations(apps, schema_editor):
+    Message = apps.get_model('user_messages', 'Message')
+    Conversation = apps.get_model('user_messages', 'Conversation')
+
+    summaries = {}
+    messages = Message.objects.order_by('timestamp', 'id').values_list(
+        'id', 'sender_id', 'receiver_id', 'timestamp', 'is_read'
+    )
+    for pk, sender_id, receiver_id, timestamp, is_read in messages.iterator():
+        pair = tuple(sorted((sender_id, receiver_id)))
+        summary = summaries.setdefault(pair, {
+            'user_a_id': pair[0],
+            'user_b_id': pair[1],
+            'user_a_unread_count': 0,
+            'user_b_unread_count': 0,
+        })
+        summary['last_message_id'] = pk
+        summary['last_message_at'] = timestamp
+        if not is_read:
+            if receiver_id < sender_id:
+                summary['user_a_unread_count'] += 1
+            else:
+                summary['user_b_unread_count'] += 1
+
+    Conversation.objects.bulk_create(
+        [Conversation(**summary) for summary in summaries.values()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_messages', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField()),
+                ('user_a_unread_count', models.PositiveIntegerField(default=0)),
+                ('user_b_unread_count', models.PositiveIntegerField(default=0)),
+                ('last_message', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='user_messages.message')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_a', '-last_message_at', 'id'], name='conversation_user_a_inbox_idx'), models.Index(fields=['user_b', '-last_message_at', 'id'], name='conversation_user_b_inbox_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user_a', 'user_b'), name='conversation_participants_unique')],
+            },
+        ),
+        migrations.RunPython(
+            populate_conversations, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_messages', '0004_message_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='attachment',
+            field=models.FileField(blank=True, db_index=True, null=True, upload_to='message_attachments/'),
+        ),
+    ]
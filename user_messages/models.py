@@ -1,5 +1,7 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
 from django.utils import timezone
 
 
@@ -21,11 +23,26 @@ class Message(models.Model):
     attachment = models.FileField(
         upload_to='message_attachments/',
         null=True,
-        blank=True
+        blank=True,
+        db_index=True
     )
     attachment_name = models.CharField(max_length=255, null=True, blank=True)
     attachment_type = models.CharField(max_length=100, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Chat history between two users, in order
+            models.Index(
+                fields=['sender', 'receiver', 'timestamp'],
+                name='message_pair_timestamp_idx'
+            ),
+            # Unread messages of a user
+            models.Index(
+                fields=['receiver', 'is_read'],
+                name='message_receiver_unread_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender} to {self.receiver}"
 
@@ -34,3 +51,131 @@ class Message(models.Model):
             self.is_read = True
             self.read_at = timezone.now()
             self.save()
+
+
+class Conversation(models.Model):
+    """
+    Inbox summary of the messages exchanged between two users.
+
+    One row per participant pair, with ``user_a`` always the participant
+    with the lower id. The row is kept up to date when messages are sent,
+    read or deleted, so the inbox is read from here instead of being
+    rebuilt from the full message history.
+    """
+    user_a = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    user_b = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    last_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+    last_message_at = models.DateTimeField()
+    # Messages addressed to user_a / user_b that they have not read yet
+    user_a_unread_count = models.PositiveIntegerField(default=0)
+    user_b_unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_a', 'user_b'],
+                name='conversation_participants_unique'
+            ),
+        ]
+        indexes = [
+            # Back the inbox listing of either participant
+            models.Index(
+                fields=['user_a', '-last_message_at', 'id'],
+                name='conversation_user_a_inbox_idx'
+            ),
+            models.Index(
+                fields=['user_b', '-last_message_at', 'id'],
+                name='conversation_user_b_inbox_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Conversation between {self.user_a} and {self.user_b}"
+
+    @staticmethod
+    def participants(user_id, other_user_id):
+        return tuple(sorted((user_id, other_user_id)))
+
+    @classmethod
+    def between(cls, user_id, other_user_id):
+        user_a_id, user_b_id = cls.participants(user_id, other_user_id)
+        return cls.objects.filter(user_a_id=user_a_id, user_b_id=user_b_id)
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.objects.filter(Q(user_a=user) | Q(user_b=user))
+
+    @classmethod
+    def unread_field(cls, user_id, other_user_id):
+        if user_id < other_user_id:
+            return 'user_a_unread_count'
+        return 'user_b_unread_count'
+
+    @classmethod
+    def record_message(cls, message):
+        """Make ``message`` the latest of its conversation, unread by its receiver"""
+        user_a_id, user_b_id = cls.participants(
+            message.sender_id, message.receiver_id
+        )
+        conversation, _ = cls.objects.get_or_create(
+            user_a_id=user_a_id,
+            user_b_id=user_b_id,
+            defaults={'last_message_at': message.timestamp},
+        )
+        unread_field = cls.unread_field(message.receiver_id, message.sender_id)
+        cls.objects.filter(pk=conversation.pk).update(
+            last_message=message,
+            last_message_at=message.timestamp,
+            **{unread_field: F(unread_field) + 1}
+        )
+
+    @classmethod
+    def mark_read(cls, reader_id, other_user_id, count):
+        """Record that ``reader_id`` read ``count`` messages from ``other_user_id``"""
+        unread_field = cls.unread_field(reader_id, other_user_id)
+        cls.between(reader_id, other_user_id).update(
+            **{unread_field: Greatest(F(unread_field) - count, 0)}
+        )
+
+    @classmethod
+    def refresh(cls, user_id, other_user_id):
+        """
+        Recompute the summary of a pair from its messages, e.g. after a
+        message was deleted. Drops the row once no messages are left.
+        """
+        user_a_id, user_b_id = cls.participants(user_id, other_user_id)
+        messages = Message.objects.filter(
+            Q(sender_id=user_a_id, receiver_id=user_b_id) |
+            Q(sender_id=user_b_id, receiver_id=user_a_id)
+        )
+        last_message = messages.order_by('-timestamp', '-id').first()
+        if last_message is None:
+            cls.between(user_a_id, user_b_id).delete()
+            return
+        unread = messages.filter(is_read=False).aggregate(
+            user_a=Count('pk', filter=Q(receiver_id=user_a_id)),
+            user_b=Count('pk', filter=Q(receiver_id=user_b_id)),
+        )
+        cls.objects.update_or_create(
+            user_a_id=user_a_id,
+            user_b_id=user_b_id,
+            defaults={
+                'last_message': last_message,
+                'last_message_at': last_message.timestamp,
+                'user_a_unread_count': unread['user_a'],
+                'user_b_unread_count': unread['user_b'],
+            },
+        )
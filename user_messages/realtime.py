@@ -0,0 +1,190 @@
+"""
+Real-time delivery of chat messages over WebSockets
+
+Connected clients are pushed new messages and unread-count changes as
+they happen instead of polling ``unread_count``, ``conversations`` and
+``chat_with_user``. Sockets are served by ``MessageSocket``, mounted at
+``/ws/messages/`` in ``backend/asgi.py``, and authenticate with a
+SimpleJWT access token passed as ``?token=`` (browsers cannot set headers
+on WebSocket requests) or an ``Authorization: Bearer`` header.
+
+Events travel through ``broker``, an in-process channel layer: every
+socket is one asyncio task reading a bounded queue, so a single process
+holds many idle sockets cheaply and no Redis is needed. Delivery only
+reaches sockets served by the same process as the request that
+published the event.
+"""
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+SOCKET_PATH = '/ws/messages/'
+QUEUE_SIZE = 100
+UNAUTHORIZED_CLOSE_CODE = 4401
+
+
+class MessageBroker:
+    """
+    Thread-safe, in-process publish/subscribe keyed by user id.
+
+    ``publish`` may be called from any thread (sync views run in worker
+    threads under ASGI); events are handed over to each subscriber's event
+    loop. A subscriber whose queue is full misses events instead of
+    holding up the publisher, and can resync over the REST API.
+    """
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.dropped = 0
+
+    def subscribe(self, user_id):
+        subscriber = (
+            asyncio.get_running_loop(),
+            asyncio.Queue(maxsize=self.queue_size),
+        )
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self.lock:
+            subscribers = self.subscribers.get(user_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[user_id]
+
+    def is_connected(self, user_id):
+        with self.lock:
+            return user_id in self.subscribers
+
+    def connection_count(self):
+        with self.lock:
+            return sum(len(subscribers) for subscribers in self.subscribers.values())
+
+    def publish(self, user_id, event):
+        with self.lock:
+            subscribers = list(self.subscribers.get(user_id, ()))
+        if not subscribers:
+            return
+        text = json.dumps(event, cls=DjangoJSONEncoder)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self.deliver, queue, text)
+            except RuntimeError:
+                # The socket's event loop has already shut down
+                pass
+
+    def deliver(self, queue, text):
+        try:
+            queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+broker = MessageBroker()
+
+
+def publish_new_message(message, message_data):
+    """
+    Push ``message`` (serialized as ``message_data``) to both participants
+    and bump the receiver's unread count for the sender.
+    """
+    event = {'type': 'message', 'message': message_data}
+    broker.publish(message.receiver_id, event)
+    if message.sender_id != message.receiver_id:
+        broker.publish(message.sender_id, event)
+    broker.publish(message.receiver_id, {
+        'type': 'unread',
+        'user_id': message.sender_id,
+        'delta': 1,
+    })
+
+
+def publish_read(reader_id, other_user_id, count):
+    """Tell the reader's other sockets that ``count`` messages were read"""
+    broker.publish(reader_id, {
+        'type': 'unread',
+        'user_id': other_user_id,
+        'delta': -count,
+    })
+
+
+class MessageSocket:
+    """
+    ASGI application streaming the broker events of the connected user.
+
+    Sockets without a valid access token are rejected with close code
+    4401. Clients may send ``ping`` to keep idle connections open and get
+    ``pong`` back.
+    """
+    authentication_class = JWTAuthentication
+
+    def __init__(self, broker=broker):
+        self.broker = broker
+
+    async def __call__(self, scope, receive, send):
+        event = await receive()
+        if event['type'] != 'websocket.connect':
+            return
+
+        user = await self.authenticate(scope)
+        if user is None:
+            await send({'type': 'websocket.close', 'code': UNAUTHORIZED_CLOSE_CODE})
+            return
+
+        await send({'type': 'websocket.accept'})
+        subscriber = self.broker.subscribe(user.id)
+        forward = asyncio.ensure_future(self.forward(subscriber[1], send))
+        try:
+            while True:
+                event = await receive()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                if event['type'] == 'websocket.receive' and event.get('text') == 'ping':
+                    await send({'type': 'websocket.send', 'text': 'pong'})
+        finally:
+            forward.cancel()
+            self.broker.unsubscribe(user.id, subscriber)
+
+    async def forward(self, queue, send):
+        while True:
+            text = await queue.get()
+            await send({'type': 'websocket.send', 'text': text})
+
+    async def authenticate(self, scope):
+        raw_token = self.get_raw_token(scope)
+        if raw_token is None:
+            return None
+        return await sync_to_async(self.get_user)(raw_token)
+
+    def get_raw_token(self, scope):
+        params = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        if params.get('token'):
+            return params['token'][0]
+        for name, value in scope.get('headers', []):
+            if name.lower() != b'authorization':
+                continue
+            parts = value.decode('latin-1').split()
+            if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+                return parts[1]
+        return None
+
+    def get_user(self, raw_token):
+        authentication = self.authentication_class()
+        try:
+            return authentication.get_user(
+                authentication.get_validated_token(raw_token)
+            )
+        except (InvalidToken, AuthenticationFailed):
+            return None
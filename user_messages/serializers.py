@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Message
+from django.db import transaction
+from .models import Conversation, Message
+from .realtime import broker, publish_new_message
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -51,8 +53,49 @@ class MessageSerializer(serializers.ModelSerializer):
         receiver_id = validated_data.pop('receiver_id')
         receiver = User.objects.get(id=receiver_id)
         sender = self.context['request'].user
-        return Message.objects.create(
-            sender=sender,
-            receiver=receiver,
-            **validated_data
+        with transaction.atomic():
+            message = Message.objects.create(
+                sender=sender,
+                receiver=receiver,
+                **validated_data
+            )
+            Conversation.record_message(message)
+            transaction.on_commit(lambda: self.publish(message))
+        return message
+
+    def publish(self, message):
+        """Push the new message to the participants' open sockets"""
+        if (broker.is_connected(message.receiver_id) or
+                broker.is_connected(message.sender_id)):
+            publish_new_message(message, MessageSerializer(message).data)
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """Inbox entry as seen by the requesting user"""
+    user = serializers.SerializerMethodField()
+    last_message = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'user', 'last_message', 'last_message_at', 'unread_count']
+
+    def get_viewer_id(self):
+        return self.context['request'].user.id
+
+    def get_user(self, obj):
+        if obj.user_a_id == self.get_viewer_id():
+            return UserSerializer(obj.user_b).data
+        return UserSerializer(obj.user_a).data
+
+    def get_last_message(self, obj):
+        if obj.last_message is None:
+            return None
+        return MessageSerializer(obj.last_message).data
+
+    def get_unread_count(self, obj):
+        viewer_id = self.get_viewer_id()
+        other_user_id = (
+            obj.user_b_id if obj.user_a_id == viewer_id else obj.user_a_id
         )
+        return getattr(obj, Conversation.unread_field(viewer_id, other_user_id))
@@ -1 +1,254 @@
-# Create your tests here.
+import json
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.asgi import application
+from .models import Conversation, Message
+from .realtime import broker
+
+User = get_user_model()
+
+
+class ConversationInboxTests(APITestCase):
+    url = '/api/user_messages/conversations/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='me', password='pass')
+        self.contacts = [
+            User.objects.create_user(username=f'contact{i}', password='pass')
+            for i in range(3)
+        ]
+
+    def send(self, sender, receiver, content='Hello'):
+        self.client.force_authenticate(sender)
+        response = self.client.post(
+            '/api/user_messages/',
+            {'receiver_id': receiver.pk, 'content': content}
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def inbox(self, user=None, **params):
+        self.client.force_authenticate(user or self.user)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_inbox_lists_latest_message_and_unread_count(self):
+        first, second, _ = self.contacts
+        self.send(first, self.user, 'One')
+        self.send(first, self.user, 'Two')
+        self.send(self.user, second, 'Three')
+        self.send(self.user, first, 'Four')
+
+        inbox = self.inbox()
+        self.assertEqual(
+            [entry['user']['username'] for entry in inbox],
+            ['contact0', 'contact1']
+        )
+        self.assertEqual(inbox[0]['last_message']['content'], 'Four')
+        self.assertEqual(inbox[0]['unread_count'], 2)
+        self.assertEqual(inbox[1]['unread_count'], 0)
+
+        seen_by_first = self.inbox(first)
+        self.assertEqual(seen_by_first[0]['user']['username'], 'me')
+        self.assertEqual(seen_by_first[0]['unread_count'], 1)
+
+    def test_reading_and_deleting_update_the_summary(self):
+        contact = self.contacts[0]
+        message = self.send(contact, self.user, 'One')
+        second = self.send(contact, self.user, 'Two')
+        latest = self.send(contact, self.user, 'Three')
+
+        self.client.force_authenticate(self.user)
+        self.client.post(f"/api/user_messages/{message['id']}/mark_as_read/")
+        self.assertEqual(self.inbox()[0]['unread_count'], 2)
+        self.client.get(
+            '/api/user_messages/chat_with_user/', {'user_id': contact.pk}
+        )
+        self.assertEqual(self.inbox()[0]['unread_count'], 0)
+
+        self.client.force_authenticate(contact)
+        self.client.delete(f"/api/user_messages/{latest['id']}/")
+        self.assertEqual(self.inbox()[0]['last_message']['content'], 'Two')
+
+        self.client.force_authenticate(contact)
+        for deleted in (message, second):
+            self.client.delete(f"/api/user_messages/{deleted['id']}/")
+        self.assertFalse(Conversation.objects.exists())
+
+    def test_inbox_is_one_query_and_paginated(self):
+        for contact in self.contacts:
+            self.send(contact, self.user)
+            self.send(self.user, contact)
+
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 3)
+        # The authenticated user comes from force_authenticate, so the
+        # inbox itself is the only query.
+        self.assertEqual(len(queries), 1)
+
+        page = self.inbox(page_size=2)
+        self.assertEqual(
+            [entry['user']['username'] for entry in page['results']],
+            ['contact2', 'contact1']
+        )
+        self.client.force_authenticate(self.user)
+        page = self.client.get(page['next']).data
+        self.assertEqual(
+            [entry['user']['username'] for entry in page['results']],
+            ['contact0']
+        )
+        self.assertIsNone(page['next'])
+
+
+class ChatHistoryTests(APITestCase):
+    url = '/api/user_messages/chat_with_user/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='me', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+        self.client.force_authenticate(self.user)
+
+    def send(self, count, sender=None, receiver=None):
+        sender = sender or self.other
+        receiver = receiver or self.user
+        return [
+            Message.objects.create(
+                sender=sender, receiver=receiver, content=f'Message {i}'
+            ).pk
+            for i in range(count)
+        ]
+
+    def chat(self, **params):
+        response = self.client.get(self.url, {'user_id': self.other.pk, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, data):
+        return [message['id'] for message in data['messages']]
+
+    def test_full_history_without_cursor_params(self):
+        sent = self.send(3)
+        data = self.chat()
+        self.assertEqual(self.ids(data), sent)
+        self.assertNotIn('after', data)
+        self.assertTrue(all(message['is_read'] for message in data['messages']))
+
+    def test_before_pages_back_through_history(self):
+        sent = self.send(5)
+        data = self.chat(page_size=2)
+        self.assertEqual(self.ids(data), sent[3:])
+        self.assertFalse(data['has_more'])
+
+        collected = self.ids(data)
+        while data['before']:
+            data = self.chat(page_size=2, before=data['before'])
+            collected = self.ids(data) + collected
+        self.assertEqual(collected, sent)
+
+    def test_after_polls_only_new_messages(self):
+        self.send(20)
+        data = self.chat(page_size=5)
+        with CaptureQueriesContext(connection) as idle_queries:
+            idle = self.chat(after=data['after'])
+        self.assertEqual(idle['messages'], [])
+        self.assertEqual(idle['after'], data['after'])
+
+        new = self.send(2) + self.send(1, sender=self.user, receiver=self.other)
+        data = self.chat(after=data['after'])
+        self.assertEqual(self.ids(data), new)
+        self.assertFalse(data['has_more'])
+
+        self.send(30)
+        with CaptureQueriesContext(connection) as queries:
+            self.chat(after=data['after'], page_size=5)
+        # Only the mark-as-read bookkeeping differs from an idle poll
+        self.assertLessEqual(len(queries), len(idle_queries) + 1)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(
+            self.url, {'user_id': self.other.pk, 'after': 'nope'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class MessageSocketTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='me', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+
+    async def connect(self, query_string):
+        socket = ApplicationCommunicator(application, {
+            'type': 'websocket',
+            'path': '/ws/messages/',
+            'query_string': query_string.encode(),
+            'headers': [],
+        })
+        await socket.send_input({'type': 'websocket.connect'})
+        return socket, await socket.receive_output(1)
+
+    async def open_socket(self, user):
+        socket, response = await self.connect(f'token={AccessToken.for_user(user)}')
+        self.assertEqual(response, {'type': 'websocket.accept'})
+        return socket
+
+    async def close_socket(self, socket):
+        await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await socket.wait(1)
+
+    async def receive_event(self, socket):
+        output = await socket.receive_output(1)
+        return json.loads(output['text'])
+
+    def post(self, user, url, data=None):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data)
+
+    async def test_rejects_missing_or_invalid_tokens(self):
+        for query_string in ('', 'token=not-a-token'):
+            _, response = await self.connect(query_string)
+            self.assertEqual(response, {'type': 'websocket.close', 'code': 4401})
+
+    async def test_pushes_new_messages_and_unread_deltas(self):
+        receiver = await self.open_socket(self.user)
+        sender = await self.open_socket(self.other)
+
+        response = await sync_to_async(self.post)(
+            self.other, '/api/user_messages/',
+            {'receiver_id': self.user.pk, 'content': 'Hello'}
+        )
+        message_id = response.data['id']
+
+        event = await self.receive_event(receiver)
+        self.assertEqual(event['type'], 'message')
+        self.assertEqual(event['message']['id'], message_id)
+        self.assertEqual(event['message']['sender']['username'], 'other')
+        self.assertEqual(
+            await self.receive_event(receiver),
+            {'type': 'unread', 'user_id': self.other.pk, 'delta': 1}
+        )
+        event = await self.receive_event(sender)
+        self.assertEqual(event['message']['id'], message_id)
+        self.assertTrue(await sender.receive_nothing())
+
+        await sync_to_async(self.post)(
+            self.user, f'/api/user_messages/{message_id}/mark_as_read/'
+        )
+        self.assertEqual(
+            await self.receive_event(receiver),
+            {'type': 'unread', 'user_id': self.other.pk, 'delta': -1}
+        )
+
+        for socket in (receiver, sender):
+            await self.close_socket(socket)
+        self.assertFalse(broker.is_connected(self.user.pk))
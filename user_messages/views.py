@@ -1,15 +1,98 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
-from .models import Message
-from .serializers import MessageSerializer
+from backend.pagination import KeysetPagination
+from .models import Conversation, Message
+from .realtime import publish_read
+from .serializers import ConversationSerializer, MessageSerializer
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
+class ConversationPagination(KeysetPagination):
+    ordering = ('-last_message_at', 'id')
+
+
+class ChatHistoryPagination(KeysetPagination):
+    """
+    Window over the messages of one chat, oldest first.
+
+    Without a cursor the latest ``page_size`` messages are returned.
+    ``?before=`` pages back through older messages and ``?after=`` returns
+    only the messages newer than the cursor, so polling costs grow with the
+    new messages rather than with the whole history. Only used when
+    ``before``, ``after`` or ``page_size`` is passed.
+    """
+    ordering = ('timestamp', 'id')
+    page_size = 50
+    max_page_size = 200
+    before_query_param = 'before'
+    after_query_param = 'after'
+
+    def is_requested(self, request):
+        params = request.query_params
+        return (
+            self.before_query_param in params or
+            self.after_query_param in params or
+            self.page_size_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        params = request.query_params
+        self.after = params.get(self.after_query_param)
+        before = params.get(self.before_query_param)
+
+        if self.after:
+            ordering = self.get_ordering()
+            position = self.decode_position(self.after)[0]
+        else:
+            ordering = self.get_ordering(reverse=True)
+            position = self.decode_position(before)[0] if before else None
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.after:
+            self.has_older = True
+            self.has_newer = has_more
+        else:
+            results.reverse()
+            self.has_older = has_more
+            self.has_newer = bool(before)
+
+        self.page = results
+        return results
+
+    def get_cursors(self):
+        """
+        ``before`` loads the page preceding this window (None at the start
+        of the chat), ``after`` polls for messages following it, and
+        ``has_more`` tells whether newer messages are already waiting.
+        """
+        if not self.page:
+            return {'before': None, 'after': self.after, 'has_more': False}
+        return {
+            'before': (
+                self.encode_position(self.page[0]) if self.has_older else None
+            ),
+            'after': self.encode_position(self.page[-1]),
+            'has_more': self.has_newer,
+        }
+
+
 class MessageViewSet(viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -18,48 +101,47 @@ class MessageViewSet(viewsets.ModelViewSet):
         user = self.request.user
         return Message.objects.filter(
             Q(sender=user) | Q(receiver=user)
-        ).order_by('-timestamp')
+        ).select_related('sender', 'receiver').order_by('-timestamp')
 
     def perform_create(self, serializer):
         serializer.save()
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Conversation.refresh(instance.sender_id, instance.receiver_id)
+
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         message = self.get_object()
         if message.receiver == request.user and not message.is_read:
             message.is_read = True
             message.read_at = timezone.now()
-            message.save()
+            with transaction.atomic():
+                message.save()
+                Conversation.mark_read(request.user.id, message.sender_id, 1)
+                transaction.on_commit(
+                    lambda: publish_read(request.user.id, message.sender_id, 1)
+                )
         return Response({'status': 'message marked as read'})
 
     @action(detail=False, methods=['get'])
     def conversations(self, request):
-        user = request.user
-        messages = Message.objects.filter(
-            Q(sender=user) | Q(receiver=user)
-        ).order_by('-timestamp')
-
-        conversations = {}
-        for message in messages:
-            other_user = (
-                message.receiver if message.sender == user else message.sender
-            )
-            if other_user.id not in conversations:
-                conversations[other_user.id] = {
-                    'user': {
-                        'id': other_user.id,
-                        'username': other_user.username,
-                        'email': other_user.email
-                    },
-                    'last_message': MessageSerializer(message).data,
-                    'unread_count': Message.objects.filter(
-                        sender=other_user,
-                        receiver=user,
-                        is_read=False
-                    ).count()
-                }
-
-        return Response(list(conversations.values()))
+        queryset = Conversation.for_user(request.user).select_related(
+            'user_a',
+            'user_b',
+            'last_message__sender',
+            'last_message__receiver',
+        ).order_by('-last_message_at', 'id')
+
+        paginator = ConversationPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        context = self.get_serializer_context()
+        if page is not None:
+            serializer = ConversationSerializer(page, many=True, context=context)
+            return paginator.get_paginated_response(serializer.data)
+        serializer = ConversationSerializer(queryset, many=True, context=context)
+        return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def chat_with_user(self, request):
@@ -75,27 +157,43 @@ class MessageViewSet(viewsets.ModelViewSet):
             messages = Message.objects.filter(
                 (Q(sender=request.user) & Q(receiver=other_user)) |
                 (Q(sender=other_user) & Q(receiver=request.user))
-            ).order_by('timestamp')
+            ).select_related('sender', 'receiver').order_by('timestamp', 'id')
 
             # Mark unread messages as read
-            unread_messages = messages.filter(
+            unread_messages = Message.objects.filter(
+                sender=other_user,
                 receiver=request.user,
                 is_read=False
             )
-            unread_messages.update(
-                is_read=True,
-                read_at=timezone.now()
+            with transaction.atomic():
+                read_count = unread_messages.update(
+                    is_read=True,
+                    read_at=timezone.now()
+                )
+                if read_count:
+                    Conversation.mark_read(
+                        request.user.id, other_user.id, read_count
+                    )
+                    transaction.on_commit(lambda: publish_read(
+                        request.user.id, other_user.id, read_count
+                    ))
+
+            paginator = ChatHistoryPagination()
+            page = paginator.paginate_queryset(messages, request, view=self)
+            serializer = MessageSerializer(
+                messages if page is None else page, many=True
             )
-
-            serializer = MessageSerializer(messages, many=True)
-            return Response({
+            data = {
                 'messages': serializer.data,
                 'other_user': {
                     'id': other_user.id,
                     'username': other_user.username,
                     'email': other_user.email
                 }
-            })
+            }
+            if page is not None:
+                data.update(paginator.get_cursors())
+            return Response(data)
         except User.DoesNotExist:
             return Response(
                 {'error': 'User not found'},
@@ -127,10 +225,18 @@ class MessageViewSet(viewsets.ModelViewSet):
                 is_read=False
             )
             
-            updated_count = unread_messages.update(
-                is_read=True,
-                read_at=timezone.now()
-            )
+            with transaction.atomic():
+                updated_count = unread_messages.update(
+                    is_read=True,
+                    read_at=timezone.now()
+                )
+                if updated_count:
+                    Conversation.mark_read(
+                        request.user.id, other_user.id, updated_count
+                    )
+                    transaction.on_commit(lambda: publish_read(
+                        request.user.id, other_user.id, updated_count
+                    ))
             
             return Response({
                 'status': f'{updated_count} messages marked as read'
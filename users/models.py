@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils.crypto import get_random_string
 
@@ -23,6 +24,16 @@ class CustomUser(AbstractUser):
     verification_token = models.CharField(max_length=100, blank=True)
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES, default='podcaster')
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Trigram index backing the search suggestions
+            GinIndex(
+                fields=['username'],
+                name='user_username_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+        ]
+
     def generate_verification_token(self):
         self.verification_token = get_random_string(64)
         self.save()
@@ -44,5 +55,6 @@ class UserProfile(models.Model):
     profile_picture = models.ImageField(
         upload_to="profiles/",
         blank=True,
-        null=True
+        null=True,
+        db_index=True
     )
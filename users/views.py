@@ -1,3 +1,5 @@
+import logging
+
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework import generics, status, permissions, viewsets
 from rest_framework.decorators import action
@@ -15,9 +17,9 @@ from .models import UserProfile
 from rest_framework.exceptions import PermissionDenied
 from django.db.models import Q
 from experts.models import ExpertProfile
-from podcasts.models import PodcasterProfile
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 # ثبت‌نام کاربر
@@ -62,59 +64,42 @@ class UserRegisterView(generics.CreateAPIView):
                 recipient_list=[user.email],
                 fail_silently=False,
             )
-            
-            print(f"[DEBUG] Verification email sent to {user.email}")
-            print(f"[DEBUG] Verification URL: {verification_url}")
-            print(f"[DEBUG] Email result: {result}")
-            
-        except Exception as e:
-            print(f"[ERROR] Email failed: {str(e)}")
-            raise e
+            logger.info('Verification email sent to %s (result %s)', user.email, result)
+            logger.debug('Verification URL for %s: %s', user.username, verification_url)
+        except Exception:
+            logger.exception('Verification email to %s failed', user.email)
+            raise
 
 
 class VerifyEmailView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, token):
-        print(f"[DEBUG] Received verification request with token: {token}")
+        logger.debug('Email verification request with token %s', token)
         try:
             user = User.objects.get(verification_token=token)
-            debug_msg = (
-                f"[DEBUG] Found user: {user.username}, "
-                f"Current email_verified status: {user.email_verified}"
-            )
-            print(debug_msg)
-
             if not user.email_verified:
-                print(
-                    f"[DEBUG] Verifying email for user: "
-                    f"{user.username}"
-                )
                 user.email_verified = True
                 user.verification_token = ""  # Clear the token
                 user.save()
-                debug_msg = (
-                    f"[DEBUG] After save - email_verified: "
-                    f"{user.email_verified}, token: {user.verification_token}"
-                )
-                print(debug_msg)
+                logger.info('Email verified for %s', user.username)
                 return Response(
                     {"message": "Email verified successfully"},
                     status=status.HTTP_200_OK
                 )
-            print(f"[DEBUG] Email already verified for user: {user.username}")
+            logger.debug('Email already verified for %s', user.username)
             return Response(
                 {"message": "Email already verified"},
                 status=status.HTTP_200_OK
             )
         except User.DoesNotExist:
-            print(f"[DEBUG] No user found with token: {token}")
+            logger.info('Email verification with an unknown token')
             return Response(
                 {"detail": "Invalid verification token"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        except Exception as e:
-            print(f"[DEBUG] Unexpected error during verification: {str(e)}")
+        except Exception:
+            logger.exception('Unexpected error during email verification')
             return Response(
                 {"detail": "An error occurred during verification"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -127,23 +112,16 @@ class UserLoginView(TokenObtainPairView):
 
     def post(self, request, *args, **kwargs):
         username = request.data.get('username')
-        print(f"[DEBUG] Login attempt for username: {username}")
+        logger.debug('Login attempt for %s', username)
         try:
             user = User.objects.get(username=username)
-            debug_msg = (
-                f"[DEBUG] Found user, email_verified status: "
-                f"{user.email_verified}"
-            )
-            print(debug_msg)
-
             if not user.email_verified:
-                print(f"[DEBUG] Email not verified for user: {username}")
+                logger.info('Login refused for %s: email not verified', username)
                 return Response(
                     {"detail": "Please verify your email before logging in."},
                     status=status.HTTP_403_FORBIDDEN
                 )
 
-            print("[DEBUG] Email verified, proceeding with login")
             response = super().post(request, *args, **kwargs)
             response.data['user'] = {
                 'id': user.id,
@@ -151,16 +129,16 @@ class UserLoginView(TokenObtainPairView):
                 'email': user.email,
                 'user_type': user.user_type
             }
-            print(f"[DEBUG] Login successful for user: {username}")
+            logger.debug('Login succeeded for %s', username)
             return response
         except User.DoesNotExist:
-            print(f"[DEBUG] User not found: {username}")
+            logger.debug('Login attempt for unknown user %s', username)
             return Response(
                 {"detail": "Invalid username or password."},
                 status=status.HTTP_401_UNAUTHORIZED
             )
-        except Exception as e:
-            print(f"[DEBUG] Unexpected error during login: {str(e)}")
+        except Exception:
+            logger.exception('Unexpected error during login')
             return Response(
                 {"detail": "An error occurred during login"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -235,12 +213,7 @@ class UserSearchView(viewsets.ViewSet):
                     user_data['profile_picture'] = expert.profile_picture.url if expert.profile_picture else None
                 except ExpertProfile.DoesNotExist:
                     pass
-            elif user.user_type == 'podcaster':
-                try:
-                    podcaster = PodcasterProfile.objects.get(user=user)
-                    user_data['profile_picture'] = podcaster.profile_picture.url if podcaster.profile_picture else None
-                except PodcasterProfile.DoesNotExist:
-                    pass
+            # Podcaster profiles have no picture, so theirs stays None
 
             users.append(user_data)
 